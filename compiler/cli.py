@@ -1,4 +1,5 @@
 # PLY's documentation: http://www.dabeaz.com/ply/ply.html
+import argparse
 import os
 import re
 
@@ -9,13 +10,41 @@ import compiler.lex
 import compiler.syntax
 import compiler.sem.analyze
 from compiler.gen.classfile import create_classfile
+from compiler.gen.constant import ConstantPoolError
+from compiler.gen.flow import FlowError
 from compiler.gen.generator import generate
 from compiler.lex import LexerError
+from compiler.lex.scanner import Scanner
+from compiler.opt import PassManager, PASSES, OPT_LEVELS
 from compiler.syntax import SyntaxerError
+from compiler.syntax.descent import DescentParser
+from compiler.syntax.parallel import parse_parallel
+from compiler.util import load_source
 
 CLASS_NAME_REGEX = r'^([^\.;\[/]+\.)*[^\.;\[/]+$'
 
 
+def _ply_lexer():
+    return ply.lex.lex(module=compiler.lex)
+
+
+def _ply_parser():
+    return ply.yacc.yacc(module=compiler.syntax, debug=False)
+
+
+# Key = lexer backend name, Value = lexer factory, picklable for the parallel parsing
+LEXERS = {
+    'ply': _ply_lexer,
+    'fast': Scanner,
+}
+
+# Key = parser backend name, Value = parser factory, picklable for the parallel parsing
+PARSERS = {
+    'ply': _ply_parser,
+    'fast': DescentParser,
+}
+
+
 def print_tree(x, level=0):
     if isinstance(x, dict):
         print(('    ' * level) + str(x['node']))
@@ -35,17 +64,37 @@ def print_tree(x, level=0):
         print(('    ' * level) + str(x))
 
 
+def _create_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='compiler')
+    parser.add_argument('input_file', help='input code file')
+    parser.add_argument('output_class_name', help='name of the generated class')
+    parser.add_argument('-O', dest='opt_level', type=int, choices=sorted(OPT_LEVELS), default=0,
+                        help='optimization level (default 0)')
+    parser.add_argument('--enable-pass', dest='enabled_passes', action='append', default=[], metavar='PASS',
+                        help=f'enable the optimization pass ({", ".join(PASSES)})')
+    parser.add_argument('--disable-pass', dest='disabled_passes', action='append', default=[], metavar='PASS',
+                        help='disable the optimization pass')
+    parser.add_argument('--time-passes', action='store_true',
+                        help='print timing and size change of every executed pass')
+    parser.add_argument('--lexer', choices=sorted(LEXERS), default='ply',
+                        help='lexer backend (default ply)')
+    parser.add_argument('--parser', choices=sorted(PARSERS), default='ply',
+                        help='parser backend (default ply)')
+    parser.add_argument('--jobs', type=int, default=1, metavar='N',
+                        help='number of processes parsing, analyzing and generating large inputs (default 1)')
+    parser.add_argument('--max-depth', type=int, default=compiler.sem.MAX_DEPTH, metavar='N',
+                        help=f'limit of the nested scopes (default {compiler.sem.MAX_DEPTH})')
+    return parser
+
+
 def main():
-    # Build the lexical_analyzer
-    lexer = ply.lex.lex(module=compiler.lex)
+    args = _create_arg_parser().parse_args()
 
-    if len(sys.argv) < 3:
-        print("Parameters does not match the format!")
-        print("<input_code_file> <output_class_name>")
-        return 1
+    # Build the lexical_analyzer
+    lexer = LEXERS[args.lexer]()
 
-    input_file = sys.argv[1]
-    output_class_name = sys.argv[2]
+    input_file = args.input_file
+    output_class_name = args.output_class_name
 
     if not os.path.isfile(input_file):
         print("Input file not accessible!")
@@ -55,7 +104,17 @@ def main():
         print("Output class name is invalid!")
         return 1
 
-    data = open(input_file, 'r').read()
+    try:
+        pass_manager = PassManager(args.opt_level, args.enabled_passes, args.disabled_passes)
+    except KeyError as e:
+        print(f"Unknown optimization pass {e}!")
+        return 1
+
+    try:
+        data = load_source(input_file)
+    except UnicodeDecodeError:
+        print("Input file is not a valid UTF-8 text!")
+        return 1
     lexer.input(data)
 
     # Tokenize
@@ -67,17 +126,30 @@ def main():
     #     print("{:<20} {:<30} {:<5} {:<5}".format(tok.type, tok.value, tok.lineno, tok.lexpos))
 
     try:
-        parser = ply.yacc.yacc(module=compiler.syntax, debug=False)
-        ast = parser.parse(data, lexer=lexer, tracking=True, debug=False)
+        # the parser is built before the parallel parsing, so the PLY tables are written only once
+        parser = PARSERS[args.parser]()
+        if args.jobs > 1:
+            ast = parse_parallel(data, LEXERS[args.lexer], PARSERS[args.parser], args.jobs)
+        else:
+            ast = parser.parse(data, lexer=lexer, debug=False)
 
-        if compiler.sem.analyze(ast):
+        if compiler.sem.analyze(ast, args.max_depth, data, args.jobs):
+            pass_manager.run_ast_passes(ast)
             # print_tree(ast)
-            cls = generate(output_class_name, ast)
-            output_file = open(output_class_name + '.class', 'wb')
-            create_classfile(cls, output_file)
-            output_file.close()
+            cls = generate(output_class_name, ast, args.jobs)
+            pass_manager.run_code_passes(cls)
+            # nothing is written if the class can not be created
+            classfile = create_classfile(cls)
+            with open(output_class_name + '.class', 'wb') as output_file:
+                output_file.write(classfile)
+            if args.time_passes and pass_manager.records:
+                print(pass_manager.report())
             print("Output file generated successfully!")
     except SyntaxerError:
         pass
     except LexerError:
         pass
+    except FlowError as e:
+        print(f"code error: {e}")
+    except ConstantPoolError as e:
+        print(f"code error: {e}")
@@ -1,18 +1,27 @@
 import struct
+import sys
+from array import array
 from enum import IntFlag
-from typing import BinaryIO
+from typing import BinaryIO, Dict, List, Optional
 
 from compiler.gen.code import Code
-from compiler.gen.constant import JConstUtf8, JConstInt, JConstLong, JConstFloat, JConstDouble, JConstString, JConstClass, \
-    JConstFieldRef, JConstMethodRef, JConstNameAndType, JConst
-from compiler.gen.opcode import Opcode
+from compiler.gen.flow import FlowError, max_stack, reachable, frame_targets, frames, initial_frame, is_wide, Frame, VType, \
+    VTag, VT_TOP
+from compiler.gen.opcode import Opcode, OPCODES, IS_JUMP, LENGTHS, FORMATS, OPERAND_KINDS
 from compiler.gen.cls import Class, Field, Method
+from compiler.gen.split import split_method
+from compiler.gen.constant import ConstantPool, ConstantPoolError, Tag
+from compiler.util import is_short, is_ushort
 
 MAGIC = 0xCAFEBABE
 MINOR_VERSION = 0
 MAJOR_VERSION = 55
 CODE_ATTRIBUTE_NAME = 'Code'
 CODE_ATTRIBUTE_DEFAULT_SIZE = 12
+MAX_CODE_SIZE = 65535
+MAX_INSTRUCTION_LENGTH = 5
+STACK_MAP_TABLE_ATTRIBUTE_NAME = 'StackMapTable'
+CONSTANT_VALUE_ATTRIBUTE_NAME = 'ConstantValue'
 
 
 class ClassFlag(IntFlag):
@@ -22,12 +31,17 @@ class ClassFlag(IntFlag):
 
 class FieldFlag(IntFlag):
     ACC_PUBLIC = 0x0001
+    ACC_PRIVATE = 0x0002
     ACC_STATIC = 0x0008
+    ACC_FINAL = 0x0010
+    ACC_SYNTHETIC = 0x1000
 
 
 class MethodFlag(IntFlag):
     ACC_PUBLIC = 0x0001
+    ACC_PRIVATE = 0x0002
     ACC_STATIC = 0x0008
+    ACC_SYNTHETIC = 0x1000
 
 
 # binary formatting
@@ -43,226 +57,449 @@ I8 = 'q'
 F4 = 'f'
 F8 = 'd'
 
+# codecs matching the native byte order of the arrays
+_UTF16 = 'utf-16-le' if sys.byteorder == 'little' else 'utf-16-be'
+_UTF32 = 'utf-32-le' if sys.byteorder == 'little' else 'utf-32-be'
+
+# precompiled formats
+_U1 = struct.Struct(BE + U1)
+_U2 = struct.Struct(BE + U2)
+_U4 = struct.Struct(BE + U4)
+_U1_U2 = struct.Struct(BE + U1 + U2)
+_U2_U2 = struct.Struct(BE + U2 + U2)
+_U2_U4 = struct.Struct(BE + U2 + U4)
+_MEMBER_HEADER = struct.Struct(BE + U2 + U2 + U2 + U2)
+# Key = constant tag, Value = format of the constant, the tag included
+_CONSTANT_FORMATS: Dict[Tag, struct.Struct] = {
+    Tag.INTEGER: struct.Struct(BE + U1 + I4),
+    Tag.FLOAT: struct.Struct(BE + U1 + '4s'),
+    Tag.LONG: struct.Struct(BE + U1 + I8),
+    Tag.DOUBLE: struct.Struct(BE + U1 + '8s'),
+    Tag.CLASS: struct.Struct(BE + U1 + U2),
+    Tag.STRING: struct.Struct(BE + U1 + U2),
+    Tag.FIELD_REF: struct.Struct(BE + U1 + U2 + U2),
+    Tag.METHOD_REF: struct.Struct(BE + U1 + U2 + U2),
+    Tag.NAME_AND_TYPE: struct.Struct(BE + U1 + U2 + U2),
+}
+_CODE_HEADER = struct.Struct(BE + U2 + U4 + U2 + U2 + U4)
+
+# number of the instruction operands by the opcode byte
+_OPERANDS_COUNTS: List[int] = [len(kinds) for kinds in OPERAND_KINDS]
+
 
 _code_attribute_name_index: int
+_stack_map_table_attribute_name_index: int
+_constant_value_attribute_name_index: int
 
 
-def _write_magic(cls: Class, output: BinaryIO):
-    output.write(struct.pack(BE + U4, MAGIC))
+class _CodeLayout:
+    """
+    Sizes, positions and stack map of the code prepared for writing.
+    """
+    def __init__(self):
+        self.positions: List[int] = []
+        self.code_size: int = 0
+        self.max_stack: int = 0
+        self.max_locals: int = 0
+        self.stack_map_table: Optional[bytes] = None
 
 
-def _write_version(cls: Class, output: BinaryIO):
-    output.write(struct.pack(BE + U2 + U2, MINOR_VERSION, MAJOR_VERSION))
+def _write_magic(cls: Class, output: bytearray):
+    output += _U4.pack(MAGIC)
 
 
-def _write_utf8(output: BinaryIO, value: str):
-    data = bytearray()
-    for c in (ord(char) for char in value):
-        if c == 0x00:
-            # NULL byte encoding.
-            data.extend(bytes([0xC0, 0x80]))
-        elif c < 0x7F:
-            # ASCII
-            data.extend(bytes([c]))
-        elif c < 0x7FF:
-            # two-byte codepoint
-            data.extend(bytes([
-                (0xC0 | (0x1F & (c >> 6))),
-                (0x80 | (0x3F & c))
-            ]))
-        elif c < 0xFFFF:
-            # three-byte codepoint.
-            data.extend(bytes([
-                (0xE0 | (0x0F & (c >> 12))),
-                (0x80 | (0x3F & (c >> 6))),
-                (0x80 | (0x3F & c))
-            ]))
-        else:
-            # two-times-three byte codepoint.
-            c -= 0x10000
-            data.extend(bytes([
-                0xED,
-                0xA0 | ((c >> 16) & 0x0F),
-                0x80 | ((c >> 10) & 0x3f),
-                0xED,
-                0xb0 | ((c >> 6) & 0x0f),
-                0x80 | (c & 0x3f)
-            ]))
-
-    output.write(struct.pack(BE + U2, len(data)))
-    output.write(data)
-
-
-def _write_constant(constant: JConst, output: BinaryIO):
-    tag = constant.tag()
-    output.write(struct.pack(BE + U1, tag.value))
-
-    if isinstance(constant, JConstUtf8):
-        _write_utf8(output, constant.value)
-    elif isinstance(constant, JConstInt):
-        output.write(struct.pack(BE + I4, constant.value))
-    elif isinstance(constant, JConstLong):
-        output.write(struct.pack(BE + I8, constant.value))
-    elif isinstance(constant, JConstFloat):
-        output.write(struct.pack(BE + F4, constant.value))
-    elif isinstance(constant, JConstDouble):
-        output.write(struct.pack(BE + F8, constant.value))
-    elif isinstance(constant, JConstString):
-        output.write(struct.pack(BE + U2, constant.utf8_index))
-    elif isinstance(constant, JConstClass):
-        output.write(struct.pack(BE + U2, constant.name_index))
-    elif isinstance(constant, JConstFieldRef):
-        output.write(struct.pack(BE + U2 + U2, constant.class_index, constant.name_and_type_index))
-    elif isinstance(constant, JConstMethodRef):
-        output.write(struct.pack(BE + U2 + U2, constant.class_index, constant.name_and_type_index))
-    elif isinstance(constant, JConstNameAndType):
-        output.write(struct.pack(BE + U2 + U2, constant.name_index, constant.descriptor_index))
+def _write_version(cls: Class, output: bytearray):
+    output += _U2_U2.pack(MINOR_VERSION, MAJOR_VERSION)
+
+
+def _encode_utf8(value: str) -> bytes:
+    """
+    Encode the string into the modified UTF-8 used by the class file format.
+    The NULL character takes two bytes and the characters outside the BMP are encoded
+    as surrogate pairs, three bytes each.
+    """
+    if value.isascii():
+        data = value.encode('ascii')
+    elif max(value) <= '\uFFFF':
+        # the BMP characters are encoded the same way as in UTF-8, lone surrogates included
+        data = value.encode('utf-8', 'surrogatepass')
     else:
-        NotImplementedError()
+        # split the supplementary characters into the surrogate pairs, one code point per UTF-16 unit
+        units = array('H', value.encode(_UTF16, 'surrogatepass'))
+        data = array('I', units).tobytes().decode(_UTF32, 'surrogatepass').encode('utf-8', 'surrogatepass')
+
+    if b'\x00' in data:
+        data = data.replace(b'\x00', b'\xC0\x80')
+
+    return data
+
 
+def _write_utf8(output: bytearray, value: str):
+    data = _encode_utf8(value)
 
-def _write_constant_pool(cls: Class, output: BinaryIO):
+    if not is_ushort(len(data)):
+        raise ConstantPoolError(f'String constant is too long, {len(data)} B exceeds the limit of 65535 B.')
+
+    output += _U2.pack(len(data))
+    output += data
+
+
+def _write_constant_pool(cls: Class, output: bytearray):
     global _code_attribute_name_index
 
     # add code attribute name
     _code_attribute_name_index = cls.constant_pool.utf8(CODE_ATTRIBUTE_NAME)
 
-    constants = cls.constant_pool.constants
+    formats = _CONSTANT_FORMATS
 
     # cp count
-    output.write(struct.pack(BE + U2, len(constants) + 1))
+    output += _U2.pack(cls.constant_pool.count)
 
-    for (c, i) in constants.items():
-        _write_constant(c, output)
+    for constant in cls.constant_pool.constants:
+        if constant[0] == Tag.UTF8:
+            output += _U1.pack(Tag.UTF8)
+            _write_utf8(output, constant[1])
+        else:
+            # the tag and the payload at once
+            output += formats[constant[0]].pack(*constant)
 
 
-def _write_access_flags(cls: Class, output: BinaryIO):
+def _write_access_flags(cls: Class, output: bytearray):
     flags = ClassFlag.ACC_PUBLIC | ClassFlag.ACC_SUPER
-    output.write(struct.pack(BE + U2, flags))
+    output += _U2.pack(flags)
 
 
-def _write_this_class(cls: Class, output: BinaryIO):
-    output.write(struct.pack(BE + U2, cls.this_class))
+def _write_this_class(cls: Class, output: bytearray):
+    output += _U2.pack(cls.this_class)
 
 
-def _write_super_class(cls: Class, output: BinaryIO):
-    output.write(struct.pack(BE + U2, cls.super_class))
+def _write_super_class(cls: Class, output: bytearray):
+    output += _U2.pack(cls.super_class)
 
 
-def _write_interfaces(cls: Class, output):
+def _write_interfaces(cls: Class, output: bytearray):
     # interfaces count
-    output.write(struct.pack(BE + U2, 0))
+    output += _U2.pack(0)
 
 
-def _write_field(field: Field, output: BinaryIO):
-    flags = FieldFlag.ACC_PUBLIC | FieldFlag.ACC_STATIC
+def _write_field(field: Field, output: bytearray):
+    if field.synthetic:
+        flags = FieldFlag.ACC_PRIVATE | FieldFlag.ACC_STATIC | FieldFlag.ACC_SYNTHETIC
+    else:
+        flags = FieldFlag.ACC_PUBLIC | FieldFlag.ACC_STATIC
 
-    output.write(struct.pack(BE + U2, flags))
-    output.write(struct.pack(BE + U2, field.name_index))
-    output.write(struct.pack(BE + U2, field.descriptor_index))
+    if field.constant_index is None:
+        # flags, name, descriptor and attributes count
+        output += _MEMBER_HEADER.pack(flags, field.name_index, field.descriptor_index, 0)
+        return
 
-    # attributes count
-    output.write(struct.pack(BE + U2, 0))
+    output += _MEMBER_HEADER.pack(flags | FieldFlag.ACC_FINAL, field.name_index, field.descriptor_index, 1)
+    output += _U2_U4.pack(_constant_value_attribute_name_index, 2)
+    output += _U2.pack(field.constant_index)
 
 
-def _write_fields(cls: Class, output: BinaryIO):
+def _write_fields(cls: Class, output: bytearray):
     fields = cls.fields
 
     # fields count
-    output.write(struct.pack(BE + U2, len(fields)))
+    output += _U2.pack(len(fields))
 
     for ((name, descriptor), field) in fields:
         _write_field(field, output)
 
 
-def _write_instruction(i: int, instruction, inst_positions, output: BinaryIO):
-    opcode = instruction[0]
+def _write_instructions(code: Code, positions: List[int], output: bytearray, offset: int):
+    """
+    Pack the instructions into the already allocated part of the output.
+    :param offset: Position of the first instruction in the output.
+    """
+    formats = FORMATS
+    counts = _OPERANDS_COUNTS
+    is_jump = IS_JUMP
+
+    for (opcode, operand, operand2, position) in zip(code.opcodes, code.operands, code.operands2, positions):
+        count = counts[opcode]
+
+        if is_jump[opcode]:
+            formats[opcode].pack_into(output, offset + position, opcode, positions[operand] - position)
+        elif count == 0:
+            formats[opcode].pack_into(output, offset + position, opcode)
+        elif count == 1:
+            formats[opcode].pack_into(output, offset + position, opcode, operand)
+        else:
+            formats[opcode].pack_into(output, offset + position, opcode, operand, operand2)
+
+
+def _write_vtype(vtype: VType, layout: _CodeLayout, constant_pool: ConstantPool, output: bytearray):
+    output += _U1.pack(vtype[0])
+
+    if vtype[0] == VTag.OBJECT:
+        output += _U2.pack(constant_pool.class_ref(vtype[1]))
+    elif vtype[0] == VTag.UNINITIALIZED:
+        output += _U2.pack(layout.positions[vtype[1]])
+
+
+def _frame_locals(frame: Frame) -> List[VType]:
+    """
+    Local variables of the frame as stack map entries.
+    The second word of a long or double is implicit and the trailing unusable variables are omitted.
+    """
+    locals_types = list(frame[0])
+    while locals_types and locals_types[-1] == VT_TOP:
+        locals_types.pop()
+
+    result = []
+    index = 0
+    while index < len(locals_types):
+        result.append(locals_types[index])
+        index += 2 if is_wide(locals_types[index]) else 1
+
+    return result
+
+
+def _create_stack_map_table(code_frames: Dict[int, Frame], start: Frame, layout: _CodeLayout,
+                            constant_pool: ConstantPool) -> bytes:
+    output = bytearray()
+    output += _U2.pack(len(code_frames))
+
+    previous_locals = _frame_locals(start)
+    previous_offset = -1
+
+    for (index, frame) in sorted(code_frames.items()):
+        offset = layout.positions[index]
+        delta = offset - previous_offset - 1
+        frame_locals = _frame_locals(frame)
+        stack = frame[1]
+        diff = len(frame_locals) - len(previous_locals)
+
+        if frame_locals == previous_locals and len(stack) == 0:
+            if delta < 64:
+                # same_frame
+                output += _U1.pack(delta)
+            else:
+                # same_frame_extended
+                output += _U1_U2.pack(251, delta)
+        elif frame_locals == previous_locals and len(stack) == 1:
+            if delta < 64:
+                # same_locals_1_stack_item_frame
+                output += _U1.pack(64 + delta)
+            else:
+                # same_locals_1_stack_item_frame_extended
+                output += _U1_U2.pack(247, delta)
+            _write_vtype(stack[0], layout, constant_pool, output)
+        elif len(stack) == 0 and -3 <= diff < 0 and frame_locals == previous_locals[:diff]:
+            # chop_frame
+            output += _U1_U2.pack(251 + diff, delta)
+        elif len(stack) == 0 and 0 < diff <= 3 and frame_locals[:-diff] == previous_locals:
+            # append_frame
+            output += _U1_U2.pack(251 + diff, delta)
+            for vtype in frame_locals[-diff:]:
+                _write_vtype(vtype, layout, constant_pool, output)
+        else:
+            # full_frame
+            output += _U1_U2.pack(255, delta)
+            output += _U2.pack(len(frame_locals))
+            for vtype in frame_locals:
+                _write_vtype(vtype, layout, constant_pool, output)
+            output += _U2.pack(len(stack))
+            for vtype in stack:
+                _write_vtype(vtype, layout, constant_pool, output)
+
+        previous_locals = frame_locals
+        previous_offset = offset
+
+    return bytes(output)
+
+
+def _positions(code: Code) -> List[int]:
+    """
+    Byte offsets of the instructions, the last item is the code size.
+    """
+    lengths = LENGTHS
+    positions = [0]
+    position = 0
+    for opcode in code.opcodes:
+        length = lengths[opcode]
+        if length is None:
+            raise NotImplementedError(OPCODES[opcode])
+        position += length
+        positions.append(position)
+    return positions
+
+
+def _relax_jumps(code: Code) -> List[int]:
+    """
+    Widen the jumps whose offset does not fit into 2 bytes.
+    Widening moves the following instructions, so it is repeated until no other jump overflows.
+    :param code: The code.
+    :return: Byte offsets of the instructions, the last item is the code size.
+    """
+    while True:
+        positions = _positions(code)
+        overflowing = []
+
+        operands = code.operands
+
+        for (index, opcode) in enumerate(code.opcodes):
+            if IS_JUMP[opcode] and opcode != Opcode.GOTO_W:
+                offset = positions[operands[index]] - positions[index]
+                if not is_short(offset):
+                    overflowing.append(index)
+
+        if not overflowing:
+            return positions
+
+        code.widen_jumps(overflowing)
+
+
+def _remove_unreachable(code: Code):
+    # the verifier requires a frame for every instruction after an unconditional jump,
+    # including the unreachable ones, so they are not written at all
+    visited = reachable(code)
+    if not all(visited):
+        code.remove_instructions(i for (i, v) in enumerate(visited) if not v)
+
+
+def _split_method(cls: Class, name: str, method: Method):
+    """
+    Outline parts of the method code into helper methods while the code is too long.
+    """
+    code = method.code
+
+    # even a wide jump in place of every instruction would fit
+    if len(code) * MAX_INSTRUCTION_LENGTH <= MAX_CODE_SIZE:
+        return
+
+    _remove_unreachable(code)
+
+    code_size = _relax_jumps(code)[-1]
+    while code_size > MAX_CODE_SIZE and split_method(cls, name, method, code_size - MAX_CODE_SIZE):
+        code_size = _relax_jumps(code)[-1]
+
+
+def _prepare_code(method: Method, constant_pool: ConstantPool) -> _CodeLayout:
+    """
+    Remove the unreachable instructions and compute the code layout, max_stack, max_locals
+    and the stack map frames of the method code.
+    Classes referenced by the stack map frames are added into the constant pool.
+    """
+    code = method.code
+    layout = _CodeLayout()
+
+    _remove_unreachable(code)
 
-    if opcode.is_jump():
-        target_index = instruction[1]
-        pos = inst_positions[i]
-        target_pos = inst_positions[target_index]
-        offset = target_pos - pos
-        output.write(struct.pack(opcode.fmt, opcode, offset))
-    else:
-        output.write(struct.pack(opcode.fmt, *instruction))
+    # calculate absolute positions of instructions, max_stack and max locals
+    layout.positions = _relax_jumps(code)
+    layout.code_size = layout.positions.pop()
 
+    if layout.code_size > MAX_CODE_SIZE:
+        raise FlowError(f'Method code size {layout.code_size} B exceeds the limit of {MAX_CODE_SIZE} B.')
 
-def _write_code(code: Code, output: BinaryIO):
+    layout.max_stack = max_stack(code)
 
-    # calculate absolute positions of instructions, max_stack and max locals
-    code_size = 0
-    inst_positions = []
-    stack = 0
-    max_stack = 0
+    for local in code.locals:
+        layout.max_locals += local.size()
 
-    for (index, instruction) in enumerate(code.instructions):
-        inst_positions.append(code_size)
-        code_size += code.instruction_length(index)
-        stack += code.instruction_stack_diff(index)
+    targets = frame_targets(code)
+    if targets:
+        code_frames = frames(code, method.descriptor, targets)
+        start = initial_frame(code, method.descriptor)
+        layout.stack_map_table = _create_stack_map_table(code_frames, start, layout, constant_pool)
 
-        if max_stack < stack:
-            max_stack = stack
+    return layout
 
-    max_locals = 0
 
-    for local in code.locals:
-        max_locals += local.size()
+def _write_code(code: Code, layout: _CodeLayout, output: bytearray):
+    size = CODE_ATTRIBUTE_DEFAULT_SIZE + layout.code_size
+    attributes_count = 0
 
-    size = CODE_ATTRIBUTE_DEFAULT_SIZE + code_size
+    if layout.stack_map_table is not None:
+        size += 6 + len(layout.stack_map_table)
+        attributes_count += 1
 
-    output.write(struct.pack(BE + U2, _code_attribute_name_index))
-    output.write(struct.pack(BE + U4, size))
-    output.write(struct.pack(BE + U2, max_stack))
-    output.write(struct.pack(BE + U2, max_locals))
-    output.write(struct.pack(BE + U4, code_size))
+    output += _CODE_HEADER.pack(_code_attribute_name_index, size, layout.max_stack, layout.max_locals,
+                                layout.code_size)
 
-    # write instructions
-    for (i, instruction) in enumerate(code.instructions):
-        _write_instruction(i, instruction, inst_positions, output)
+    # the code size is known, the instructions are packed into the allocated space
+    offset = len(output)
+    output += bytes(layout.code_size)
+    _write_instructions(code, layout.positions, output, offset)
 
-    # exception table length
-    output.write(struct.pack(BE + U2, 0))
-    # attributes count
-    output.write(struct.pack(BE + U2, 0))
+    # exception table length and attributes count
+    output += _U2_U2.pack(0, attributes_count)
 
+    if layout.stack_map_table is not None:
+        output += _U2_U4.pack(_stack_map_table_attribute_name_index, len(layout.stack_map_table))
+        output += layout.stack_map_table
 
-def _write_method(method: Method, output: BinaryIO):
-    flags = MethodFlag.ACC_PUBLIC | MethodFlag.ACC_STATIC
 
-    output.write(struct.pack(BE + U2, flags))
-    output.write(struct.pack(BE + U2, method.name_index))
-    output.write(struct.pack(BE + U2, method.descriptor_index))
+def _write_method(method: Method, layout: _CodeLayout, output: bytearray):
+    if method.synthetic:
+        flags = MethodFlag.ACC_PRIVATE | MethodFlag.ACC_STATIC | MethodFlag.ACC_SYNTHETIC
+    else:
+        flags = MethodFlag.ACC_PUBLIC | MethodFlag.ACC_STATIC
 
-    # attributes count
-    output.write(struct.pack(BE + U2, 1))
-    _write_code(method.code, output)
+    # flags, name, descriptor and attributes count
+    output += _MEMBER_HEADER.pack(flags, method.name_index, method.descriptor_index, 1)
+    _write_code(method.code, layout, output)
 
 
-def _write_methods(cls: Class, output: BinaryIO):
+def _write_methods(cls: Class, layouts: List[_CodeLayout], output: bytearray):
     methods = cls.methods
 
     # methods count
-    output.write(struct.pack(BE + U2, len(methods)))
+    output += _U2.pack(len(methods))
 
-    for ((name, descriptor), method) in methods:
-        _write_method(method, output)
+    for (((name, descriptor), method), layout) in zip(methods, layouts):
+        _write_method(method, layout, output)
 
 
-def _write_attributes(cls: Class, output: BinaryIO):
+def _write_attributes(cls: Class, output: bytearray):
     # attributes count
-    output.write(struct.pack(BE + U2, 0))
+    output += _U2.pack(0)
 
 
-def create_classfile(cls: Class, output: BinaryIO):
+def create_classfile(cls: Class, output: Optional[BinaryIO] = None) -> bytes:
+    """
+    Serialize the class into the class file format.
+    The class file is built in memory and written into the output at once.
+    :param cls: The generated class.
+    :param output: The optional output the class file is written into.
+    :return: The class file bytes.
+    """
+    global _stack_map_table_attribute_name_index
+    global _constant_value_attribute_name_index
+
+    # the helper methods outlined from the too long ones are prepared with the others
+    for ((name, _), method) in list(cls.methods):
+        _split_method(cls, name, method)
+
+    # prepare the code first, stack map frames add constants
+    layouts = [_prepare_code(method, cls.constant_pool) for (_, method) in cls.methods]
+
+    if any(layout.stack_map_table is not None for layout in layouts):
+        _stack_map_table_attribute_name_index = cls.constant_pool.utf8(STACK_MAP_TABLE_ATTRIBUTE_NAME)
+
+    if any(field.constant_index is not None for (_, field) in cls.fields):
+        _constant_value_attribute_name_index = cls.constant_pool.utf8(CONSTANT_VALUE_ATTRIBUTE_NAME)
+
+    data = bytearray()
+
     # collect constants and create constant pool
-    _write_magic(cls, output)
-    _write_version(cls, output)
-    _write_constant_pool(cls, output)
-    _write_access_flags(cls, output)
-    _write_this_class(cls, output)
-    _write_super_class(cls, output)
-    _write_interfaces(cls, output)
-    _write_fields(cls, output)
-    _write_methods(cls, output)
-    _write_attributes(cls, output)
+    _write_magic(cls, data)
+    _write_version(cls, data)
+    _write_constant_pool(cls, data)
+    _write_access_flags(cls, data)
+    _write_this_class(cls, data)
+    _write_super_class(cls, data)
+    _write_interfaces(cls, data)
+    _write_fields(cls, data)
+    _write_methods(cls, layouts, data)
+    _write_attributes(cls, data)
+
+    data = bytes(data)
+
+    if output is not None:
+        output.write(data)
+
+    return data
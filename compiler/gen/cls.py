@@ -1,17 +1,33 @@
-from typing import Tuple, Dict
+from array import array
+from typing import Tuple, Dict, Optional
 
 from compiler.gen.code import Code
 from compiler.gen.constant import ConstantPool
 from compiler.gen.descriptor import MethodDescriptor, FieldDescriptor, IntDesc, LongDesc, FloatDesc, DoubleDesc, ClassDesc, \
-    ArrayDesc
-from compiler.gen.predefined import JC_OBJECT
+    ArrayDesc, BooleanDesc, ByteDesc, CharDesc, ShortDesc
+from compiler.gen.predefined import JC_OBJECT, JC_STRING
 
 
 class Field:
-    def __init__(self, name: str, descriptor: FieldDescriptor, constant_pool: ConstantPool):
+    def __init__(self, name: str, descriptor: FieldDescriptor, constant_pool: ConstantPool, synthetic: bool = False,
+                 constant=None):
         self._constant_pool = constant_pool
         self._name_index: int = constant_pool.field_name(name)
         self._descriptor_index: int = constant_pool.field_descriptor(descriptor)
+        self._synthetic: bool = synthetic
+        self._constant_index: Optional[int] = None
+
+        # the value of the final field, set by the JVM before the class initialization
+        if constant is None:
+            pass
+        elif isinstance(descriptor, (IntDesc, BooleanDesc)):
+            self._constant_index = constant_pool.int(int(constant))
+        elif isinstance(descriptor, DoubleDesc):
+            self._constant_index = constant_pool.double(constant)
+        elif descriptor == ClassDesc(JC_STRING):
+            self._constant_index = constant_pool.string(constant)
+        else:
+            raise NotImplementedError(f'Constant value of the {descriptor} field')
 
     @property
     def name_index(self):
@@ -21,17 +37,30 @@ class Field:
     def descriptor_index(self):
         return self._descriptor_index
 
+    @property
+    def synthetic(self) -> bool:
+        return self._synthetic
+
+    @property
+    def constant_index(self) -> Optional[int]:
+        """
+        Index of the constant value of the final field or None if the field is not constant.
+        """
+        return self._constant_index
+
 
 class Method:
-    def __init__(self, name: str, descriptor: MethodDescriptor, constant_pool: ConstantPool):
+    def __init__(self, name: str, descriptor: MethodDescriptor, constant_pool: ConstantPool, synthetic: bool = False):
         self._constant_pool = constant_pool
         self._name_index: int = constant_pool.method_name(name)
         self._descriptor_index: int = constant_pool.method_descriptor(descriptor)
+        self._descriptor: MethodDescriptor = descriptor
+        self._synthetic: bool = synthetic
         self._code: Code = Code(constant_pool)
 
         # setup local variables
         for p in descriptor.params_descriptors:
-            if isinstance(p, IntDesc):
+            if isinstance(p, (IntDesc, BooleanDesc, ByteDesc, CharDesc, ShortDesc)):
                 self._code.variable_int()
             elif isinstance(p, LongDesc):
                 self._code.variable_long()
@@ -50,49 +79,85 @@ class Method:
     def descriptor_index(self) -> int:
         return self._descriptor_index
 
+    @property
+    def descriptor(self) -> MethodDescriptor:
+        return self._descriptor
+
+    @property
+    def synthetic(self) -> bool:
+        return self._synthetic
+
     @property
     def code(self) -> Code:
         return self._code
 
+    def rebind(self, constant_pool: ConstantPool, indexes: array):
+        """
+        Move the method created with another constant pool to the constant pool its constants are merged into.
+        :param constant_pool: The constant pool.
+        :param indexes: The indexes of the merged constants, Index = index in the former constant pool.
+        """
+        self._constant_pool = constant_pool
+        self._name_index = indexes[self._name_index]
+        self._descriptor_index = indexes[self._descriptor_index]
+        self._code.rebind(constant_pool, indexes)
+
 
 class Class:
     def __init__(self, name):
+        self._name: str = name
         self._constant_pool = ConstantPool()
         self._this_class: int = self._constant_pool.class_ref(name)
         self._super_class: int = self._constant_pool.class_ref(JC_OBJECT)
         self._fields: Dict[Tuple[str, FieldDescriptor], Field] = {}
         self._methods: Dict[Tuple[str, MethodDescriptor], Method] = {}
 
-    def method(self, name: str, descriptor: MethodDescriptor) -> Method:
+    def method(self, name: str, descriptor: MethodDescriptor, synthetic: bool = False) -> Method:
         """
         Get the method by name and descriptor or create one if not exists.
         :param name: Name of the method.
         :param descriptor: Descriptor of the method.
+        :param synthetic: Whether the created method is a private helper generated by the compiler.
         :return: The already existing or a newly created method.
         """
         method = self._methods.get((name, descriptor))
 
         if method is None:
-            method = Method(name, descriptor, self._constant_pool)
+            method = Method(name, descriptor, self._constant_pool, synthetic)
             self._methods[(name, descriptor)] = method
 
         return method
 
-    def field(self, name: str, descriptor: FieldDescriptor) -> Field:
+    def field(self, name: str, descriptor: FieldDescriptor, synthetic: bool = False, constant=None) -> Field:
         """
         Get the field by name and descriptor or create one if not exists.
         :param name: Name of the field.
         :param descriptor: Descriptor of the field.
+        :param synthetic: Whether the created field is a private helper generated by the compiler.
+        :param constant: The int, float, bool or str value of the created final field or None.
         :return: The already existing or newly created field.
         """
         field = self._fields.get((name, descriptor))
 
         if field is None:
-            field = Field(name, descriptor, self._constant_pool)
+            field = Field(name, descriptor, self._constant_pool, synthetic, constant)
             self._fields[(name, descriptor)] = field
 
         return field
 
+    def merge(self, other: 'Class'):
+        """
+        Add the methods of the separately generated class, its constants are merged in the order of its constant pool.
+        The methods already present are skipped, e.g. the helper methods generated into both classes.
+        :param other: The class of the same name without own fields.
+        """
+        indexes = self._constant_pool.merge(other.constant_pool.constants)
+
+        for (key, method) in other.methods:
+            if key not in self._methods:
+                method.rebind(self._constant_pool, indexes)
+                self._methods[key] = method
+
     @property
     def methods(self):
         return self._methods.items()
@@ -101,6 +166,10 @@ class Class:
     def fields(self):
         return self._fields.items()
 
+    @property
+    def name(self) -> str:
+        return self._name
+
     @property
     def constant_pool(self) -> ConstantPool:
         return self._constant_pool
@@ -1,12 +1,15 @@
+from array import array
 from enum import IntEnum
-from typing import List, Optional, Any, Dict
+from math import copysign
+from typing import List, Optional, Dict, Iterable, Union, Tuple
 
 from compiler.gen.constant import ConstantPool
 from compiler.gen.descriptor import JOperandType, JOperandTypeInt, JOperandTypeLong, JOperandTypeFloat, JOperandTypeDouble, \
     JOperandTypeReference, FieldDescriptor, MethodDescriptor, ArrayDesc, IntDesc, LongDesc, FloatDesc, DoubleDesc, \
-    ByteDesc, BooleanDesc, CharDesc, ShortDesc, ClassDesc
-from compiler.gen.opcode import Opcode
-from compiler.util import is_byte, is_short
+    ByteDesc, BooleanDesc, CharDesc, ShortDesc, ClassDesc, Descriptor
+from compiler.gen.opcode import Opcode, OPCODES, IS_JUMP, LENGTHS, STACK_DIFFS, OPERAND_KINDS, OperandKind
+from compiler.gen.predefined import JC_STRING
+from compiler.util import is_byte, is_short, is_ubyte
 
 
 class ArrayType(IntEnum):
@@ -20,18 +23,75 @@ class ArrayType(IntEnum):
     LONG = 11
 
 
+# operand of a jump whose target is not known yet
+NO_TARGET = -1
+
+# whether the first operand of the instruction is a constant pool index, Index = opcode
+_HAS_CONSTANT = [kinds[:1] == (OperandKind.CONSTANT,) for kinds in OPERAND_KINDS]
+
+
+class Label:
+    """
+    The jump target which can be used before its position is known.
+    The jumps to the label are updated when the label is placed.
+    """
+    def __init__(self):
+        self._index: Optional[int] = None
+        self._jumps: List[int] = []
+
+    @property
+    def index(self) -> Optional[int]:
+        return self._index
+
+
 class Code:
+    """
+    The instructions of a method stored in parallel columns,
+    the instruction at index i is made of the items at index i of every column.
+    """
 
     def __init__(self, constant_pool: ConstantPool):
         self._constant_pool = constant_pool
-        self._instructions: List[Any] = []
+        self._opcodes = array('H')
+        # the first operand or the index of the jump target instruction
+        self._operands = array('i')
+        # the second operand
+        self._operands2 = array('i')
+        self._stack_deltas = array('i')
         self._locals: List[JOperandType] = []
         self._locals_size: int = 0
-        self._stack_diffs: Dict[int, int] = {}
+        self._stack_diff: Optional[int] = None
+        self._descriptors: Dict[int, Descriptor] = {}
+
+    def __len__(self):
+        return len(self._opcodes)
 
     @property
-    def instructions(self):
-        return self._instructions
+    def opcodes(self) -> array:
+        return self._opcodes
+
+    @property
+    def operands(self) -> array:
+        return self._operands
+
+    @property
+    def operands2(self) -> array:
+        return self._operands2
+
+    @property
+    def stack_deltas(self) -> array:
+        return self._stack_deltas
+
+    @property
+    def instructions(self) -> List[Tuple]:
+        """
+        The instructions as tuples of the opcode and its operands, created on every access.
+        """
+        result = []
+        for (opcode, operand, operand2) in zip(self._opcodes, self._operands, self._operands2):
+            count = len(OPERAND_KINDS[opcode])
+            result.append((OPCODES[opcode], operand, operand2)[:count + 1])
+        return result
 
     @property
     def locals(self) -> List[JOperandType]:
@@ -41,16 +101,23 @@ class Code:
     def constant_pool(self) -> ConstantPool:
         return self._constant_pool
 
+    @property
+    def locals_size(self) -> int:
+        """
+        The size of all the local variables in words.
+        """
+        return self._locals_size
+
     def instruction_length(self, index: int):
         """
         The length of the instruction.
         :param index: The index of the instruction
         :return: Length in bytes.
         """
-        instruction = self._instructions[index]
+        length = LENGTHS[self._opcodes[index]]
 
-        if instruction[0].length is not None:
-            return instruction[0].length
+        if length is not None:
+            return length
 
         raise NotImplementedError()
 
@@ -60,19 +127,70 @@ class Code:
         :param index: The index of the instruction.
         :return: Difference in words.
         """
-        instruction = self._instructions[index]
+        return self._stack_deltas[index]
+
+    def instruction_descriptor(self, index: int) -> Optional[Descriptor]:
+        """
+        The descriptor of the value or the method the instruction works with.
+        It is set for constant loads, field accesses, invocations and object creations.
+        :param index: The index of the instruction.
+        :return: The descriptor or None.
+        """
+        return self._descriptors.get(index)
+
+    def rebind(self, constant_pool: ConstantPool, indexes: array):
+        """
+        Move the code generated against another constant pool to the constant pool its constants are merged into.
+        The constant operands are replaced and the constant loads get the form fitting the new indexes.
+        :param constant_pool: The constant pool.
+        :param indexes: The indexes of the merged constants, Index = index in the former constant pool.
+        """
+        opcodes = self._opcodes
+        operands = self._operands
 
-        if instruction[0].stack_diff is not None:
-            return instruction[0].stack_diff
+        for (i, opcode) in enumerate(opcodes):
+            if not _HAS_CONSTANT[opcode]:
+                continue
 
-        return self._stack_diffs[index]
+            index = indexes[operands[i]]
+            operands[i] = index
+
+            if opcode == Opcode.LDC or opcode == Opcode.LDC_W:
+                opcodes[i] = Opcode.LDC if is_ubyte(index) else Opcode.LDC_W
+
+        self._constant_pool = constant_pool
 
     def _set_stack_diff(self, diff: int):
+        # the difference of the next added instruction
+        self._stack_diff = diff
+
+    def _set_descriptor(self, descriptor: Descriptor):
         pos = self.pos()
-        self._stack_diffs[pos] = diff
+        self._descriptors[pos] = descriptor
+
+    def _add_instruction(self, opcode: Opcode, operand: int = 0, operand2: int = 0):
+        stack_diff = STACK_DIFFS[opcode]
+
+        if stack_diff is None:
+            stack_diff = self._stack_diff
+            self._stack_diff = None
+            if stack_diff is None:
+                raise NotImplementedError(f'Unknown stack difference of {opcode.name}')
+
+        self._opcodes.append(opcode)
+        self._operands.append(operand)
+        self._operands2.append(operand2)
+        self._stack_deltas.append(stack_diff)
 
-    def _add_instruction(self, opcode: Opcode, *args):
-        self._instructions.append([opcode, *args])
+    def _add_jump(self, opcode: Opcode, target: Union[int, Label, None]):
+        if isinstance(target, Label):
+            if target.index is None:
+                target._jumps.append(self.pos())
+                target = None
+            else:
+                target = target.index
+
+        self._add_instruction(opcode, NO_TARGET if target is None else target)
 
     def _add_variable(self, variable_type: JOperandType) -> int:
         self._locals.append(variable_type)
@@ -86,7 +204,27 @@ class Code:
         It can be used later for jump instruction.
         :return: The index of the instruction.
         """
-        return len(self._instructions)
+        return len(self._opcodes)
+
+    def label(self) -> Label:
+        """
+        Create a new label which is not placed yet.
+        :return: The label.
+        """
+        return Label()
+
+    def place(self, label: Label):
+        """
+        Place the label at the next added instruction and update the jumps to it.
+        :param label: The label.
+        """
+        if label.index is not None:
+            raise ValueError(f'Label already placed at {label.index}')
+
+        label._index = self.pos()
+        for jump in label._jumps:
+            self._operands[jump] = label._index
+        label._jumps.clear()
 
     def variable_int(self) -> int:
         """
@@ -148,7 +286,18 @@ class Code:
             self._add_instruction(Opcode.SIPUSH, value)
         else:
             index = self._constant_pool.int(value)
+            self._set_descriptor(IntDesc())
+            self._load_constant(index)
+
+    def _load_constant(self, index: int):
+        """
+        Push the single entry constant from the constant pool, the short form is used if the index fits into a byte.
+        :param index: Index of the constant.
+        """
+        if is_ubyte(index):
             self._add_instruction(Opcode.LDC, index)
+        else:
+            self._add_instruction(Opcode.LDC_W, index)
 
     def const_long(self, value: int):
         """
@@ -161,6 +310,7 @@ class Code:
             self._add_instruction(Opcode.LCONST_1)
         else:
             index = self._constant_pool.long(value)
+            self._set_descriptor(LongDesc())
             self._add_instruction(Opcode.LDC2_W, index)
 
     def const_float(self, value: float):
@@ -168,7 +318,7 @@ class Code:
         Push float constant onto the stack.
         :param value: The float value.
         """
-        if value == 0:
+        if value == 0 and copysign(1, value) > 0:
             self._add_instruction(Opcode.FCONST_0)
         elif value == 1:
             self._add_instruction(Opcode.FCONST_1)
@@ -176,20 +326,22 @@ class Code:
             self._add_instruction(Opcode.FCONST_2)
         else:
             index = self._constant_pool.float(value)
-            self._add_instruction(Opcode.LDC, index)
+            self._set_descriptor(FloatDesc())
+            self._load_constant(index)
 
     def const_double(self, value: float):
         """
         Push double constant onto the stack.
         :param value: The double value.
         """
-        if value == 0:
+        if value == 0 and copysign(1, value) > 0:
             self._add_instruction(Opcode.DCONST_0)
         elif value == 1:
             self._add_instruction(Opcode.DCONST_1)
         else:
             index = self._constant_pool.double(value)
-            self._add_instruction(Opcode.LDC, index)
+            self._set_descriptor(DoubleDesc())
+            self._add_instruction(Opcode.LDC2_W, index)
 
     def const_string(self, value: str):
         """
@@ -197,7 +349,8 @@ class Code:
         :param value: The string value.
         """
         index = self._constant_pool.string(value)
-        self._add_instruction(Opcode.LDC, index)
+        self._set_descriptor(ClassDesc(JC_STRING))
+        self._load_constant(index)
 
     def load_int(self, index: int):
         """
@@ -699,50 +852,50 @@ class Code:
     def cmp_double_g(self):
         self._add_instruction(Opcode.DCMPG)
 
-    def if_eq(self, index: Optional[int] = None):
-        return self._add_instruction(Opcode.IFEQ, index)
+    def if_eq(self, target: Union[int, Label, None] = None):
+        return self._add_jump(Opcode.IFEQ, target)
 
-    def if_ne(self, index: Optional[int] = None):
-        return self._add_instruction(Opcode.IFNE, index)
+    def if_ne(self, target: Union[int, Label, None] = None):
+        return self._add_jump(Opcode.IFNE, target)
 
-    def if_lt(self, index: Optional[int] = None):
-        return self._add_instruction(Opcode.IFLT, index)
+    def if_lt(self, target: Union[int, Label, None] = None):
+        return self._add_jump(Opcode.IFLT, target)
 
-    def if_ge(self, index: Optional[int] = None):
-        return self._add_instruction(Opcode.IFGE, index)
+    def if_ge(self, target: Union[int, Label, None] = None):
+        return self._add_jump(Opcode.IFGE, target)
 
-    def if_gt(self, index: Optional[int] = None):
-        return self._add_instruction(Opcode.IFGT, index)
+    def if_gt(self, target: Union[int, Label, None] = None):
+        return self._add_jump(Opcode.IFGT, target)
 
-    def if_le(self, index: Optional[int] = None):
-        return self._add_instruction(Opcode.IFLE, index)
+    def if_le(self, target: Union[int, Label, None] = None):
+        return self._add_jump(Opcode.IFLE, target)
 
-    def if_cmp_int_eq(self, index: Optional[int] = None):
-        return self._add_instruction(Opcode.IF_ICMPEQ, index)
+    def if_cmp_int_eq(self, target: Union[int, Label, None] = None):
+        return self._add_jump(Opcode.IF_ICMPEQ, target)
 
-    def if_cmp_int_ne(self, index: Optional[int] = None):
-        return self._add_instruction(Opcode.IF_ICMPNE, index)
+    def if_cmp_int_ne(self, target: Union[int, Label, None] = None):
+        return self._add_jump(Opcode.IF_ICMPNE, target)
 
-    def if_cmp_int_lt(self, index: Optional[int] = None):
-        return self._add_instruction(Opcode.IF_ICMPLT, index)
+    def if_cmp_int_lt(self, target: Union[int, Label, None] = None):
+        return self._add_jump(Opcode.IF_ICMPLT, target)
 
-    def if_cmp_int_ge(self, index: Optional[int] = None):
-        return self._add_instruction(Opcode.IF_ICMPGE, index)
+    def if_cmp_int_ge(self, target: Union[int, Label, None] = None):
+        return self._add_jump(Opcode.IF_ICMPGE, target)
 
-    def if_cmp_int_gt(self, index: Optional[int] = None):
-        return self._add_instruction(Opcode.IF_ICMPGT, index)
+    def if_cmp_int_gt(self, target: Union[int, Label, None] = None):
+        return self._add_jump(Opcode.IF_ICMPGT, target)
 
-    def if_cmp_int_le(self, index: Optional[int] = None):
-        return self._add_instruction(Opcode.IF_ICMPLE, index)
+    def if_cmp_int_le(self, target: Union[int, Label, None] = None):
+        return self._add_jump(Opcode.IF_ICMPLE, target)
 
-    def if_cmp_reference_eq(self, index: Optional[int] = None):
-        return self._add_instruction(Opcode.IF_ACMPEQ, index)
+    def if_cmp_reference_eq(self, target: Union[int, Label, None] = None):
+        return self._add_jump(Opcode.IF_ACMPEQ, target)
 
-    def if_cmp_reference_ne(self, index: Optional[int] = None):
-        return self._add_instruction(Opcode.IF_ACMPNE, index)
+    def if_cmp_reference_ne(self, target: Union[int, Label, None] = None):
+        return self._add_jump(Opcode.IF_ACMPNE, target)
 
-    def goto(self, index: Optional[int] = None):
-        return self._add_instruction(Opcode.GOTO, index)
+    def goto(self, target: Union[int, Label, None] = None):
+        return self._add_jump(Opcode.GOTO, target)
 
     def update_jump(self, index: int, target: int):
         """
@@ -750,15 +903,178 @@ class Code:
         :param index: Index of the jump instruction.
         :param target: Index of the target instruction.
         """
-        try:
-            instruction = self._instructions[index]
-        except IndexError:
+        if not 0 <= index < len(self._opcodes):
             raise IndexError(f'No instruction on index {index}')
 
-        if not instruction[0].is_jump():
-            raise IndexError(f'No jump instruction on index {index}, {instruction[0]} found')
-
-        instruction[1] = target
+        if not IS_JUMP[self._opcodes[index]]:
+            raise IndexError(f'No jump instruction on index {index}, {OPCODES[self._opcodes[index]]} found')
+
+        self._operands[index] = target
+
+    def copy_instruction(self, source: 'Code', index: int, operand: Optional[int] = None):
+        """
+        Append the instruction of another code using the same constant pool.
+        :param source: The code the instruction is copied from.
+        :param index: Index of the instruction in the source code.
+        :param operand: The new first operand, e.g. the remapped jump target, or None to keep the original one.
+        """
+        descriptor = source._descriptors.get(index)
+        if descriptor is not None:
+            self._set_descriptor(descriptor)
+
+        self._opcodes.append(source._opcodes[index])
+        self._operands.append(source._operands[index] if operand is None else operand)
+        self._operands2.append(source._operands2[index])
+        self._stack_deltas.append(source._stack_deltas[index])
+
+    def replace_instructions(self, start: int, end: int, replacement: 'Code'):
+        """
+        Replace the instructions from start to end (exclusive) by the instructions of another code
+        using the same constant pool.
+        The jumps to the start lead to the first replacement instruction, the jumps to the end
+        to the instruction following the replacement. Jumps of the replacement are relative to its start.
+        :param start: Index of the first replaced instruction.
+        :param end: Index of the instruction following the replaced ones.
+        :param replacement: The code with the new instructions.
+        """
+        shift = len(replacement) - (end - start)
+
+        def new_index(index: int) -> int:
+            if index <= start:
+                return index
+            elif index < end:
+                return start
+            return index + shift
+
+        opcodes = self._opcodes[:start] + replacement._opcodes + self._opcodes[end:]
+        operands = self._operands[:start] + replacement._operands + self._operands[end:]
+
+        for (index, opcode) in enumerate(opcodes):
+            if not IS_JUMP[opcode] or operands[index] == NO_TARGET:
+                continue
+            if start <= index < start + len(replacement):
+                operands[index] += start
+            else:
+                operands[index] = new_index(operands[index])
+
+        descriptors = {}
+        for (index, descriptor) in self._descriptors.items():
+            if index < start:
+                descriptors[index] = descriptor
+            elif index >= end:
+                descriptors[index + shift] = descriptor
+        for (index, descriptor) in replacement._descriptors.items():
+            descriptors[index + start] = descriptor
+
+        self._opcodes = opcodes
+        self._operands = operands
+        self._operands2 = self._operands2[:start] + replacement._operands2 + self._operands2[end:]
+        self._stack_deltas = self._stack_deltas[:start] + replacement._stack_deltas + self._stack_deltas[end:]
+        self._descriptors = descriptors
+
+    def remove_instructions(self, indexes: Iterable[int]):
+        """
+        Remove the instructions and update the jumps targets.
+        A jump to a removed instruction is redirected to the next kept one.
+        :param indexes: Indexes of the instructions to remove.
+        """
+        removed = set(indexes)
+
+        if not removed:
+            return
+
+        # new index of every old instruction, including the end of the code
+        new_indexes = []
+        new_index = 0
+        for index in range(len(self._opcodes) + 1):
+            new_indexes.append(new_index)
+            if index not in removed:
+                new_index += 1
+
+        opcodes = array('H')
+        operands = array('i')
+        operands2 = array('i')
+        stack_deltas = array('i')
+        descriptors = {}
+        for index in range(len(self._opcodes)):
+            if index in removed:
+                continue
+
+            opcode = self._opcodes[index]
+            opcodes.append(opcode)
+            operand = self._operands[index]
+            operands.append(new_indexes[operand] if IS_JUMP[opcode] and operand != NO_TARGET else operand)
+            operands2.append(self._operands2[index])
+            stack_deltas.append(self._stack_deltas[index])
+
+            if index in self._descriptors:
+                descriptors[new_indexes[index]] = self._descriptors[index]
+
+        self._opcodes = opcodes
+        self._operands = operands
+        self._operands2 = operands2
+        self._stack_deltas = stack_deltas
+        self._descriptors = descriptors
+
+    def widen_jumps(self, indexes: Iterable[int]):
+        """
+        Replace the jumps by their wide forms with a 4 byte offset.
+        An unconditional jump becomes GOTO_W, a conditional jump becomes the negated condition
+        jumping over a new GOTO_W to the original target.
+        :param indexes: Indexes of the jump instructions to widen.
+        """
+        widened = set(indexes)
+
+        if not widened:
+            return
+
+        # new index of every old instruction, including the end of the code
+        new_indexes = []
+        new_index = 0
+        for index in range(len(self._opcodes) + 1):
+            new_indexes.append(new_index)
+            new_index += 1
+            if index in widened and self._opcodes[index] != Opcode.GOTO:
+                new_index += 1
+
+        opcodes = array('H')
+        operands = array('i')
+        operands2 = array('i')
+        stack_deltas = array('i')
+        descriptors = {}
+        for index in range(len(self._opcodes)):
+            opcode = self._opcodes[index]
+            operand = self._operands[index]
+            if IS_JUMP[opcode] and operand != NO_TARGET:
+                operand = new_indexes[operand]
+
+            if index in self._descriptors:
+                descriptors[new_indexes[index]] = self._descriptors[index]
+
+            if index not in widened:
+                opcodes.append(opcode)
+                operands.append(operand)
+                operands2.append(self._operands2[index])
+                stack_deltas.append(self._stack_deltas[index])
+                continue
+
+            if opcode != Opcode.GOTO:
+                # the negated condition jumps over the wide jump
+                opcodes.append(OPCODES[opcode].inverted())
+                operands.append(new_indexes[index + 1])
+                operands2.append(0)
+                stack_deltas.append(self._stack_deltas[index])
+
+            opcodes.append(Opcode.GOTO_W)
+            operands.append(operand)
+            operands2.append(0)
+            stack_deltas.append(Opcode.GOTO_W.stack_diff)
+
+        self._opcodes = opcodes
+        self._operands = operands
+        self._operands2 = operands2
+        self._stack_deltas = stack_deltas
+        self._descriptors = descriptors
 
     def return_int(self):
         self._add_instruction(Opcode.IRETURN)
@@ -780,21 +1096,25 @@ class Code:
 
     def load_static_field(self, class_name: str, name: str, descriptor: FieldDescriptor):
         self._set_stack_diff(descriptor.operand_size())
+        self._set_descriptor(descriptor)
         index = self._constant_pool.field_ref(class_name, name, descriptor)
         self._add_instruction(Opcode.GETSTATIC, index)
 
     def store_static_field(self, class_name: str, name: str, descriptor: FieldDescriptor):
         self._set_stack_diff(-descriptor.operand_size())
+        self._set_descriptor(descriptor)
         index = self._constant_pool.field_ref(class_name, name, descriptor)
         self._add_instruction(Opcode.PUTSTATIC, index)
 
     def load_field(self, class_name: str, name: str, descriptor: FieldDescriptor):
         self._set_stack_diff(-1 + descriptor.operand_size())
+        self._set_descriptor(descriptor)
         index = self._constant_pool.field_ref(class_name, name, descriptor)
         self._add_instruction(Opcode.GETFIELD, index)
 
     def store_field(self, class_name: str, name: str, descriptor: FieldDescriptor):
         self._set_stack_diff(-1 - descriptor.operand_size())
+        self._set_descriptor(descriptor)
         index = self._constant_pool.field_ref(class_name, name, descriptor)
         self._add_instruction(Opcode.PUTFIELD, index)
 
@@ -803,6 +1123,7 @@ class Code:
         ret_size = 0 if descriptor.return_descriptor is None else descriptor.return_descriptor.operand_size()
         diff = -1 - args_size + ret_size
         self._set_stack_diff(diff)
+        self._set_descriptor(descriptor)
         index = self._constant_pool.method_ref(class_name, name, descriptor)
         self._add_instruction(Opcode.INVOKEVIRTUAL, index)
 
@@ -811,22 +1132,30 @@ class Code:
         ret_size = 0 if descriptor.return_descriptor is None else descriptor.return_descriptor.operand_size()
         diff = -1 - args_size + ret_size
         self._set_stack_diff(diff)
+        self._set_descriptor(descriptor)
         index = self._constant_pool.method_ref(class_name, name, descriptor)
         self._add_instruction(Opcode.INVOKESPECIAL, index)
 
     def invoke_static(self, class_name: str, name: str, descriptor: MethodDescriptor):
         args_size = sum([p.operand_size() for p in descriptor.params_descriptors])
         ret_size = 0 if descriptor.return_descriptor is None else descriptor.return_descriptor.operand_size()
-        diff = -1 - args_size + ret_size
+        diff = -args_size + ret_size
         self._set_stack_diff(diff)
+        self._set_descriptor(descriptor)
         index = self._constant_pool.method_ref(class_name, name, descriptor)
         self._add_instruction(Opcode.INVOKESTATIC, index)
 
     def new(self, class_name: str):
         index = self._constant_pool.class_ref(class_name)
+        self._set_descriptor(ClassDesc(class_name))
         self._add_instruction(Opcode.NEW, index)
 
     def new_array(self, inner_descriptor: FieldDescriptor):
+        if isinstance(inner_descriptor, ArrayDesc):
+            self._set_descriptor(ArrayDesc(inner_descriptor.dim + 1, inner_descriptor.inner))
+        else:
+            self._set_descriptor(ArrayDesc(1, inner_descriptor))
+
         if isinstance(inner_descriptor, IntDesc):
             self._add_instruction(Opcode.NEWARRAY, ArrayType.INT)
         elif isinstance(inner_descriptor, LongDesc):
@@ -853,8 +1182,8 @@ class Code:
     def array_length(self):
         self._add_instruction(Opcode.ARRAYLENGTH)
 
-    def if_null(self, index: Optional[int] = None):
-        self._add_instruction(Opcode.IFNULL, index)
+    def if_null(self, target: Union[int, Label, None] = None):
+        self._add_jump(Opcode.IFNULL, target)
 
-    def if_non_null(self, index: Optional[int] = None):
-        self._add_instruction(Opcode.IFNONNULL, index)
+    def if_non_null(self, target: Union[int, Label, None] = None):
+        self._add_jump(Opcode.IFNONNULL, target)
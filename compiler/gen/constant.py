@@ -1,12 +1,20 @@
-from abc import ABC, abstractmethod
-from enum import Enum
-from typing import Dict
+import struct
+from array import array
+from enum import IntEnum
+from typing import Dict, List
 
 from compiler.gen.descriptor import MethodDescriptor, FieldDescriptor, ArrayDesc, ClassDesc
 from compiler.util import is_int, is_long
 
+# the constant pool count is an unsigned 2 bytes number and the indexing starts from 1
+MAX_CONSTANT_INDEX = 65534
 
-class Tag(Enum):
+
+class ConstantPoolError(Exception):
+    pass
+
+
+class Tag(IntEnum):
     UTF8 = 1
     INTEGER = 3
     FLOAT = 4
@@ -19,200 +27,96 @@ class Tag(Enum):
     NAME_AND_TYPE = 12
 
 
-class JConst(ABC):
-
-    @abstractmethod
-    def tag(self) -> Tag:
-        pass
-
-
-class JConstUtf8(JConst):
-    def __init__(self, value: str):
-        self.value = value
-
-    def tag(self) -> Tag:
-        return Tag.UTF8
-
-    def __hash__(self):
-        return hash(self.value)
-
-    def __eq__(self, other):
-        return isinstance(other, self.__class__) \
-               and self.value == other.value
-
-
-class JConstInt(JConst):
-    def __init__(self, value: int):
-        assert is_int(value)
-        self.value = value
-
-    def tag(self) -> int:
-        return Tag.INT
-
-    def __hash__(self):
-        return hash(self.value)
-
-    def __eq__(self, other):
-        return isinstance(other, self.__class__) \
-               and self.value == other.value
-
-
-class JConstLong(JConst):
-    def __init__(self, value: int):
-        assert is_long(value)
-        self.value = value
-
-    def tag(self) -> Tag:
-        return Tag.LONG
-
-    def __hash__(self):
-        return hash(self.value)
-
-    def __eq__(self, other):
-        return isinstance(other, self.__class__) \
-               and self.value == other.value
-
-
-class JConstFloat(JConst):
-    def __init__(self, value: float):
-        self.value = value
-
-    def tag(self) -> Tag:
-        return Tag.FLOAT
-
-    def __hash__(self):
-        return hash(self.value)
-
-    def __eq__(self, other):
-        return isinstance(other, self.__class__) \
-               and self.value == other.value
-
-
-class JConstDouble(JConst):
-    def __init__(self, value: float):
-        self.value = value
-
-    def tag(self) -> Tag:
-        return Tag.DOUBLE
-
-    def __hash__(self):
-        return hash(self.value)
-
-    def __eq__(self, other):
-        return isinstance(other, self.__class__) \
-               and self.value == other.value
+# the constants whose payload is made of the indexes of other constants
+_REFERENCING_TAGS = frozenset({Tag.CLASS, Tag.STRING, Tag.FIELD_REF, Tag.METHOD_REF, Tag.NAME_AND_TYPE})
+# the constants taking two entries
+_WIDE_TAGS = frozenset({Tag.LONG, Tag.DOUBLE})
 
-
-class JConstString(JConst):
-    def __init__(self, utf8_index: int):
-        self.utf8_index = utf8_index
-
-    def tag(self) -> Tag:
-        return Tag.STRING
-
-    def __hash__(self):
-        return hash(self.utf8_index)
-
-    def __eq__(self, other):
-        return isinstance(other, self.__class__) \
-               and self.utf8_index == other.utf8_index
-
-
-class JConstClass(JConst):
-    def tag(self) -> Tag:
-        return Tag.CLASS
-
-    def __init__(self, name_index: int):
-        self.name_index = name_index
-
-    def __hash__(self):
-        return hash((self.name_index,))
-
-    def __eq__(self, other):
-        return isinstance(other, self.__class__) \
-               and self.name_index == other.name_index
-
-
-class JConstNameAndType(JConst):
-    def __init__(self, name_index: int, descriptor_index: int):
-        self.name_index = name_index
-        self.descriptor_index = descriptor_index
-
-    def tag(self) -> Tag:
-        return Tag.NAME_AND_TYPE
-
-    def __hash__(self):
-        return hash((self.name_index, self.descriptor_index))
-
-    def __eq__(self, other):
-        return isinstance(other, self.__class__) \
-               and self.name_index == other.name_index \
-               and self.descriptor_index == other.descriptor_index
-
-
-class JConstFieldRef(JConst):
-    def __init__(self, class_index: int, name_and_type_index: int):
-        self.class_index = class_index
-        self.name_and_type_index = name_and_type_index
-
-    def tag(self) -> Tag:
-        return Tag.FIELD_REF
-
-    def __hash__(self):
-        return hash((self.class_index, self.name_and_type_index))
-
-    def __eq__(self, other):
-        return isinstance(other, self.__class__) \
-               and self.class_index == other.class_index \
-               and self.name_and_type_index == other.name_and_type_index
-
-
-class JConstMethodRef(JConst):
-    def __init__(self, class_index: int, name_and_type_index: int):
-        self.class_index = class_index
-        self.name_and_type_index = name_and_type_index
-
-    def tag(self) -> Tag:
-        return Tag.METHOD_REF
-
-    def __hash__(self):
-        return hash((self.class_index, self.name_and_type_index))
-
-    def __eq__(self, other):
-        return isinstance(other, self.__class__) \
-               and self.class_index == other.class_index \
-               and self.name_and_type_index == other.name_and_type_index
+_FLOAT_BITS = struct.Struct('>f')
+_DOUBLE_BITS = struct.Struct('>d')
 
 
 class ConstantPool:
     def __init__(self):
-        self._constants: Dict[JConst, int] = {}
-
-    def _add(self, const: JConst) -> int:
-        index = self._constants.get(const)
+        # Key = constant as a tuple (tag, payload...), Value = index, used only to share the equal constants
+        self._indexes: Dict[tuple, int] = {}
+        # the constants in the order of their indexes
+        self._constants: List[tuple] = []
+        self._next_index: int = 1   # constant pool is indexed from 1
+
+    def _add(self, constant: tuple, slots: int = 1) -> int:
+        """
+        Get the index of the constant, add the constant if not present yet.
+        :param constant: Tuple of the tag and the payload as written into the class file.
+        :param slots: Number of the constant pool entries taken by the constant.
+        :return: Index of the constant.
+        """
+        index = self._indexes.get(constant)
 
         if index is None:
-            index = len(self._constants) + 1    # constant pool is indexed from 1
-            self._constants[const] = index
+            index = self._next_index
+
+            # long and double constants take two entries
+            if index + slots - 1 > MAX_CONSTANT_INDEX:
+                raise ConstantPoolError(f'Too many constants, the constant pool is limited to '
+                                        f'{MAX_CONSTANT_INDEX} entries.')
+
+            self._indexes[constant] = index
+            self._constants.append(constant)
+            self._next_index += slots
 
         return index
 
     @property
-    def constants(self):
+    def constants(self) -> List[tuple]:
+        """
+        The constants in the order of their indexes, each a tuple of the tag and the payload:
+        str for UTF8, int for INTEGER and LONG, the big-endian bits for FLOAT and DOUBLE
+        and the indexes of the referenced constants for the others.
+        """
         return self._constants
 
+    @property
+    def count(self) -> int:
+        """
+        The constant pool count as written into the class file, the number of entries increased by one.
+        """
+        return self._next_index
+
+    def merge(self, constants: List[tuple]) -> array:
+        """
+        Add the constants of another constant pool in its order, the equal constants are shared.
+        A constant only references the constants before it, so they are already merged when it is added.
+        :param constants: The constants of the other constant pool.
+        :return: The indexes in this constant pool, Index = index in the other constant pool.
+        """
+        indexes = array('i', [0])
+
+        for constant in constants:
+            tag = constant[0]
+
+            if tag in _REFERENCING_TAGS:
+                constant = (tag, *(indexes[i] for i in constant[1:]))
+
+            if tag in _WIDE_TAGS:
+                indexes.append(self._add(constant, 2))
+                indexes.append(0)
+            else:
+                indexes.append(self._add(constant))
+
+        return indexes
+
     def utf8(self, value: str) -> int:
-        return self._add(JConstUtf8(value))
+        return self._add((Tag.UTF8, value))
 
     def class_ref(self, class_name: str) -> int:
-        class_name = class_name
         name_index = self.utf8(class_name)
-        class_index = self._add(JConstClass(name_index))
+        class_index = self._add((Tag.CLASS, name_index))
         return class_index
 
     def array_ref(self, descriptor: ArrayDesc) -> int:
         name_index = self.utf8(descriptor.utf8())
-        class_index = self._add(JConstClass(name_index))
+        class_index = self._add((Tag.CLASS, name_index))
         return class_index
 
     def field_name(self, name: str) -> int:
@@ -225,8 +129,8 @@ class ConstantPool:
         class_index = self.class_ref(class_name)
         name_index = self.field_name(name)
         descriptor_index = self.field_descriptor(descriptor)
-        name_and_type_index = self._add(JConstNameAndType(name_index, descriptor_index))
-        field_index = self._add(JConstFieldRef(class_index, name_and_type_index))
+        name_and_type_index = self._add((Tag.NAME_AND_TYPE, name_index, descriptor_index))
+        field_index = self._add((Tag.FIELD_REF, class_index, name_and_type_index))
         return field_index
 
     def method_name(self, name: str) -> int:
@@ -239,23 +143,27 @@ class ConstantPool:
         class_index = self.class_ref(class_name)
         name_index = self.method_name(name)
         descriptor_index = self.method_descriptor(descriptor)
-        name_and_type_index = self._add(JConstNameAndType(name_index, descriptor_index))
-        method_index = self._add(JConstMethodRef(class_index, name_and_type_index))
+        name_and_type_index = self._add((Tag.NAME_AND_TYPE, name_index, descriptor_index))
+        method_index = self._add((Tag.METHOD_REF, class_index, name_and_type_index))
         return method_index
 
     def int(self, value: int) -> int:
-        return self._add(JConstInt(value))
+        assert is_int(value)
+        return self._add((Tag.INTEGER, value))
 
     def long(self, value: int) -> int:
-        return self._add(JConstLong(value))
+        assert is_long(value)
+        return self._add((Tag.LONG, value), 2)
 
     def float(self, value: float) -> int:
-        return self._add(JConstFloat(value))
+        # stored by bits, 0.0 and -0.0 are different constants
+        return self._add((Tag.FLOAT, _FLOAT_BITS.pack(value)))
 
     def double(self, value: float) -> int:
-        return self._add(JConstDouble(value))
+        # stored by bits, 0.0 and -0.0 are different constants
+        return self._add((Tag.DOUBLE, _DOUBLE_BITS.pack(value)), 2)
 
     def string(self, value: str) -> int:
         utf8_index = self.utf8(value)
-        string_index = self._add(JConstString(utf8_index))
+        string_index = self._add((Tag.STRING, utf8_index))
         return string_index
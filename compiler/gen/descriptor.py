@@ -1,6 +1,8 @@
 from abc import abstractmethod, ABC
 from typing import List, Optional, Iterable, Tuple
 
+from compiler.util import Interned
+
 
 # --- Java operand types ---
 
@@ -37,7 +39,11 @@ class JOperandTypeReference(JOperandType):
 
 # --- Java type descriptors ---
 
-class Descriptor:
+class Descriptor(metaclass=Interned):
+    """
+    Immutable descriptor, the instances with the same value are shared.
+    """
+
     @abstractmethod
     def utf8(self) -> str:
         pass
@@ -48,14 +54,18 @@ class Descriptor:
     def __hash__(self):
         return hash(self.__class__)
 
+    def __reduce__(self):
+        # the unpickled instance is shared too
+        return self.__class__, ()
+
 
-class FieldDescriptor(Descriptor, ABC):
+class FieldDescriptor(Descriptor):
     @abstractmethod
     def operand_size(self):
         pass
 
 
-class BaseDescriptor(FieldDescriptor, ABC):
+class BaseDescriptor(FieldDescriptor):
     pass
 
 
@@ -134,6 +144,7 @@ class LongDesc(BaseDescriptor):
 class ClassDesc(BaseDescriptor):
     def __init__(self, class_name: str):
         self._class_name = class_name
+        self._utf8: str = f'L{class_name};'
 
     def operand_size(self):
         return 1
@@ -143,7 +154,7 @@ class ClassDesc(BaseDescriptor):
         return self._class_name
 
     def utf8(self) -> str:
-        return f'L{self._class_name};'
+        return self._utf8
 
     def __str__(self):
         return self._class_name
@@ -157,6 +168,9 @@ class ClassDesc(BaseDescriptor):
     def __hash__(self):
         return hash(self._class_name)
 
+    def __reduce__(self):
+        return self.__class__, (self._class_name,)
+
 
 class ShortDesc(BaseDescriptor):
 
@@ -187,6 +201,8 @@ class ArrayDesc(FieldDescriptor):
         assert 1 <= dim <= 255
         self._dim: int = dim
         self._inner: BaseDescriptor = inner
+        self._utf8: str = dim * '[' + inner.utf8()
+        self._hash: int = hash((dim, inner))
 
     def operand_size(self):
         return 1
@@ -200,7 +216,7 @@ class ArrayDesc(FieldDescriptor):
         return self._inner
 
     def utf8(self) -> str:
-        return self._dim * '[' + self._inner.utf8()
+        return self._utf8
 
     def __str__(self):
         return "{0}{1}".format(self._inner, (self._dim * '[]'))
@@ -212,7 +228,10 @@ class ArrayDesc(FieldDescriptor):
         return self._dim == other._dim and self._inner == other._inner
 
     def __hash__(self):
-        return hash((self._dim, self._inner))
+        return self._hash
+
+    def __reduce__(self):
+        return self.__class__, (self._dim, self._inner)
 
 
 class MethodDescriptor(Descriptor):
@@ -220,6 +239,14 @@ class MethodDescriptor(Descriptor):
     def __init__(self, params_descriptor: Iterable[FieldDescriptor], return_descriptor: Optional[FieldDescriptor] = None):
         self._params_descriptors: Tuple[FieldDescriptor] = tuple(params_descriptor)
         self._return_descriptor: Optional[FieldDescriptor] = return_descriptor
+        self._utf8: str = '({0}){1}'.format(''.join(d.utf8() for d in self._params_descriptors),
+                                            'V' if return_descriptor is None else return_descriptor.utf8())
+        self._hash: int = hash((self._params_descriptors, return_descriptor))
+
+    @classmethod
+    def _intern_args(cls, params_descriptor: Iterable[FieldDescriptor],
+                     return_descriptor: Optional[FieldDescriptor] = None) -> tuple:
+        return tuple(params_descriptor), return_descriptor
 
     @property
     def params_descriptors(self):
@@ -230,8 +257,7 @@ class MethodDescriptor(Descriptor):
         return self._return_descriptor
 
     def utf8(self) -> str:
-        return '({0}){1}'.format(''.join(map(lambda d: d.utf8(), self._params_descriptors)),
-                                 'V' if self._return_descriptor is None else self._return_descriptor.utf8())
+        return self._utf8
 
     def __str__(self):
         return '{0} ({1})'.format(self._return_descriptor, ', '.join(map(lambda p: str(p), self._params_descriptors)))
@@ -244,4 +270,37 @@ class MethodDescriptor(Descriptor):
             and self._return_descriptor == other._return_descriptor
 
     def __hash__(self):
-        return hash((self._params_descriptors, self._return_descriptor))
+        return self._hash
+
+    def __reduce__(self):
+        return self.__class__, (self._params_descriptors, self._return_descriptor)
+
+
+# Key = base type descriptor character, Value = descriptor class
+_BASE_DESCRIPTORS = {
+    'B': ByteDesc,
+    'C': CharDesc,
+    'D': DoubleDesc,
+    'F': FloatDesc,
+    'I': IntDesc,
+    'J': LongDesc,
+    'S': ShortDesc,
+    'Z': BooleanDesc,
+}
+
+
+def parse_field_descriptor(value: str) -> FieldDescriptor:
+    """
+    Create the field descriptor from its string form.
+    :param value: The descriptor string, e.g. 'I', 'Ljava/lang/String;' or '[[D'.
+    :return: The field descriptor.
+    """
+    dim = len(value) - len(value.lstrip('['))
+    inner = value[dim:]
+
+    if inner[0] == 'L':
+        base = ClassDesc(inner[1:-1])
+    else:
+        base = _BASE_DESCRIPTORS[inner]()
+
+    return base if dim == 0 else ArrayDesc(dim, base)
@@ -0,0 +1,515 @@
+from enum import IntEnum
+from typing import List, Optional, Tuple, Any, Dict, Iterable
+
+from compiler.gen.code import Code
+from compiler.gen.descriptor import FieldDescriptor, MethodDescriptor
+from compiler.gen.opcode import Opcode, OPCODES, IS_JUMP, IS_TERMINATOR
+
+
+class FlowError(Exception):
+    pass
+
+
+def successors(code: Code, index: int) -> List[int]:
+    """
+    Indexes of the instructions which can be executed right after the instruction.
+    The index may point outside the code if the code is not terminated properly or a jump target is not set.
+    :param code: The code.
+    :param index: Index of the instruction.
+    :return: List of the successors indexes.
+    """
+    opcode = code.opcodes[index]
+    result = []
+
+    if IS_JUMP[opcode]:
+        result.append(code.operands[index])
+
+    if not IS_TERMINATOR[opcode]:
+        result.append(index + 1)
+
+    return result
+
+
+def reachable(code: Code) -> List[bool]:
+    """
+    Find the instructions reachable from the start of the code.
+    :param code: The code.
+    :return: Reachability flag for every instruction.
+    """
+    size = len(code)
+    visited = [False] * size
+    work = [0] if size else []
+
+    opcodes = code.opcodes
+    operands = code.operands
+
+    while work:
+        index = work.pop()
+
+        # follow the straight-line instructions, only the jump targets go through the work list
+        while 0 <= index < size and not visited[index]:
+            visited[index] = True
+            opcode = opcodes[index]
+            if IS_JUMP[opcode]:
+                work.append(operands[index])
+            if IS_TERMINATOR[opcode]:
+                break
+            index += 1
+
+    return visited
+
+
+def max_stack(code: Code) -> int:
+    """
+    Compute the maximum operand stack depth of the code.
+    The stack depth is propagated along all the control flow paths,
+    every instruction must be reached with the same depth from all its predecessors.
+    :param code: The code.
+    :return: The maximum stack depth in words.
+    """
+    size = len(code)
+    opcodes = code.opcodes
+    operands = code.operands
+    stack_deltas = code.stack_deltas
+    depths: List[Optional[int]] = [None] * size
+    result = 0
+
+    if size == 0:
+        return result
+
+    depths[0] = 0
+    work = [0]
+
+    while work:
+        index = work.pop()
+        depth = depths[index]
+
+        # follow the straight-line instructions, only the jump targets go through the work list
+        while True:
+            depth += stack_deltas[index]
+            if depth < 0:
+                raise FlowError(f'Operand stack underflow at instruction {index} ({OPCODES[opcodes[index]].name}).')
+
+            if result < depth:
+                result = depth
+
+            opcode = opcodes[index]
+            successor_indexes = []
+            if IS_JUMP[opcode]:
+                successor_indexes.append(operands[index])
+            if not IS_TERMINATOR[opcode]:
+                successor_indexes.append(index + 1)
+
+            following = None
+            for s in successor_indexes:
+                if not 0 <= s < size:
+                    raise FlowError(f'Execution falls off the end of the code after instruction {index} '
+                                    f'({OPCODES[opcode].name}).')
+
+                if depths[s] is None:
+                    depths[s] = depth
+                    if s == index + 1:
+                        following = s
+                    else:
+                        work.append(s)
+                elif depths[s] != depth:
+                    raise FlowError(f'Inconsistent operand stack depth at instruction {s} '
+                                    f'({OPCODES[opcodes[s]].name}): {depths[s]} and {depth}.')
+
+            if following is None:
+                break
+            index = following
+
+    return result
+
+
+# --- Verification types ---
+
+class VTag(IntEnum):
+    TOP = 0
+    INTEGER = 1
+    FLOAT = 2
+    DOUBLE = 3
+    LONG = 4
+    NULL = 5
+    UNINITIALIZED_THIS = 6
+    OBJECT = 7
+    UNINITIALIZED = 8
+
+
+# (tag, class name for objects or index of the NEW instruction for uninitialized)
+VType = Tuple[VTag, Any]
+Frame = Tuple[Tuple[VType, ...], Tuple[VType, ...]]
+
+VT_TOP = (VTag.TOP, None)
+VT_INTEGER = (VTag.INTEGER, None)
+VT_FLOAT = (VTag.FLOAT, None)
+VT_DOUBLE = (VTag.DOUBLE, None)
+VT_LONG = (VTag.LONG, None)
+VT_NULL = (VTag.NULL, None)
+
+_PRIMITIVE_VTYPES = {
+    'I': VT_INTEGER,
+    'Z': VT_INTEGER,
+    'B': VT_INTEGER,
+    'C': VT_INTEGER,
+    'S': VT_INTEGER,
+    'F': VT_FLOAT,
+    'J': VT_LONG,
+    'D': VT_DOUBLE,
+}
+
+
+def is_wide(vtype: VType) -> bool:
+    """
+    Check whether the value occupies two words.
+    """
+    return vtype == VT_LONG or vtype == VT_DOUBLE
+
+
+def _field_vtype(descriptor: str) -> VType:
+    """
+    Verification type of the value described by the field descriptor string.
+    """
+    if descriptor[0] == 'L':
+        return VTag.OBJECT, descriptor[1:-1]
+    elif descriptor[0] == '[':
+        return VTag.OBJECT, descriptor
+    else:
+        return _PRIMITIVE_VTYPES[descriptor]
+
+
+def _vtype(descriptor: FieldDescriptor) -> VType:
+    return _field_vtype(descriptor.utf8())
+
+
+def _component_vtype(array: VType) -> VType:
+    if array == VT_NULL:
+        return VT_NULL
+    return _field_vtype(array[1][1:])
+
+
+# Key = opcode, Value = (number of popped values, pushed type)
+_SIMPLE_EFFECTS: Dict[Opcode, Tuple[int, Optional[VType]]] = {
+    Opcode.NOOP: (0, None),
+    Opcode.ACONST_NULL: (0, VT_NULL),
+    Opcode.LCONST_0: (0, VT_LONG),
+    Opcode.LCONST_1: (0, VT_LONG),
+    Opcode.FCONST_0: (0, VT_FLOAT),
+    Opcode.FCONST_1: (0, VT_FLOAT),
+    Opcode.FCONST_2: (0, VT_FLOAT),
+    Opcode.DCONST_0: (0, VT_DOUBLE),
+    Opcode.DCONST_1: (0, VT_DOUBLE),
+    Opcode.BIPUSH: (0, VT_INTEGER),
+    Opcode.SIPUSH: (0, VT_INTEGER),
+    Opcode.IALOAD: (2, VT_INTEGER),
+    Opcode.LALOAD: (2, VT_LONG),
+    Opcode.FALOAD: (2, VT_FLOAT),
+    Opcode.DALOAD: (2, VT_DOUBLE),
+    Opcode.BALOAD: (2, VT_INTEGER),
+    Opcode.CALOAD: (2, VT_INTEGER),
+    Opcode.SALOAD: (2, VT_INTEGER),
+    Opcode.IASTORE: (3, None),
+    Opcode.LASTORE: (3, None),
+    Opcode.FASTORE: (3, None),
+    Opcode.DASTORE: (3, None),
+    Opcode.AASTORE: (3, None),
+    Opcode.BASTORE: (3, None),
+    Opcode.CASTORE: (3, None),
+    Opcode.SASTORE: (3, None),
+    Opcode.POP: (1, None),
+    Opcode.INEG: (1, VT_INTEGER),
+    Opcode.LNEG: (1, VT_LONG),
+    Opcode.FNEG: (1, VT_FLOAT),
+    Opcode.DNEG: (1, VT_DOUBLE),
+    Opcode.IINC: (0, None),
+    Opcode.I2L: (1, VT_LONG),
+    Opcode.I2F: (1, VT_FLOAT),
+    Opcode.I2D: (1, VT_DOUBLE),
+    Opcode.L2I: (1, VT_INTEGER),
+    Opcode.L2F: (1, VT_FLOAT),
+    Opcode.L2D: (1, VT_DOUBLE),
+    Opcode.F2I: (1, VT_INTEGER),
+    Opcode.F2L: (1, VT_LONG),
+    Opcode.F2D: (1, VT_DOUBLE),
+    Opcode.D2I: (1, VT_INTEGER),
+    Opcode.D2L: (1, VT_LONG),
+    Opcode.D2F: (1, VT_FLOAT),
+    Opcode.I2B: (1, VT_INTEGER),
+    Opcode.I2C: (1, VT_INTEGER),
+    Opcode.I2S: (1, VT_INTEGER),
+    Opcode.LCMP: (2, VT_INTEGER),
+    Opcode.FCMPL: (2, VT_INTEGER),
+    Opcode.FCMPG: (2, VT_INTEGER),
+    Opcode.DCMPL: (2, VT_INTEGER),
+    Opcode.DCMPG: (2, VT_INTEGER),
+    Opcode.IFEQ: (1, None),
+    Opcode.IFNE: (1, None),
+    Opcode.IFLT: (1, None),
+    Opcode.IFGE: (1, None),
+    Opcode.IFGT: (1, None),
+    Opcode.IFLE: (1, None),
+    Opcode.IF_ICMPEQ: (2, None),
+    Opcode.IF_ICMPNE: (2, None),
+    Opcode.IF_ICMPLT: (2, None),
+    Opcode.IF_ICMPGE: (2, None),
+    Opcode.IF_ICMPGT: (2, None),
+    Opcode.IF_ICMPLE: (2, None),
+    Opcode.IF_ACMPEQ: (2, None),
+    Opcode.IF_ACMPNE: (2, None),
+    Opcode.GOTO: (0, None),
+    Opcode.GOTO_W: (0, None),
+    Opcode.IRETURN: (1, None),
+    Opcode.LRETURN: (1, None),
+    Opcode.FRETURN: (1, None),
+    Opcode.DRETURN: (1, None),
+    Opcode.ARETURN: (1, None),
+    Opcode.RETURN: (0, None),
+    Opcode.ARRAYLENGTH: (1, VT_INTEGER),
+    Opcode.ATHROW: (1, None),
+    Opcode.MONITORENTER: (1, None),
+    Opcode.MONITOREXIT: (1, None),
+    Opcode.IFNULL: (1, None),
+    Opcode.IFNONNULL: (1, None),
+}
+
+for _prefix, _vt in (('I', VT_INTEGER), ('L', VT_LONG), ('F', VT_FLOAT), ('D', VT_DOUBLE)):
+    for _name in ('ADD', 'SUB', 'MUL', 'DIV', 'REM', 'SHL', 'SHR', 'USHR', 'AND', 'OR', 'XOR'):
+        if _prefix + _name in Opcode.__members__:
+            _SIMPLE_EFFECTS[Opcode[_prefix + _name]] = (2, _vt)
+
+for _value in range(-1, 6):
+    _SIMPLE_EFFECTS[Opcode['ICONST_M1' if _value < 0 else f'ICONST_{_value}']] = (0, VT_INTEGER)
+
+# Key = opcode, Value = (type, local variable index or None if it is an operand)
+_LOADS: Dict[Opcode, Tuple[Optional[VType], Optional[int]]] = {}
+_STORES: Dict[Opcode, Optional[int]] = {}
+
+for _prefix, _vt in (('I', VT_INTEGER), ('L', VT_LONG), ('F', VT_FLOAT), ('D', VT_DOUBLE), ('A', None)):
+    _LOADS[Opcode[_prefix + 'LOAD']] = (_vt, None)
+    _STORES[Opcode[_prefix + 'STORE']] = None
+    for _index in range(4):
+        _LOADS[Opcode[f'{_prefix}LOAD_{_index}']] = (_vt, _index)
+        _STORES[Opcode[f'{_prefix}STORE_{_index}']] = _index
+
+
+def _pop(stack: List[VType], count: int):
+    if count > len(stack):
+        raise FlowError('Operand stack underflow.')
+    del stack[len(stack) - count:]
+
+
+def _execute(code: Code, index: int, locals_types: List[VType], stack: List[VType]):
+    """
+    Apply the instruction effect on the types of the local variables and the operand stack.
+    """
+    opcode = code.opcodes[index]
+
+    effect = _SIMPLE_EFFECTS.get(opcode)
+    if effect is not None:
+        _pop(stack, effect[0])
+        if effect[1] is not None:
+            stack.append(effect[1])
+        return
+
+    if opcode in _LOADS:
+        (vtype, local) = _LOADS[opcode]
+        local = code.operands[index] if local is None else local
+        stack.append(locals_types[local] if vtype is None else vtype)
+        return
+
+    if opcode in _STORES:
+        local = _STORES[opcode]
+        local = code.operands[index] if local is None else local
+        vtype = stack[-1]
+        _pop(stack, 1)
+        if local > 0 and is_wide(locals_types[local - 1]):
+            locals_types[local - 1] = VT_TOP
+        locals_types[local] = vtype
+        if is_wide(vtype):
+            locals_types[local + 1] = VT_TOP
+        return
+
+    if opcode == Opcode.AALOAD:
+        array = stack[-2]
+        _pop(stack, 2)
+        stack.append(_component_vtype(array))
+    elif opcode == Opcode.POP2:
+        _pop(stack, 1 if is_wide(stack[-1]) else 2)
+    elif opcode == Opcode.DUP:
+        stack.append(stack[-1])
+    elif opcode == Opcode.DUP_X1:
+        stack.insert(-2, stack[-1])
+    elif opcode == Opcode.DUP_X2:
+        stack.insert(-2 if is_wide(stack[-2]) else -3, stack[-1])
+    elif opcode == Opcode.DUP2:
+        stack.extend(stack[-1:] if is_wide(stack[-1]) else stack[-2:])
+    elif opcode == Opcode.DUP2_X1:
+        if is_wide(stack[-1]):
+            stack.insert(-2, stack[-1])
+        else:
+            stack[-3:-3] = stack[-2:]
+    elif opcode == Opcode.DUP2_X2:
+        top = stack[-1:] if is_wide(stack[-1]) else stack[-2:]
+        below = stack[-len(top) - 1]
+        depth = len(top) + (1 if is_wide(below) else 2)
+        stack[-depth:-depth] = top
+    elif opcode == Opcode.SWAP:
+        stack[-1], stack[-2] = stack[-2], stack[-1]
+    elif opcode in (Opcode.LDC, Opcode.LDC_W, Opcode.LDC2_W, Opcode.GETSTATIC):
+        stack.append(_vtype(code.instruction_descriptor(index)))
+    elif opcode == Opcode.PUTSTATIC:
+        _pop(stack, 1)
+    elif opcode == Opcode.GETFIELD:
+        _pop(stack, 1)
+        stack.append(_vtype(code.instruction_descriptor(index)))
+    elif opcode == Opcode.PUTFIELD:
+        _pop(stack, 2)
+    elif opcode in (Opcode.INVOKEVIRTUAL, Opcode.INVOKESPECIAL, Opcode.INVOKESTATIC, Opcode.INVOKEINTERFACE):
+        descriptor = code.instruction_descriptor(index)
+        _pop(stack, len(descriptor.params_descriptors))
+
+        if opcode != Opcode.INVOKESTATIC:
+            receiver = stack[-1]
+            _pop(stack, 1)
+
+            # constructor call initializes all the copies of the created object
+            if opcode == Opcode.INVOKESPECIAL and receiver[0] == VTag.UNINITIALIZED:
+                initialized = (VTag.OBJECT, code.instruction_descriptor(receiver[1]).class_name)
+                stack[:] = [initialized if v == receiver else v for v in stack]
+                locals_types[:] = [initialized if v == receiver else v for v in locals_types]
+
+        if descriptor.return_descriptor is not None:
+            stack.append(_vtype(descriptor.return_descriptor))
+    elif opcode == Opcode.NEW:
+        stack.append((VTag.UNINITIALIZED, index))
+    elif opcode in (Opcode.NEWARRAY, Opcode.ANEWARRAY):
+        _pop(stack, 1)
+        stack.append(_vtype(code.instruction_descriptor(index)))
+    else:
+        raise NotImplementedError(opcode)
+
+
+def _merge_vtypes(a: VType, b: VType) -> Optional[VType]:
+    if a == b:
+        return a
+    if a == VT_NULL and b[0] == VTag.OBJECT:
+        return b
+    if b == VT_NULL and a[0] == VTag.OBJECT:
+        return a
+    return None
+
+
+def _merge(index: int, old: Frame, new: Frame) -> Frame:
+    """
+    Merge the frames of two control flow paths.
+    The local variables with different types become unusable,
+    the operand stacks must hold the same types.
+    """
+    if len(old[1]) != len(new[1]):
+        raise FlowError(f'Inconsistent operand stack depth at instruction {index}.')
+
+    stack = []
+    for (a, b) in zip(old[1], new[1]):
+        vtype = _merge_vtypes(a, b)
+        if vtype is None:
+            raise FlowError(f'Inconsistent operand stack types at instruction {index}.')
+        stack.append(vtype)
+
+    locals_types = []
+    for (a, b) in zip(old[0], new[0]):
+        vtype = _merge_vtypes(a, b)
+        locals_types.append(VT_TOP if vtype is None else vtype)
+
+    return tuple(locals_types), tuple(stack)
+
+
+def initial_frame(code: Code, descriptor: MethodDescriptor) -> Frame:
+    """
+    The frame at the start of a static method.
+    :param code: The method code.
+    :param descriptor: The method descriptor.
+    :return: The frame with the parameters in local variables and an empty stack.
+    """
+    locals_types = []
+    for p in descriptor.params_descriptors:
+        vtype = _vtype(p)
+        locals_types.append(vtype)
+        if is_wide(vtype):
+            locals_types.append(VT_TOP)
+
+    locals_types.extend([VT_TOP] * (code.locals_size - len(locals_types)))
+    return tuple(locals_types), ()
+
+
+def frame_targets(code: Code) -> List[int]:
+    """
+    Indexes of the instructions which need a stack map frame,
+    the jump targets and the instructions following an unconditional jump.
+    :param code: The code.
+    :return: Sorted list of the instructions indexes.
+    """
+    size = len(code)
+    targets = set()
+
+    for (index, opcode) in enumerate(code.opcodes):
+        if IS_JUMP[opcode]:
+            targets.add(code.operands[index])
+        if IS_TERMINATOR[opcode] and index + 1 < size:
+            targets.add(index + 1)
+
+    return sorted(targets)
+
+
+def frames(code: Code, descriptor: MethodDescriptor, targets: Iterable[int]) -> Dict[int, Frame]:
+    """
+    Compute the types of the local variables and the operand stack
+    at the start of the instructions.
+    :param code: The code without unreachable instructions.
+    :param descriptor: The method descriptor.
+    :param targets: Indexes of the instructions whose frames are returned.
+    :return: Frames of the target instructions.
+    """
+    size = len(code)
+    in_frames: List[Optional[Frame]] = [None] * size
+
+    if size == 0:
+        return {}
+
+    in_frames[0] = initial_frame(code, descriptor)
+    work = [0]
+
+    while work:
+        index = work.pop()
+        (locals_types, stack) = in_frames[index]
+        locals_types = list(locals_types)
+        stack = list(stack)
+
+        try:
+            _execute(code, index, locals_types, stack)
+        except (FlowError, IndexError):
+            raise FlowError(f'Operand stack underflow or invalid local variable at instruction {index} '
+                            f'({OPCODES[code.opcodes[index]].name}).')
+
+        out_frame = (tuple(locals_types), tuple(stack))
+
+        for s in successors(code, index):
+            if not 0 <= s < size:
+                continue
+
+            if in_frames[s] is None:
+                in_frames[s] = out_frame
+                work.append(s)
+            else:
+                merged = _merge(s, in_frames[s], out_frame)
+                if merged != in_frames[s]:
+                    in_frames[s] = merged
+                    work.append(s)
+
+    result = {}
+    for t in targets:
+        if in_frames[t] is None:
+            raise FlowError(f'Unreachable instruction {t} ({OPCODES[code.opcodes[t]].name}).')
+        result[t] = in_frames[t]
+
+    return result
@@ -1,4 +1,8 @@
-from typing import Optional, List, Dict, Tuple
+import gc
+import multiprocessing
+import struct
+from concurrent.futures import ProcessPoolExecutor
+from typing import Generator, Optional, List, Dict, Tuple, Callable
 
 from compiler.gen.code import Code
 from compiler.gen.descriptor import ArrayDesc, FieldDescriptor, IntDesc, DoubleDesc, BooleanDesc, ClassDesc, \
@@ -6,7 +10,8 @@ from compiler.gen.descriptor import ArrayDesc, FieldDescriptor, IntDesc, DoubleD
 from compiler.gen.predefined import J_CLINIT_NAME, J_CLINIT_DESCRIPTOR, JC_STRING, J_MAIN_NAME, J_MAIN_DESCRIPTOR, \
     JM_STRING_LENGTH, JSM_INT_TO_STRING, JSM_INT_PARSE, JSM_BOOLEAN_PARSE, JSM_DOUBLE_PARSE, JSM_DOUBLE_TO_STRING, \
     JSM_BOOLEAN_TO_STRING, JSF_STDIN, JM_PRINT, JSF_STDOUT, JC_BUFF_READER, JM_READLINE, JM_STRING_CONCAT, \
-    JM_STRING_EQUALS, JC_INPUT_STREAM_READER, JIM_INPUT_STREAM_READER, JIM_BUFF_READER, JM_STRING_SUBSTRING
+    JM_STRING_EQUALS, JC_INPUT_STREAM_READER, JIM_INPUT_STREAM_READER, JIM_BUFF_READER, JM_STRING_SUBSTRING, \
+    JM_STRING_CHAR_AT, JM_STRING_SPLIT, JSM_LONG_BITS_TO_DOUBLE, JSM_ARRAY_COPY
 from compiler.gen.cls import Class, Method
 from compiler.sem.predefined import FN_MAIN, FN_MAIN_PARAMS, FN_MAIN_RETURN, FN_LEN, FN_INT, \
     FN_REAL, FN_BOOL, FN_STR, FN_WRITE, FN_READ_LINE, FN_SUBSTRING, FN_EOF
@@ -17,12 +22,30 @@ from compiler.syntax import Node
 PREFIX = '$'
 BUFF_READER_FIELD = PREFIX + 'input'
 EOF_FIELD = PREFIX + 'eof'
+UNPACK_METHOD = PREFIX + PREFIX + 'unpack'
+
+# the literal arrays with at least this many items are packed into strings
+PACKED_ARRAY_MIN_ITEMS = 16
+# the packed string must fit into the 65535 B constant, a char takes up to 3 B
+PACKED_STRING_MAX_SIZE = 65535
+PACKED_STRING_MAX_CHARS = PACKED_STRING_MAX_SIZE // 3
+# the characters with a special meaning in the regular expression can not delimit the packed strings
+REGEX_CHARS = '\\^$.|?*+()[]{}'
+
+# the programs from this number of functions have the functions generated in parallel
+PARALLEL_THRESHOLD = 256
+# the number of batches of functions per process, the smaller batches balance the load of the processes
+BATCHES_PER_JOB = 4
 
 _locals: Dict[str, int]
 _fields: Dict[str, Tuple[str, str, FieldDescriptor]]
+# Key = field name, Value = literal value of the scalar constant inlined into its uses
+_constants: Dict[str, object]
 _class_name: str
 _class: Class
 _clinit: Method
+# the function definitions generated by the worker processes or None if the functions are generated in place
+_deferred: Optional[list] = None
 
 
 def _create_field_descriptor(t: Type) -> FieldDescriptor:
@@ -64,7 +87,7 @@ def _create_method_descriptor(params: List[Type], ret: Optional[Type]) -> Method
     return MethodDescriptor(params_desc, ret_desc)
 
 
-def _statement_while(code: Code, statement):
+def _statement_while(code: Code, statement) -> Generator:
     condition = statement['condition']
     statements = statement['statements']
 
@@ -74,8 +97,7 @@ def _statement_while(code: Code, statement):
     code.if_eq()
 
     breaks = []
-    for s in statements:
-        _statement(code, s, start, breaks)
+    yield statements, start, breaks
 
     code.goto(start)
     end_pos = code.pos()
@@ -84,7 +106,8 @@ def _statement_while(code: Code, statement):
         code.update_jump(b, end_pos)
 
 
-def _statement_if(code: Code, statement, loop_start: Optional[int] = None, breaks: Optional[List[int]] = None):
+def _statement_if(code: Code, statement, loop_start: Optional[int] = None,
+                  breaks: Optional[List[int]] = None) -> Generator:
     condition = statement['condition']
     statements = statement['statements']
 
@@ -92,14 +115,14 @@ def _statement_if(code: Code, statement, loop_start: Optional[int] = None, break
     cond_pos = code.pos()
     code.if_eq()
 
-    for s in statements:
-        _statement(code, s, loop_start, breaks)
+    yield statements, loop_start, breaks
 
     end_pos = code.pos()
     code.update_jump(cond_pos, end_pos)
 
 
-def _statement_if_else(code: Code, statement, loop_start: Optional[int] = None, breaks: Optional[List[int]] = None):
+def _statement_if_else(code: Code, statement, loop_start: Optional[int] = None,
+                       breaks: Optional[List[int]] = None) -> Generator:
     condition = statement['condition']
     if_statements = statement['if_statements']
     else_statements = statement['else_statements']
@@ -108,15 +131,13 @@ def _statement_if_else(code: Code, statement, loop_start: Optional[int] = None,
     cond_pos = code.pos()
     code.if_eq()
 
-    for s in if_statements:
-        _statement(code, s, loop_start, breaks)
+    yield if_statements, loop_start, breaks
 
     goto_pos = code.pos()
     code.goto()
 
     else_pos = code.pos()
-    for s in else_statements:
-        _statement(code, s, loop_start, breaks)
+    yield else_statements, loop_start, breaks
 
     end_pos = code.pos()
 
@@ -192,19 +213,42 @@ def _function_def(statement):
         _locals[name] = local_index
         local_index += local_type.size()
 
-    for s in statements:
-        _statement(method.code, s)
+    _statements(method.code, statements)
 
 
-def _constant_def(statement):
+def _declare_constant(statement) -> Tuple[str, FieldDescriptor, object]:
+    """
+    Make the constant known to the code using it.
+    :param statement: The constant definition.
+    :return: The field name, its descriptor and the literal value of the scalar constant or None.
+    """
     name = PREFIX + statement['name']
     const_type = statement['type']
-    expression = statement['expression']
     descriptor = _create_field_descriptor(const_type)
 
+    _fields[name] = (_class_name, name, descriptor)
+
+    value = None
+    if isinstance(const_type, (TypeInt, TypeReal, TypeBool, TypeStr)):
+        value = _literal_value(statement['expression'])
+
+    if value is not None:
+        # the literal is set by the JVM and the uses load it directly instead of the field
+        _constants[name] = value
+
+    return name, descriptor, value
+
+
+def _constant_def(statement):
+    expression = statement['expression']
     code = _clinit.code
 
-    _fields[name] = (_class_name, name, descriptor)
+    (name, descriptor, value) = _declare_constant(statement)
+
+    if value is not None:
+        _class.field(name, descriptor, constant=value)
+        return
+
     _class.field(name, descriptor)
     _expression(code, expression)
     code.store_static_field(_class_name, name, descriptor)
@@ -267,7 +311,7 @@ def _statement_array_store(code: Code, exp):
 
 def _statement_function_call(code: Code, exp):
     ret = exp['type']
-    _exp_function_call(code, exp)
+    _run_emitter(code, _exp_function_call(code, exp))
 
     if isinstance(ret, TypeInt) \
             or isinstance(ret, TypeBool) \
@@ -279,8 +323,12 @@ def _statement_function_call(code: Code, exp):
 
 
 def _top_statement(statement):
+    global _locals
     node_type = statement['node']
 
+    # the local variables of the previous function would hide the constants of the same name
+    _locals = {}
+
     if node_type == Node.FUNCTION_DEFINITION:
         _function_def(statement)
     elif node_type == Node.CONSTANT_DEFINITION:
@@ -289,7 +337,48 @@ def _top_statement(statement):
         raise NotImplementedError()
 
 
-def _statement(code: Code, statement, loop_start: Optional[int] = None, breaks: Optional[List[int]] = None):
+def _statements(code: Code, statements, loop_start: Optional[int] = None, breaks: Optional[List[int]] = None):
+    """
+    Generate the block of statements without the recursion.
+    The compound statements yield their nested blocks as (statements, loop start, breaks),
+    the blocks being generated and their statements are suspended on an explicit stack.
+    :param code: The code to generate into.
+    :param statements: The statements of the block.
+    :param loop_start: Position of the enclosing loop start.
+    :param breaks: Positions of the enclosing loop breaks.
+    """
+    # the stack of (remaining statements, loop start, breaks, compound statement of the block)
+    blocks = [(iter(statements), loop_start, breaks, None)]
+
+    while blocks:
+        (remaining, loop_start, breaks, owner) = blocks[-1]
+        statement = next(remaining, None)
+
+        if statement is not None:
+            owner = _statement(code, statement, loop_start, breaks)
+        else:
+            blocks.pop()
+
+        if owner is None:
+            continue
+
+        # open the next block of the compound statement or finish it
+        block = next(owner, None)
+        if block is not None:
+            (block_statements, block_loop_start, block_breaks) = block
+            blocks.append((iter(block_statements), block_loop_start, block_breaks, owner))
+
+
+def _statement(code: Code, statement, loop_start: Optional[int] = None,
+               breaks: Optional[List[int]] = None) -> Optional[Generator]:
+    """
+    Generate the simple statement or create the generator of the compound statement.
+    :param code: The code to generate into.
+    :param statement: The statement.
+    :param loop_start: Position of the enclosing loop start.
+    :param breaks: Positions of the enclosing loop breaks.
+    :return: The generator yielding the nested blocks of the compound statement or None.
+    """
     node_type = statement['node']
 
     if node_type == Node.VARIABLE_DEFINITION:
@@ -307,11 +396,11 @@ def _statement(code: Code, statement, loop_start: Optional[int] = None, breaks:
     elif node_type == Node.RETURN_VOID:
         code.return_void()
     elif node_type == Node.IF:
-        _statement_if(code, statement, loop_start, breaks)
+        return _statement_if(code, statement, loop_start, breaks)
     elif node_type == Node.IF_ELSE:
-        _statement_if_else(code, statement, loop_start, breaks)
+        return _statement_if_else(code, statement, loop_start, breaks)
     elif node_type == Node.WHILE:
-        _statement_while(code, statement)
+        return _statement_while(code, statement)
     elif node_type == Node.BREAK:
         break_pos = code.pos()
         code.goto()
@@ -325,7 +414,7 @@ def _statement(code: Code, statement, loop_start: Optional[int] = None, breaks:
 def _exp_uminus(code: Code, exp):
     expression = exp['expression']
     exp_type = exp['expression']['type']
-    _expression(code, expression)
+    yield expression
 
     if isinstance(exp_type, TypeInt):
         code.neg_int()
@@ -336,16 +425,16 @@ def _exp_uminus(code: Code, exp):
 
 
 def _exp_uplus(code: Code, exp):
-    # nothing to do
-    pass
+    # nothing to do with the value
+    yield exp['expression']
 
 
 def _exp_mul(code: Code, exp):
     left = exp['left']
     right = exp['right']
     left_type = exp['left']['type']
-    _expression(code, left)
-    _expression(code, right)
+    yield left
+    yield right
 
     if isinstance(left_type, TypeInt):
         code.mul_int()
@@ -359,8 +448,8 @@ def _exp_div(code: Code, exp):
     left = exp['left']
     right = exp['right']
     left_type = exp['left']['type']
-    _expression(code, left)
-    _expression(code, right)
+    yield left
+    yield right
 
     if isinstance(left_type, TypeInt):
         code.div_int()
@@ -374,8 +463,8 @@ def _exp_plus(code: Code, exp):
     left = exp['left']
     right = exp['right']
     left_type = exp['left']['type']
-    _expression(code, left)
-    _expression(code, right)
+    yield left
+    yield right
 
     if isinstance(left_type, TypeInt):
         code.add_int()
@@ -391,8 +480,8 @@ def _exp_minus(code: Code, exp):
     left = exp['left']
     right = exp['right']
     left_type = exp['left']['type']
-    _expression(code, left)
-    _expression(code, right)
+    yield left
+    yield right
 
     if isinstance(left_type, TypeInt):
         code.sub_int()
@@ -406,8 +495,8 @@ def _exp_sub(code: Code, exp):
     left = exp['left']
     right = exp['right']
     left_type = exp['left']['type']
-    _expression(code, left)
-    _expression(code, right)
+    yield left
+    yield right
 
     if isinstance(left_type, TypeInt):
         code.add_int()
@@ -421,8 +510,8 @@ def _exp_eq(code: Code, exp):
     left = exp['left']
     right = exp['right']
     left_type = exp['left']['type']
-    _expression(code, left)
-    _expression(code, right)
+    yield left
+    yield right
 
     if isinstance(left_type, TypeInt) or isinstance(left_type, TypeBool) or isinstance(left_type, TypeReal):
         if isinstance(left_type, TypeReal):
@@ -451,8 +540,8 @@ def _exp_ne(code: Code, exp):
     left = exp['left']
     right = exp['right']
     left_type = exp['left']['type']
-    _expression(code, left)
-    _expression(code, right)
+    yield left
+    yield right
 
     if isinstance(left_type, TypeInt) or isinstance(left_type, TypeBool) or isinstance(left_type, TypeReal):
         if isinstance(left_type, TypeReal):
@@ -492,8 +581,8 @@ def _exp_lt(code: Code, exp):
     left = exp['left']
     right = exp['right']
     left_type = exp['left']['type']
-    _expression(code, left)
-    _expression(code, right)
+    yield left
+    yield right
 
     if isinstance(left_type, TypeInt) or isinstance(left_type, TypeReal):
         if isinstance(left_type, TypeReal):
@@ -520,8 +609,8 @@ def _exp_gt(code: Code, exp):
     left = exp['left']
     right = exp['right']
     left_type = exp['left']['type']
-    _expression(code, left)
-    _expression(code, right)
+    yield left
+    yield right
 
     if isinstance(left_type, TypeInt) or isinstance(left_type, TypeReal):
         if isinstance(left_type, TypeReal):
@@ -548,8 +637,8 @@ def _exp_le(code: Code, exp):
     left = exp['left']
     right = exp['right']
     left_type = exp['left']['type']
-    _expression(code, left)
-    _expression(code, right)
+    yield left
+    yield right
 
     if isinstance(left_type, TypeInt) or isinstance(left_type, TypeReal):
         if isinstance(left_type, TypeReal):
@@ -576,8 +665,8 @@ def _exp_ge(code: Code, exp):
     left = exp['left']
     right = exp['right']
     left_type = exp['left']['type']
-    _expression(code, left)
-    _expression(code, right)
+    yield left
+    yield right
 
     if isinstance(left_type, TypeInt) or isinstance(left_type, TypeReal):
         if isinstance(left_type, TypeReal):
@@ -603,7 +692,7 @@ def _exp_ge(code: Code, exp):
 def _exp_not(code: Code, exp):
     expression = exp['expression']
     exp_type = exp['expression']['type']
-    _expression(code, expression)
+    yield expression
 
     if isinstance(exp_type, TypeBool):
         cmp_pos = code.pos()
@@ -625,24 +714,12 @@ def _exp_and(code: Code, exp):
     left = exp['left']
     right = exp['right']
     left_type = exp['left']['type']
-    _expression(code, left)
-    _expression(code, right)
+    yield left
+    yield right
 
     if isinstance(left_type, TypeBool):
-        cmp1_pos = code.pos()
-        code.if_eq()
-        cmp2_pos = code.pos()
-        code.if_eq()
-        code.const_int(1)
-        goto_pos = code.pos()
-        code.goto()
-        false_pos = code.pos()
-        code.const_int(0)
-        end_pos = code.pos()
-
-        code.update_jump(cmp1_pos, false_pos)
-        code.update_jump(cmp2_pos, false_pos)
-        code.update_jump(goto_pos, end_pos)
+        # both operands are 0 or 1
+        code.and_int()
     else:
         raise NotImplementedError()
 
@@ -651,24 +728,12 @@ def _exp_or(code: Code, exp):
     left = exp['left']
     right = exp['right']
     t = exp['type']
-    _expression(code, left)
-    _expression(code, right)
+    yield left
+    yield right
 
     if isinstance(t, TypeBool):
-        cmp1_pos = code.pos()
-        code.if_ne()
-        cmp2_pos = code.pos()
-        code.if_ne()
-        code.const_int(0)
-        goto_pos = code.pos()
-        code.goto()
-        true_pos = code.pos()
-        code.const_int(1)
-        end_pos = code.pos()
-
-        code.update_jump(cmp1_pos, true_pos)
-        code.update_jump(cmp2_pos, true_pos)
-        code.update_jump(goto_pos, end_pos)
+        # both operands are 0 or 1
+        code.or_int()
     else:
         raise NotImplementedError()
 
@@ -691,12 +756,27 @@ def _exp_var_load(code: Code, exp):
             code.load_reference(index)
         else:
             raise NotImplementedError()
+    elif PREFIX + name in _constants:
+        _load_constant(code, t, _constants[PREFIX + name])
     else:
         name = PREFIX + name
         field = _fields.get(name)
         code.load_static_field(field[0], field[1], field[2])
 
 
+def _load_constant(code: Code, t: Type, value):
+    if isinstance(t, TypeInt):
+        code.const_int(value)
+    elif isinstance(t, TypeReal):
+        code.const_double(value)
+    elif isinstance(t, TypeBool):
+        code.const_int(int(value))
+    elif isinstance(t, TypeStr):
+        code.const_string(value)
+    else:
+        raise NotImplementedError()
+
+
 def _exp_array_load(code: Code, exp):
     name = exp['name']
     index_exps = exp['indexes']
@@ -712,11 +792,11 @@ def _exp_array_load(code: Code, exp):
 
     # subarrays load if multidim
     for e in index_exps[:-1]:
-        _expression(code, e)
+        yield e
         code.array_load_reference()
 
     # item load
-    _expression(code, index_exps[-1])
+    yield index_exps[-1]
     if isinstance(t, TypeInt):
         code.array_load_int()
     elif isinstance(t, TypeReal):
@@ -731,10 +811,222 @@ def _exp_array_load(code: Code, exp):
         raise NotImplementedError()
 
 
+def _literal_value(exp):
+    """
+    The value of the literal or the negated number literal.
+    :return: The value or None if the expression is not a literal.
+    """
+    node_type = exp['node']
+
+    if node_type in (Node.VALUE_INT, Node.VALUE_REAL, Node.VALUE_BOOL, Node.VALUE_STR):
+        return exp['value']
+
+    if node_type == Node.UMINUS:
+        operand = exp['expression']
+        if operand['node'] == Node.VALUE_INT:
+            # wrap into 4 bytes the way the int negation does
+            return (-operand['value'] + 0x80000000) % 0x100000000 - 0x80000000
+        elif operand['node'] == Node.VALUE_REAL:
+            return -operand['value']
+
+    return None
+
+
+def _pack_int(value: int) -> str:
+    # the high half is shifted by one to encode the small non-negative numbers by shorter chars
+    return chr(((value >> 16) + 1) & 0xFFFF) + chr(value & 0xFFFF)
+
+
+def _pack_real(value: float) -> str:
+    return ''.join(map(chr, struct.unpack('>4H', struct.pack('>d', value))))
+
+
+def _pack_bool(value: bool) -> str:
+    return '1' if value else '0'
+
+
+def _load_packed_char(code: Code, offset: int):
+    """
+    Load the char at the index (local variable 3) plus the offset from the packed string (local variable 1).
+    """
+    code.load_reference(1)
+    code.load_int(3)
+    if offset:
+        code.const_int(offset)
+        code.add_int()
+    code.invoke_virtual(*JM_STRING_CHAR_AT)
+
+
+def _unpack_int(code: Code):
+    _load_packed_char(code, 0)
+    code.const_int(1)
+    code.sub_int()
+    code.const_int(16)
+    code.shl_int()
+    _load_packed_char(code, 1)
+    code.or_int()
+    code.array_store_int()
+
+
+def _unpack_real(code: Code):
+    for i in range(4):
+        _load_packed_char(code, i)
+        code.int_to_long()
+        if i < 3:
+            code.const_int(48 - 16 * i)
+            code.shl_long()
+        if i > 0:
+            code.or_long()
+    code.invoke_static(*JSM_LONG_BITS_TO_DOUBLE)
+    code.array_store_double()
+
+
+def _unpack_bool(code: Code):
+    _load_packed_char(code, 0)
+    code.const_int(ord('0'))
+    code.sub_int()
+    code.array_store_boolean()
+
+
+# Key = array item type, Value = (unpacking method name suffix, packing function, chars per item, item unpacking)
+_PACKED_ITEMS: Dict[type, Tuple[str, Callable, int, Callable[[Code], None]]] = {
+    TypeInt: ('Int', _pack_int, 2, _unpack_int),
+    TypeReal: ('Real', _pack_real, 4, _unpack_real),
+    TypeBool: ('Bool', _pack_bool, 1, _unpack_bool),
+}
+
+
+def _unpack_method(inner: Type) -> Tuple[str, MethodDescriptor]:
+    """
+    Get the helper method filling the array from the packed string, the method is generated on the first use.
+    The parameters are the array, the packed string, the delimiter of the strings for the Str arrays
+    and the index of the first filled item.
+    :param inner: The array item type.
+    :return: The method name and descriptor.
+    """
+    array_desc = ArrayDesc(1, _create_field_descriptor(inner))
+
+    if isinstance(inner, TypeStr):
+        name = UNPACK_METHOD + 'Str'
+        descriptor = MethodDescriptor([array_desc, ClassDesc(JC_STRING), ClassDesc(JC_STRING), IntDesc()])
+    else:
+        (suffix, _, width, _) = _PACKED_ITEMS[type(inner)]
+        name = UNPACK_METHOD + suffix
+        descriptor = MethodDescriptor([array_desc, ClassDesc(JC_STRING), IntDesc()])
+
+    method = _class.method(name, descriptor, synthetic=True)
+    code = method.code
+
+    if len(code):
+        return name, descriptor
+
+    if isinstance(inner, TypeStr):
+        # copy the split strings into the array
+        parts = code.variable_reference()
+        code.load_reference(1)
+        code.load_reference(2)
+        code.const_int(-1)
+        code.invoke_virtual(*JM_STRING_SPLIT)
+        code.store_reference(parts)
+        code.load_reference(parts)
+        code.const_int(0)
+        code.load_reference(0)
+        code.load_int(3)
+        code.load_reference(parts)
+        code.array_length()
+        code.invoke_static(*JSM_ARRAY_COPY)
+        code.return_void()
+        return name, descriptor
+
+    # store the items decoded from the chars at the index into the array at the offset
+    index = code.variable_int()
+    size = code.variable_int()
+    code.const_int(0)
+    code.store_int(index)
+    code.load_reference(1)
+    code.invoke_virtual(*JM_STRING_LENGTH)
+    code.store_int(size)
+
+    end = code.label()
+    loop_start = code.pos()
+    code.load_int(index)
+    code.load_int(size)
+    code.if_cmp_int_ge(end)
+    code.load_reference(0)
+    code.load_int(2)
+    _PACKED_ITEMS[type(inner)][3](code)
+    code.inc_int(2, 1)
+    code.inc_int(index, width)
+    code.goto(loop_start)
+    code.place(end)
+    code.return_void()
+
+    return name, descriptor
+
+
+def _delimiter(values: List[str]) -> str:
+    """
+    The char not contained in any of the strings, it can be used as a regular expression.
+    """
+    used = set()
+    for value in values:
+        used.update(value)
+
+    char = 1
+    while chr(char) in used or chr(char) in REGEX_CHARS:
+        char += 1
+
+    return chr(char)
+
+
+def _exp_packed_array(code: Code, inner: Type, values: list):
+    """
+    Create the one dimensional array filled from the strings the literal values are packed into.
+    Every string fills a part of the array, the size of a string constant is limited.
+    """
+    code.const_int(len(values))
+    code.new_array(_create_field_descriptor(inner))
+    (name, descriptor) = _unpack_method(inner)
+
+    if isinstance(inner, TypeStr):
+        start = 0
+        size = 0
+        for (i, value) in enumerate(values + [None]):
+            # a char takes up to 3 B, the delimiter included
+            value_size = 0 if value is None else 3 * (len(value.encode('utf-16-le')) // 2 + 1)
+
+            if value is None or (i > start and size + value_size > PACKED_STRING_MAX_SIZE):
+                delimiter = _delimiter(values[start:i])
+                code.dup()
+                code.const_string(delimiter.join(values[start:i]))
+                code.const_string(delimiter)
+                code.const_int(start)
+                code.invoke_static(_class_name, name, descriptor)
+                start = i
+                size = 0
+
+            size += value_size
+        return
+
+    (_, pack, width, _) = _PACKED_ITEMS[type(inner)]
+    count = PACKED_STRING_MAX_CHARS // width
+    for start in range(0, len(values), count):
+        code.dup()
+        code.const_string(''.join(pack(v) for v in values[start:start + count]))
+        code.const_int(start)
+        code.invoke_static(_class_name, name, descriptor)
+
+
 def _exp_value_array(code: Code, exp):
     items = exp['items']
     t = exp['type']
 
+    if t.dim == 1 and len(items) >= PACKED_ARRAY_MIN_ITEMS:
+        values = [_literal_value(item) for item in items]
+        if None not in values:
+            _exp_packed_array(code, t.inner, values)
+            return
+
     if t.dim > 1:
         desc = _create_field_descriptor(TypeArray(t.dim - 1, t.inner))
     else:
@@ -747,7 +1039,7 @@ def _exp_value_array(code: Code, exp):
         code.dup()
         code.const_int(i)
         item_type = item['type']
-        _expression(code, item)
+        yield item
         if isinstance(item_type, TypeInt):
             code.array_store_int()
         elif isinstance(item_type, TypeReal):
@@ -768,7 +1060,7 @@ def _exp_var_assign(code: Code, exp):
     t = exp['type']
 
     index = _locals[name]
-    _expression(code, expression)
+    yield expression
 
     if isinstance(t, TypeInt):
         code.dup()
@@ -801,12 +1093,12 @@ def _exp_array_assign(code: Code, exp):
 
     # subarrays load if multidim
     for e in index_exps[:-1]:
-        _expression(code, e)
+        yield e
         code.array_load_reference()
 
     # item store
-    _expression(code, index_exps[-1])
-    _expression(code, expression)
+    yield index_exps[-1]
+    yield expression
     if isinstance(t.inner, TypeInt):
         code.dup_x1()
         code.array_store_int()
@@ -833,7 +1125,7 @@ def _exp_function_call(code: Code, exp):
     ret = exp['type']
 
     for e in args_exps:
-        _expression(code, e)
+        yield e
 
     # check for predefined functions
     if name == FN_LEN and len(params) == 1:
@@ -912,7 +1204,7 @@ def _exp_function_call(code: Code, exp):
 
     if name == FN_SUBSTRING and len(params) == 3:
         if isinstance(params[0], TypeStr) and isinstance(params[1], TypeInt) and isinstance(params[2], TypeInt):
-            code.invoke_static(*JM_STRING_SUBSTRING)
+            code.invoke_virtual(*JM_STRING_SUBSTRING)
             return
 
     if name == FN_WRITE and len(params) == 1:
@@ -930,6 +1222,7 @@ def _exp_function_call(code: Code, exp):
         code.dup()
         cmp_pos = code.pos()
         code.if_non_null()
+        code.pop()
         code.const_int(1)
         code.store_static_field(_class_name, EOF_FIELD, BooleanDesc())
         code.const_string('')
@@ -948,46 +1241,80 @@ def _exp_function_call(code: Code, exp):
 
 
 def _expression(code: Code, expression):
+    emitter = _expression_emitter(code, expression)
+
+    if emitter is not None:
+        _run_emitter(code, emitter)
+
+
+def _run_emitter(code: Code, emitter: Generator):
+    """
+    Run the emitter of a compound expression without the recursion.
+    The emitter yields its sub-expressions at the places their code belongs to,
+    the emitters of the nested compound expressions are suspended on an explicit stack.
+    :param emitter: The emitter generator.
+    """
+    emitters = [emitter]
+
+    while emitters:
+        sub_exp = next(emitters[-1], None)
+
+        if sub_exp is None:
+            emitters.pop()
+            continue
+
+        emitter = _expression_emitter(code, sub_exp)
+        if emitter is not None:
+            emitters.append(emitter)
+
+
+def _expression_emitter(code: Code, expression) -> Optional[Generator]:
+    """
+    Generate the code of the simple expression or create the emitter of the compound one.
+    :param code: The code the expression is generated into.
+    :param expression: The expression.
+    :return: The emitter generator to be run by _run_emitter or None if the code is already generated.
+    """
     node_type = expression['node']
 
     if node_type == Node.UMINUS:
-        _exp_uminus(code, expression)
+        return _exp_uminus(code, expression)
     elif node_type == Node.UPLUS:
-        _exp_uplus(code, expression)
+        return _exp_uplus(code, expression)
     elif node_type == Node.MUL:
-        _exp_mul(code, expression)
+        return _exp_mul(code, expression)
     elif node_type == Node.DIV:
-        _exp_div(code, expression)
+        return _exp_div(code, expression)
     elif node_type == Node.PLUS:
-        _exp_plus(code, expression)
+        return _exp_plus(code, expression)
     elif node_type == Node.MINUS:
-        _exp_minus(code, expression)
+        return _exp_minus(code, expression)
     elif node_type == Node.EQ:
-        _exp_eq(code, expression)
+        return _exp_eq(code, expression)
     elif node_type == Node.NE:
-        _exp_ne(code, expression)
+        return _exp_ne(code, expression)
     elif node_type == Node.LT:
-        _exp_lt(code, expression)
+        return _exp_lt(code, expression)
     elif node_type == Node.GT:
-        _exp_gt(code, expression)
+        return _exp_gt(code, expression)
     elif node_type == Node.LE:
-        _exp_le(code, expression)
+        return _exp_le(code, expression)
     elif node_type == Node.GE:
-        _exp_ge(code, expression)
+        return _exp_ge(code, expression)
     elif node_type == Node.NOT:
-        _exp_not(code, expression)
+        return _exp_not(code, expression)
     elif node_type == Node.AND:
-        _exp_and(code, expression)
+        return _exp_and(code, expression)
     elif node_type == Node.OR:
-        _exp_or(code, expression)
+        return _exp_or(code, expression)
     elif node_type == Node.VARIABLE_LOAD:
         _exp_var_load(code, expression)
     elif node_type == Node.ARRAY_LOAD:
-        _exp_array_load(code, expression)
+        return _exp_array_load(code, expression)
     elif node_type == Node.VARIABLE_ASSIGNMENT:
-        _exp_var_assign(code, expression)
+        return _exp_var_assign(code, expression)
     elif node_type == Node.ARRAY_ASSIGNMENT:
-        _exp_array_assign(code, expression)
+        return _exp_array_assign(code, expression)
     elif node_type == Node.VALUE_INT:
         code.const_int(expression['value'])
     elif node_type == Node.VALUE_REAL:
@@ -997,17 +1324,21 @@ def _expression(code: Code, expression):
     elif node_type == Node.VALUE_STR:
         code.const_string(expression['value'])
     elif node_type == Node.VALUE_ARRAY:
-        _exp_value_array(code, expression)
+        return _exp_value_array(code, expression)
     elif node_type == Node.FUNCTION_CALL_VALUE:
-        _exp_function_call(code, expression)
+        return _exp_function_call(code, expression)
     else:
         raise NotImplementedError()
 
+    return None
+
 
 def _generate_clinit():
     global _fields
+    global _constants
     global _clinit
     _fields = {}
+    _constants = {}
 
     _clinit = _class.method(J_CLINIT_NAME, J_CLINIT_DESCRIPTOR)
     code = _clinit.code
@@ -1040,14 +1371,16 @@ def _generate_main():
     method.code.return_void()
 
 
-def generate(class_name: str, ast) -> Class:
+def generate(class_name: str, ast, jobs: int = 1) -> Class:
     global _class_name
     global _fields
+    global _constants
     global _locals
     global _class
 
     _locals = {}
     _fields = {}
+    _constants = {}
 
     _class_name = class_name
     _class_name = class_name
@@ -1055,10 +1388,75 @@ def generate(class_name: str, ast) -> Class:
 
     _generate_clinit()
 
-    for node in ast['statements']:
-        _top_statement(node)
+    statements = ast['statements']
+    for (node, function_class) in zip(statements, _generate_functions_parallel(statements, jobs)):
+        if function_class is None:
+            _top_statement(node)
+        else:
+            _class.merge(function_class)
 
     _generate_main()
     _close_clinit()
 
     return _class
+
+
+def _generate_functions_parallel(statements, jobs: int) -> List[Optional[Class]]:
+    """
+    Generate the functions of a large program by the pool of the forked processes, each one gets the batches
+    of the adjacent functions. Every function is generated into its own class, so the constants of the classes
+    merged in the order of the definitions get the same indexes as by the generating in place.
+    :param statements: The top level statements.
+    :param jobs: The number of processes.
+    :return: List of the classes of the functions, None for the statements left for the generating in place.
+    """
+    global _deferred
+
+    functions = [s for s in statements if s['node'] == Node.FUNCTION_DEFINITION]
+
+    if jobs <= 1 or 'fork' not in multiprocessing.get_all_start_methods() or len(functions) < PARALLEL_THRESHOLD:
+        return [None] * len(statements)
+
+    # a function uses only the constants defined above it, the processes inherit all of them
+    for statement in statements:
+        if statement['node'] == Node.CONSTANT_DEFINITION:
+            _declare_constant(statement)
+
+    size = -(-len(functions) // (jobs * BATCHES_PER_JOB))
+    _deferred = functions
+
+    # the received classes have no reference cycles, the collections triggered by their many objects
+    # would take most of the time of their unpickling
+    gc_enabled = gc.isenabled()
+    gc.disable()
+
+    try:
+        with ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context('fork')) as pool:
+            futures = [pool.submit(_generate_functions, start, min(start + size, len(functions)))
+                       for start in range(0, len(functions), size)]
+            classes = iter([function_class for future in futures for function_class in future.result()])
+    finally:
+        _deferred = None
+        if gc_enabled:
+            gc.enable()
+
+    return [next(classes) if s['node'] == Node.FUNCTION_DEFINITION else None for s in statements]
+
+
+def _generate_functions(start: int, end: int) -> List[Class]:
+    """
+    Generate the range of the deferred functions in the worker process.
+    :param start: Index of the first function.
+    :param end: Index after the last function.
+    :return: List of the classes, each one with the method of the function and the helper methods it uses.
+    """
+    global _class
+
+    classes = []
+
+    for statement in _deferred[start:end]:
+        _class = Class(_class_name)
+        _top_statement(statement)
+        classes.append(_class)
+
+    return classes
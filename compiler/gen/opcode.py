@@ -1,5 +1,6 @@
+import struct
 from enum import IntEnum, Enum
-from typing import Optional
+from typing import Optional, List, Tuple
 
 
 class Opcode(int, Enum):
@@ -207,7 +208,7 @@ class Opcode(int, Enum):
     MULTIANEWARRAY = (0xC5, 4, None, '>BHB')
     IFNULL = (0xC6, 3, -1, '>Bh')
     IFNONNULL = (0xC7, 3, -1, '>Bh')
-    GOTO_W = (0xC8, 5, None, None)
+    GOTO_W = (0xC8, 5, 0, '>Bi')
     JSR_W = (0xC9, 5, None, None)
 
     def __new__(cls, value: int, length: int, stack_diff: int, fmt: str):
@@ -219,20 +220,91 @@ class Opcode(int, Enum):
         return obj
 
     def is_jump(self) -> bool:
-        return self == Opcode.IFEQ \
-                or self == Opcode.IFNE \
-                or self == Opcode.IFLT \
-                or self == Opcode.IFGE \
-                or self == Opcode.IFGT \
-                or self == Opcode.IFLE \
-                or self == Opcode.IF_ICMPEQ \
-                or self == Opcode.IF_ICMPNE \
-                or self == Opcode.IF_ICMPLT \
-                or self == Opcode.IF_ICMPGE \
-                or self == Opcode.IF_ICMPGT \
-                or self == Opcode.IF_ICMPLE \
-                or self == Opcode.IF_ACMPEQ \
-                or self == Opcode.IF_ACMPNE \
-                or self == Opcode.GOTO \
-                or self == Opcode.IFNULL \
-                or self == Opcode.IFNONNULL
+        return IS_JUMP[self]
+
+    def inverted(self) -> 'Opcode':
+        """
+        The conditional jump with the negated condition.
+        """
+        return _INVERTED_JUMPS[self]
+
+
+class OperandKind(Enum):
+    LOCAL = 'local'             # index of a local variable
+    CONSTANT = 'constant'       # index into the constant pool
+    JUMP = 'jump'               # index of the target instruction
+    VALUE = 'value'             # immediate value
+    ARRAY_TYPE = 'array_type'   # primitive array type
+
+
+# Flat tables indexed by the opcode byte, the opcode metadata without the enum attributes lookup.
+OPCODES_COUNT = 256
+# the opcodes by their byte
+OPCODES: List[Optional[Opcode]] = [None] * OPCODES_COUNT
+IS_JUMP: List[bool] = [False] * OPCODES_COUNT
+# the unconditional jumps, returns and throws, the execution never continues with the next instruction
+IS_TERMINATOR: List[bool] = [False] * OPCODES_COUNT
+LENGTHS: List[Optional[int]] = [None] * OPCODES_COUNT
+# None if it depends on the operands
+STACK_DIFFS: List[Optional[int]] = [None] * OPCODES_COUNT
+# precompiled formats of the instructions
+FORMATS: List[Optional[struct.Struct]] = [None] * OPCODES_COUNT
+OPERAND_KINDS: List[Tuple[OperandKind, ...]] = [()] * OPCODES_COUNT
+
+_JUMPS = {
+    Opcode.IFEQ, Opcode.IFNE, Opcode.IFLT, Opcode.IFGE, Opcode.IFGT, Opcode.IFLE,
+    Opcode.IF_ICMPEQ, Opcode.IF_ICMPNE, Opcode.IF_ICMPLT, Opcode.IF_ICMPGE, Opcode.IF_ICMPGT, Opcode.IF_ICMPLE,
+    Opcode.IF_ACMPEQ, Opcode.IF_ACMPNE, Opcode.GOTO, Opcode.IFNULL, Opcode.IFNONNULL, Opcode.GOTO_W
+}
+
+_TERMINATORS = {
+    Opcode.GOTO, Opcode.GOTO_W,
+    Opcode.IRETURN, Opcode.LRETURN, Opcode.FRETURN, Opcode.DRETURN, Opcode.ARETURN, Opcode.RETURN,
+    Opcode.ATHROW
+}
+
+# the operands of the instructions with other than a single local variable operand, the jumps excluded
+_OPERANDS = {
+    Opcode.BIPUSH: (OperandKind.VALUE,),
+    Opcode.SIPUSH: (OperandKind.VALUE,),
+    Opcode.LDC: (OperandKind.CONSTANT,),
+    Opcode.NEWARRAY: (OperandKind.ARRAY_TYPE,),
+    Opcode.IINC: (OperandKind.LOCAL, OperandKind.VALUE),
+    Opcode.MULTIANEWARRAY: (OperandKind.CONSTANT, OperandKind.VALUE),
+}
+
+for _opcode in Opcode:
+    OPCODES[_opcode] = _opcode
+    IS_JUMP[_opcode] = _opcode in _JUMPS
+    IS_TERMINATOR[_opcode] = _opcode in _TERMINATORS
+    LENGTHS[_opcode] = _opcode.length
+    STACK_DIFFS[_opcode] = _opcode.stack_diff
+
+    if _opcode.fmt is None:
+        continue
+
+    FORMATS[_opcode] = struct.Struct(_opcode.fmt)
+
+    if _opcode in _JUMPS:
+        OPERAND_KINDS[_opcode] = (OperandKind.JUMP,)
+    elif _opcode in _OPERANDS:
+        OPERAND_KINDS[_opcode] = _OPERANDS[_opcode]
+    elif _opcode.fmt == '>BH':
+        OPERAND_KINDS[_opcode] = (OperandKind.CONSTANT,)
+    elif _opcode.fmt == '>BB':
+        OPERAND_KINDS[_opcode] = (OperandKind.LOCAL,)
+
+# Key = conditional jump, Value = jump with the negated condition
+_INVERTED_JUMPS = {}
+for (_jump, _inverted) in [
+    (Opcode.IFEQ, Opcode.IFNE),
+    (Opcode.IFLT, Opcode.IFGE),
+    (Opcode.IFGT, Opcode.IFLE),
+    (Opcode.IF_ICMPEQ, Opcode.IF_ICMPNE),
+    (Opcode.IF_ICMPLT, Opcode.IF_ICMPGE),
+    (Opcode.IF_ICMPGT, Opcode.IF_ICMPLE),
+    (Opcode.IF_ACMPEQ, Opcode.IF_ACMPNE),
+    (Opcode.IFNULL, Opcode.IFNONNULL),
+]:
+    _INVERTED_JUMPS[_jump] = _inverted
+    _INVERTED_JUMPS[_inverted] = _jump
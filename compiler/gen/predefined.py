@@ -1,4 +1,5 @@
-from compiler.gen.descriptor import MethodDescriptor, ClassDesc, IntDesc, BooleanDesc, DoubleDesc, ArrayDesc
+from compiler.gen.descriptor import MethodDescriptor, ClassDesc, IntDesc, BooleanDesc, DoubleDesc, ArrayDesc, CharDesc, \
+    LongDesc
 
 
 # --- Types ---
@@ -39,6 +40,14 @@ JM_STRING_LENGTH = (JC_STRING, 'length', MethodDescriptor([], IntDesc()))
 JM_STRING_CONCAT = (JC_STRING, 'concat', MethodDescriptor([ClassDesc(JC_STRING)], ClassDesc(JC_STRING)))
 JM_STRING_EQUALS = (JC_STRING, 'equals', MethodDescriptor([ClassDesc(JC_OBJECT)], BooleanDesc()))
 JM_STRING_SUBSTRING = (JC_STRING, 'substring', MethodDescriptor([IntDesc(), IntDesc()], ClassDesc(JC_STRING)))
+JM_STRING_CHAR_AT = (JC_STRING, 'charAt', MethodDescriptor([IntDesc()], CharDesc()))
+JM_STRING_SPLIT = (JC_STRING, 'split', MethodDescriptor([ClassDesc(JC_STRING), IntDesc()],
+                                                        ArrayDesc(1, ClassDesc(JC_STRING))))
+
+
+# --- Conversion methods ---
+
+JSM_LONG_BITS_TO_DOUBLE = (JC_DOUBLE, 'longBitsToDouble', MethodDescriptor([LongDesc()], DoubleDesc()))
 
 
 # --- IO ---
@@ -53,6 +62,9 @@ JC_INPUT_STREAM_READER = 'java/io/InputStreamReader'
 JIM_BUFF_READER = (JC_BUFF_READER, J_INIT_NAME, MethodDescriptor([ClassDesc(JC_READER)]))
 JIM_INPUT_STREAM_READER = (JC_INPUT_STREAM_READER, J_INIT_NAME, MethodDescriptor([ClassDesc(JC_INPUT_STREAM)]))
 
+JSM_ARRAY_COPY = (JC_SYSTEM, 'arraycopy', MethodDescriptor([ClassDesc(JC_OBJECT), IntDesc(), ClassDesc(JC_OBJECT),
+                                                            IntDesc(), IntDesc()]))
+
 JSF_STDIN = (JC_SYSTEM, 'in', ClassDesc(JC_INPUT_STREAM))
 JSF_STDOUT = (JC_SYSTEM, 'out', ClassDesc(JC_PRINT_STREAM))
 
@@ -0,0 +1,342 @@
+from typing import Dict, List, Optional, Tuple
+
+from compiler.gen.cls import Class, Method
+from compiler.gen.code import Code
+from compiler.gen.descriptor import FieldDescriptor, MethodDescriptor, ClassDesc, parse_field_descriptor
+from compiler.gen.flow import frames, is_wide, Frame, VType, VTag, VT_TOP
+from compiler.gen.opcode import Opcode, IS_JUMP, LENGTHS
+from compiler.gen.predefined import JC_OBJECT
+
+# the maximum size of the code outlined into a single helper method
+REGION_SIZE = 16384
+# the minimum size of the code worth the helper method invocation
+MIN_REGION_SIZE = 256
+
+# sizes of the instructions invoking the helper method and passing the local variables
+_INVOKE_SIZE = 3
+_FIELD_ACCESS_SIZE = 3
+_LOCAL_ACCESS_SIZE = 2
+_LOCAL_ACCESS_SHORT_SIZE = 1
+
+# the jump hashes are spread over 64 bits by the Fibonacci hashing multiplier
+_SIGNATURE_MULTIPLIER = 0x9E3779B97F4A7C15
+_SIGNATURE_MASK = 0xFFFFFFFFFFFFFFFF
+
+_RETURNS = {Opcode.IRETURN, Opcode.LRETURN, Opcode.FRETURN, Opcode.DRETURN, Opcode.ARETURN, Opcode.RETURN}
+
+# Key = opcode, Value = (value kind, whether the local variable is written, implicit local variable index)
+_LOCAL_ACCESSES: Dict[int, Tuple[str, bool, Optional[int]]] = {}
+for _kind in 'ILFDA':
+    for (_action, _store) in (('LOAD', False), ('STORE', True)):
+        _LOCAL_ACCESSES[Opcode[_kind + _action]] = (_kind, _store, None)
+        for _n in range(4):
+            _LOCAL_ACCESSES[Opcode[f'{_kind}{_action}_{_n}']] = (_kind, _store, _n)
+
+_LOADERS = {'I': Code.load_int, 'L': Code.load_long, 'F': Code.load_float, 'D': Code.load_double,
+            'A': Code.load_reference}
+_STORERS = {'I': Code.store_int, 'L': Code.store_long, 'F': Code.store_float, 'D': Code.store_double,
+            'A': Code.store_reference}
+_VARIABLES = {'I': Code.variable_int, 'L': Code.variable_long, 'F': Code.variable_float, 'D': Code.variable_double,
+              'A': Code.variable_reference}
+
+# Key = verification type tag, Value = value kind
+_VTAG_KINDS = {VTag.INTEGER: 'I', VTag.LONG: 'L', VTag.FLOAT: 'F', VTag.DOUBLE: 'D', VTag.OBJECT: 'A', VTag.NULL: 'A'}
+_KIND_DESCRIPTORS = {'I': 'I', 'L': 'J', 'F': 'F', 'D': 'D'}
+
+
+class _Region:
+    """
+    The instructions from start to end (exclusive) starting and ending with the same operand stack.
+    """
+    def __init__(self, start: int, end: int, size: int):
+        self.start = start
+        self.end = end
+        self.size = size
+
+
+def _descriptor(vtype: VType) -> FieldDescriptor:
+    """
+    Descriptor of the helper method parameter or field holding the value of the verification type.
+    """
+    if vtype[0] == VTag.OBJECT:
+        name = vtype[1]
+        return parse_field_descriptor(name if name[0] == '[' else f'L{name};')
+    elif vtype[0] == VTag.NULL:
+        return ClassDesc(JC_OBJECT)
+    return parse_field_descriptor(_KIND_DESCRIPTORS[_VTAG_KINDS[vtype[0]]])
+
+
+def _local_access(code: Code, index: int) -> Optional[Tuple[str, int, bool, bool]]:
+    """
+    The local variable accessed by the instruction.
+    :return: Tuple of the value kind, variable index, read and write flags or None.
+    """
+    opcode = code.opcodes[index]
+
+    if opcode == Opcode.IINC:
+        return 'I', code.operands[index], True, True
+
+    access = _LOCAL_ACCESSES.get(opcode)
+    if access is None:
+        return None
+
+    (kind, store, local) = access
+    return kind, code.operands[index] if local is None else local, not store, store
+
+
+def _jump_signatures(code: Code) -> List[int]:
+    """
+    Compute the signature of the jumps leading across the start of every instruction.
+    A jump to the instruction itself does not lead across it. The instructions from start to end can only
+    be entered at the start and left at the end if the same jumps lead across both, so their signatures
+    are the same. Every jump contributes by its own hash, the signatures are combined by xor.
+    """
+    size = len(code)
+    changes = [0] * (size + 1)
+
+    for (index, opcode) in enumerate(code.opcodes):
+        if not IS_JUMP[opcode]:
+            continue
+
+        target = code.operands[index]
+        value = ((index + 1) * _SIGNATURE_MULTIPLIER) & _SIGNATURE_MASK
+        if target > index:
+            changes[index + 1] ^= value
+            changes[target] ^= value
+        else:
+            changes[target + 1] ^= value
+            changes[index + 1] ^= value
+
+    result = []
+    signature = 0
+    for index in range(size):
+        signature ^= changes[index]
+        result.append(signature)
+
+    return result
+
+
+def _is_closed(code: Code, start: int, end: int) -> bool:
+    """
+    Check the instructions from start to end can only be entered at the start and left at the end.
+    """
+    for (index, opcode) in enumerate(code.opcodes):
+        if not IS_JUMP[opcode]:
+            continue
+
+        target = code.operands[index]
+        if start <= index < end:
+            if not start <= target <= end:
+                return False
+        elif start < target < end:
+            return False
+
+    return True
+
+
+def _regions(code: Code, code_frames: Dict[int, Frame], positions: List[int]) -> List[_Region]:
+    """
+    Find the regions which can be outlined.
+    A region is made of the consecutive segments between the instructions with the same operand stack,
+    either the empty one between the statements or one with an array on top between the array items stores.
+    The same jumps lead across the region boundaries and the region does not return from the method.
+    """
+    opcodes = code.opcodes
+    signatures = _jump_signatures(code)
+
+    # Key = jump signature and operand stack, Value = indexes of the instructions starting with them
+    boundaries: Dict[Tuple[int, Tuple[VType, ...]], List[int]] = {}
+    for index in range(len(code)):
+        stack = code_frames[index][1]
+        if stack and stack[-1][0] != VTag.OBJECT:
+            continue
+        boundaries.setdefault((signatures[index], stack), []).append(index)
+
+    result = []
+    for ((_, stack), indexes) in boundaries.items():
+        depth = len(stack)
+        region = None
+
+        for (start, end) in zip(indexes, indexes[1:]):
+            size = positions[end] - positions[start]
+            valid = size <= REGION_SIZE and not any(opcodes[i] in _RETURNS for i in range(start, end))
+
+            # the array item store starts by duplicating the array, the rest works above it
+            if valid and depth:
+                valid = opcodes[start] == Opcode.DUP \
+                    and all(len(code_frames[i][1]) > depth for i in range(start + 1, end))
+
+            if not valid:
+                region = None
+            elif region is not None and region.end == start and region.size + size <= REGION_SIZE:
+                region.end = end
+                region.size += size
+            else:
+                region = _Region(start, end, size)
+                result.append(region)
+
+    return result
+
+
+def _choose(code: Code, regions: List[_Region], excess: int) -> List[_Region]:
+    """
+    Choose the largest non overlapping regions until the code shrinks by the excess.
+    """
+    chosen = []
+    saved = 0
+
+    for region in sorted(regions, key=lambda r: r.size, reverse=True):
+        if saved >= excess or region.size < MIN_REGION_SIZE:
+            break
+        if any(region.start < c.end and c.start < region.end for c in chosen):
+            continue
+        # the signatures may collide
+        if not _is_closed(code, region.start, region.end):
+            continue
+
+        chosen.append(region)
+        saved += region.size - _INVOKE_SIZE
+
+    return chosen
+
+
+def _outline(cls: Class, method: Method, region: _Region, name: str, start_frame: Frame, end_frame: Frame,
+             accesses: List[Tuple[int, str, int, bool, bool]]) -> bool:
+    """
+    Move the region into a new helper method and replace it by the helper invocation.
+    The local variables read by the region are passed as parameters, the ones written by the region
+    and used elsewhere are passed back through static fields. The array on top of the operand stack
+    is passed as the first parameter and returned back.
+    :param accesses: The local variables accesses of the method code before any region was outlined.
+    :return: False if the invocation would not be shorter than the region, it is kept then.
+    """
+    code = method.code
+    (start, end) = (region.start, region.end)
+    (start_locals, stack) = start_frame
+    end_locals = end_frame[0]
+    through = stack[-1] if stack else None
+
+    read = set()
+    written = set()
+    used_outside = set()
+    for (index, kind, local, is_read, is_written) in accesses:
+        if not start <= index < end:
+            used_outside.add(local)
+            continue
+        if is_read:
+            read.add(local)
+        if is_written:
+            written.add(local)
+
+    inputs = sorted(local for local in read if start_locals[local] != VT_TOP)
+    outputs = sorted(local for local in written & used_outside if end_locals[local] != VT_TOP)
+
+    transfers = [_LOCAL_ACCESS_SHORT_SIZE if local < 4 else _LOCAL_ACCESS_SIZE for local in inputs]
+    transfers += [_FIELD_ACCESS_SIZE + (_LOCAL_ACCESS_SHORT_SIZE if local < 4 else _LOCAL_ACCESS_SIZE)
+                  for local in outputs]
+    if _INVOKE_SIZE + sum(transfers) >= region.size:
+        return False
+
+    params = [_descriptor(start_locals[local]) for local in inputs]
+    if through is not None:
+        params.insert(0, _descriptor(through))
+    descriptor = MethodDescriptor(params, None if through is None else _descriptor(through))
+    helper = cls.method(name, descriptor, synthetic=True)
+    helper_code = helper.code
+
+    # Key = local variable index in the method, Value = local variable index in the helper
+    helper_locals = {}
+    helper_local = 0 if through is None else 1
+    for local in inputs:
+        helper_locals[local] = helper_local
+        helper_local += 2 if is_wide(start_locals[local]) else 1
+
+    if through is not None:
+        helper_code.load_reference(0)
+    shift = helper_code.pos() - start
+
+    for index in range(start, end):
+        access = _local_access(code, index)
+
+        if access is not None:
+            (kind, local, is_read, is_written) = access
+            if local not in helper_locals:
+                helper_locals[local] = _VARIABLES[kind](helper_code)
+
+            if code.opcodes[index] == Opcode.IINC:
+                helper_code.inc_int(helper_locals[local], code.operands2[index])
+            elif is_written:
+                _STORERS[kind](helper_code, helper_locals[local])
+            else:
+                _LOADERS[kind](helper_code, helper_locals[local])
+        elif IS_JUMP[code.opcodes[index]]:
+            # the jump to the end of the region leads to the helper epilogue
+            helper_code.copy_instruction(code, index, code.operands[index] + shift)
+        else:
+            helper_code.copy_instruction(code, index)
+
+    replacement = Code(code.constant_pool)
+    for local in inputs:
+        _LOADERS[_VTAG_KINDS[start_locals[local][0]]](replacement, local)
+    replacement.invoke_static(cls.name, name, descriptor)
+
+    for local in outputs:
+        kind = _VTAG_KINDS[end_locals[local][0]]
+        field_name = f'{name}${local}'
+        field_descriptor = _descriptor(end_locals[local])
+        cls.field(field_name, field_descriptor, synthetic=True)
+
+        _LOADERS[kind](helper_code, helper_locals[local])
+        helper_code.store_static_field(cls.name, field_name, field_descriptor)
+        replacement.load_static_field(cls.name, field_name, field_descriptor)
+        _STORERS[kind](replacement, local)
+
+    if through is None:
+        helper_code.return_void()
+    else:
+        helper_code.return_reference()
+
+    code.replace_instructions(start, end, replacement)
+    return True
+
+
+def split_method(cls: Class, name: str, method: Method, excess: int) -> bool:
+    """
+    Outline regions of the too long method code into private static helper methods.
+    The statements and the array items stores are moved, the largest regions first,
+    until the code shrinks by the excess or no region is left.
+    :param cls: The class of the method, the helper methods and fields are added into it.
+    :param name: Name of the method, the helpers are named after it.
+    :param method: The method with the code without unreachable instructions.
+    :param excess: Number of bytes the code has to shrink by.
+    :return: True if any region was outlined, the code is shorter then.
+    """
+    code = method.code
+
+    positions = [0]
+    for opcode in code.opcodes:
+        positions.append(positions[-1] + LENGTHS[opcode])
+
+    code_frames = frames(code, method.descriptor, range(len(code)))
+    chosen = _choose(code, _regions(code, code_frames, positions), excess)
+
+    # the already outlined regions keep only the accesses of the passed variables, the original ones are a superset
+    accesses = []
+    for index in range(len(code)):
+        access = _local_access(code, index)
+        if access is not None:
+            accesses.append((index, *access))
+
+    # the helpers are numbered by the count of the class methods to keep the names unique
+    chosen.sort(key=lambda r: r.start)
+    first = len(cls.methods)
+    base_name = name.strip('<>')
+
+    # from the end, the preceding instructions keep their indexes
+    outlined = False
+    for (number, region) in reversed(list(enumerate(chosen, first))):
+        if _outline(cls, method, region, f'{base_name}${number}', code_frames[region.start],
+                    code_frames[region.end], accesses):
+            outlined = True
+
+    return outlined
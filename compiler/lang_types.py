@@ -1,15 +1,23 @@
-from abc import ABC
+from compiler.util import Interned
 
 
 # --- Our language types
 
-class Type(ABC):
+class Type(metaclass=Interned):
+    """
+    Immutable type, the instances with the same value are shared.
+    """
+
     def __eq__(self, other):
         return isinstance(other, self.__class__)
 
     def __hash__(self):
         return hash(self.__class__)
 
+    def __reduce__(self):
+        # the unpickled instance is interned too
+        return self.__class__, ()
+
     def is_array_any(self) -> bool:
         return isinstance(self, TypeArray) and self.inner == TypeAny()
 
@@ -63,6 +71,7 @@ class TypeArray(Type):
     def __init__(self, dim: int, inner: BaseType):
         self._dim = dim
         self._inner = inner
+        self._hash = hash((dim, inner))
 
     @property
     def dim(self) -> int:
@@ -84,7 +93,10 @@ class TypeArray(Type):
             and (self.inner == other.inner or self.inner == TypeAny() or other.inner == TypeAny())
 
     def __hash__(self):
-        return hash((self._dim, self._inner))
+        return self._hash
+
+    def __reduce__(self):
+        return self.__class__, (self._dim, self._inner)
 
 
 class TypeVoid(BaseType):
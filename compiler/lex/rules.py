@@ -2,7 +2,7 @@ import re
 
 from ply.lex import TOKEN
 
-from compiler.util import replace_escapes
+from compiler.util import replace_escapes, LineIndex
 
 keywords = {
     'var': 'VAR',
@@ -86,7 +86,7 @@ def t_LITERAL_INT(t):
 
 def t_LITERAL_STR(t):
     r"""
-    "([^\\"]|\\.)*\"
+    "[^\\"]*(?:\\.[^\\"]*)*\"
     """
     t.value = str(t.value)
 
@@ -136,17 +136,14 @@ def t_newline(t):
 t_ignore = ' \t'
 
 
-def find_column(inp, pos):
-    line_start = inp.rfind('\n', 0, pos) + 1
-    return pos - line_start
-
-
 class LexerError(Exception):
     pass
 
 
 # Error handling rule
 def t_error(t):
-    print("lexer error: line=", t.lexer.lineno, "col=", find_column(t.lexer.lexdata, t.lexer.lexpos))
+    # the line is counted by the lexer, it starts at the first line of the parallel parsed chunk
+    (_, column) = LineIndex(t.lexer.lexdata).location(t.lexer.lexpos)
+    print("lexer error: line=", t.lexer.lineno, "col=", column)
 
     raise LexerError()
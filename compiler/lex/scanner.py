@@ -0,0 +1,151 @@
+import re
+from typing import Optional, Iterator, List, Tuple
+
+from ply.lex import LexToken
+
+from compiler.lex import rules
+from compiler.lex.rules import keywords, boolean, t_error, t_LITERAL_REAL, t_LITERAL_INT, t_LITERAL_STR, \
+    t_IDENTIFIER
+from compiler.util import replace_escapes
+
+# kinds of the alternatives of the combined pattern
+_NEWLINE = 0
+_IDENTIFIER = 1
+_TEXT = 2
+_REAL = 3
+_INT = 4
+_STR = 5
+_ERROR = 6
+
+# Key = identifier, Value = (token type, token value) of the keywords and boolean literals
+_IDENTIFIERS = {
+    word: ('LITERAL_BOOL', boolean[word]) if word in boolean else (token_type, word)
+    for (word, token_type) in keywords.items()
+}
+
+
+def _alternatives() -> List[Tuple[int, Optional[str], str]]:
+    """
+    The alternatives of the combined pattern.
+    The PLY lexer tries the function rules in the order of definition and then the string rules from the longest regex.
+    Only the order of the alternatives starting with the same characters matters,
+    so the frequent ones are moved to the front.
+    :return: List of (kind, token type, regex).
+    """
+    alternatives = [
+        (_NEWLINE, None, r'\n[ \t\n]*'),
+        (_IDENTIFIER, 'IDENTIFIER', getattr(t_IDENTIFIER, 'regex', t_IDENTIFIER.__doc__)),
+    ]
+
+    strings = [(name[2:], value) for (name, value) in vars(rules).items()
+               if name.startswith('t_') and name != 't_ignore' and isinstance(value, str)]
+    strings.sort(key=lambda s: len(s[1]), reverse=True)
+    alternatives.extend((_TEXT, token_type, regex) for (token_type, regex) in strings)
+
+    for (kind, token_type, rule) in [
+        (_REAL, 'LITERAL_REAL', t_LITERAL_REAL),
+        (_INT, 'LITERAL_INT', t_LITERAL_INT),
+        (_STR, 'LITERAL_STR', t_LITERAL_STR),
+    ]:
+        alternatives.append((kind, token_type, getattr(rule, 'regex', rule.__doc__)))
+
+    # any other character except the ignored ones, they are skipped in front of every alternative
+    alternatives.append((_ERROR, None, r'[^ \t]'))
+    return alternatives
+
+
+def _compile() -> Tuple[re.Pattern, List[Tuple[int, Optional[str]]]]:
+    """
+    Combine the alternatives into a single pattern, each one wrapped in a group and preceded by the ignored characters.
+    The index of the outer group of the matched alternative is the lastindex of the match.
+    :return: The pattern and the dispatch table, Index = group index, Value = (kind, token type).
+    """
+    parts = []
+    dispatch = [(_ERROR, None)]
+
+    for (kind, token_type, regex) in _alternatives():
+        parts.append(f'({regex})')
+        dispatch.append((kind, token_type))
+        # the inner groups of the alternative are never the lastindex
+        dispatch.extend([(_ERROR, None)] * re.compile(regex, re.VERBOSE).groups)
+
+    return re.compile(r'[ \t]*(?:' + '|'.join(parts) + ')', re.VERBOSE), dispatch
+
+
+_PATTERN, _DISPATCH = _compile()
+
+
+class Scanner:
+    """
+    Hand-written scanner producing the same token stream as the PLY lexer built from the rules,
+    including the line numbers, positions and errors.
+    It implements the part of the PLY lexer interface used by the parser.
+    """
+
+    def __init__(self):
+        self.lexdata: Optional[str] = None
+        self.lexpos: int = 0
+        self.lineno: int = 1
+        self._tokens: Iterator[LexToken] = iter(())
+
+    def input(self, data: str):
+        """
+        Start scanning the data.
+        :param data: The source code.
+        """
+        self.lexdata = data
+        self.lexpos = 0
+        self._tokens = self._scan(data)
+
+    def token(self) -> Optional[LexToken]:
+        """
+        Scan the next token.
+        :return: The token or None at the end of the input.
+        """
+        return next(self._tokens, None)
+
+    def __iter__(self):
+        return self._tokens
+
+    def _scan(self, data: str) -> Iterator[LexToken]:
+        dispatch = _DISPATCH
+        identifiers = _IDENTIFIERS
+
+        for match in _PATTERN.finditer(data):
+            group = match.lastindex
+            (kind, token_type) = dispatch[group]
+            value = text = match.group(group)
+
+            if kind == _NEWLINE:
+                self.lineno += text.count('\n')
+                continue
+            elif kind == _TEXT:
+                pass
+            elif kind == _IDENTIFIER:
+                (token_type, value) = identifiers.get(value, (token_type, value))
+            elif kind == _INT:
+                value = int(value)
+            elif kind == _REAL:
+                value = float(value)
+            elif kind == _STR:
+                value = replace_escapes(value[1:-1])
+            else:
+                tok = LexToken()
+                tok.type = 'error'
+                tok.lineno = self.lineno
+                tok.lexpos = match.start(group)
+                tok.value = data[tok.lexpos:]
+                tok.lexer = self
+                self.lexpos = tok.lexpos
+                t_error(tok)
+                break
+
+            tok = LexToken()
+            tok.type = token_type
+            tok.value = value
+            tok.lineno = self.lineno
+            self.lexpos = end = match.end()
+            tok.lexpos = end - len(text)
+            yield tok
+
+        self.lexpos = len(data) + 1
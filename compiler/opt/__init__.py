@@ -0,0 +1 @@
+from compiler.opt.manager import *
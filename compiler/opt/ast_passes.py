@@ -0,0 +1,178 @@
+from typing import Optional
+
+from compiler.lang_types import TypeInt, TypeReal, TypeBool, TypeStr
+from compiler.syntax.ast import Node
+from compiler.util import is_int
+
+LITERALS = {Node.VALUE_INT, Node.VALUE_REAL, Node.VALUE_BOOL, Node.VALUE_STR}
+UNARY_OPERATORS = {Node.UMINUS, Node.UPLUS, Node.NOT}
+BINARY_OPERATORS = {
+    Node.MUL, Node.DIV, Node.PLUS, Node.MINUS,
+    Node.EQ, Node.NE, Node.LT, Node.GT, Node.LE, Node.GE,
+    Node.AND, Node.OR
+}
+
+# statement keys holding nested statements lists
+STATEMENTS_KEYS = ('statements', 'if_statements', 'else_statements')
+
+
+def _wrap_int(value: int) -> int:
+    """
+    Wrap the integer into 4 bytes the way the JVM int arithmetic does.
+    """
+    return (value + 0x80000000) % 0x100000000 - 0x80000000
+
+
+def _literal(value) -> dict:
+    if isinstance(value, bool):
+        return {'node': Node.VALUE_BOOL, 'value': value, 'type': TypeBool()}
+    elif isinstance(value, int):
+        return {'node': Node.VALUE_INT, 'value': value, 'type': TypeInt()}
+    elif isinstance(value, float):
+        return {'node': Node.VALUE_REAL, 'value': value, 'type': TypeReal()}
+    elif isinstance(value, str):
+        return {'node': Node.VALUE_STR, 'value': value, 'type': TypeStr()}
+    else:
+        raise NotImplementedError(value)
+
+
+def _fold_unary(node_type: Node, value):
+    if node_type == Node.UMINUS:
+        return _wrap_int(-value) if isinstance(value, int) else -value
+    elif node_type == Node.UPLUS:
+        return value
+    elif node_type == Node.NOT:
+        return not value
+    return None
+
+
+def _fold_binary(node_type: Node, left, right):
+    is_integer = isinstance(left, int) and not isinstance(left, bool)
+
+    if node_type == Node.PLUS:
+        return _wrap_int(left + right) if is_integer else left + right
+    elif node_type == Node.MINUS:
+        return _wrap_int(left - right) if is_integer else left - right
+    elif node_type == Node.MUL:
+        return _wrap_int(left * right) if is_integer else left * right
+    elif node_type == Node.DIV:
+        # leave the division by zero to the runtime
+        if right == 0:
+            return None
+        if is_integer:
+            # JVM rounds the integer division towards zero
+            quotient = abs(left) // abs(right)
+            return _wrap_int(quotient if (left < 0) == (right < 0) else -quotient)
+        return left / right
+    elif node_type == Node.EQ:
+        return left == right
+    elif node_type == Node.NE:
+        return left != right
+    elif node_type == Node.LT:
+        return left < right
+    elif node_type == Node.GT:
+        return left > right
+    elif node_type == Node.LE:
+        return left <= right
+    elif node_type == Node.GE:
+        return left >= right
+    elif node_type == Node.AND:
+        return left and right
+    elif node_type == Node.OR:
+        return left or right
+    return None
+
+
+def _fold(expression) -> Optional[dict]:
+    """
+    Try to evaluate the operator expression with literal operands.
+    :param expression: The operator expression node.
+    :return: The literal node or None if the expression can not be folded.
+    """
+    node_type = expression['node']
+
+    if node_type in UNARY_OPERATORS:
+        operand = expression['expression']
+        if operand['node'] not in LITERALS:
+            return None
+        value = _fold_unary(node_type, operand['value'])
+    else:
+        left = expression['left']
+        right = expression['right']
+        if left['node'] not in LITERALS or right['node'] not in LITERALS:
+            return None
+        value = _fold_binary(node_type, left['value'], right['value'])
+
+    if value is None or (isinstance(value, int) and not isinstance(value, bool) and not is_int(value)):
+        return None
+
+    return _literal(value)
+
+
+def fold_constants(ast):
+    """
+    Replace the operators with literal operands by their results.
+    The nodes are folded in place, from the leaves up.
+    :param ast: The analyzed AST.
+    """
+    # post-order walk, every node is pushed twice, the second time to be folded
+    work = [(ast, False)]
+
+    while work:
+        (node, children_done) = work.pop()
+
+        if children_done:
+            literal = _fold(node)
+            if literal is not None:
+                node.clear()
+                node.update(literal)
+            continue
+
+        if node.get('node') in UNARY_OPERATORS or node.get('node') in BINARY_OPERATORS:
+            work.append((node, True))
+
+        for value in node.values():
+            if isinstance(value, dict):
+                work.append((value, False))
+            elif isinstance(value, list):
+                work.extend((item, False) for item in value if isinstance(item, dict))
+
+
+def eliminate_dead_branches(ast):
+    """
+    Remove the conditions and loops with a literal condition,
+    the taken branch statements are merged into the enclosing statements.
+    :param ast: The analyzed AST.
+    """
+    work = [ast['statements']]
+
+    while work:
+        statements = work.pop()
+        pending = list(reversed(statements))
+        result = []
+
+        while pending:
+            statement = pending.pop()
+            node_type = statement['node']
+            condition = statement.get('condition')
+
+            if condition is not None and condition['node'] == Node.VALUE_BOOL:
+                if node_type == Node.IF:
+                    if condition['value']:
+                        pending.extend(reversed(statement['statements']))
+                    continue
+                elif node_type == Node.IF_ELSE:
+                    taken = statement['if_statements'] if condition['value'] else statement['else_statements']
+                    pending.extend(reversed(taken))
+                    continue
+                elif node_type == Node.WHILE and not condition['value']:
+                    continue
+
+            result.append(statement)
+
+        statements[:] = result
+
+        for statement in result:
+            for key in STATEMENTS_KEYS:
+                if key in statement:
+                    work.append(statement[key])
@@ -0,0 +1,40 @@
+from compiler.gen.cls import Class
+from compiler.gen.opcode import Opcode, IS_JUMP
+
+
+def thread_jumps(cls: Class):
+    """
+    Retarget the jumps leading to an unconditional jump
+    directly to the final target.
+    :param cls: The generated class.
+    """
+    for (_, method) in cls.methods:
+        code = method.code
+        opcodes = code.opcodes
+        operands = code.operands
+
+        for (index, opcode) in enumerate(opcodes):
+            if not IS_JUMP[opcode]:
+                continue
+
+            target = operands[index]
+            seen = set()
+            while 0 <= target < len(opcodes) and opcodes[target] == Opcode.GOTO and target not in seen:
+                seen.add(target)
+                target = operands[target]
+
+            operands[index] = target
+
+
+def remove_redundant_gotos(cls: Class):
+    """
+    Remove the unconditional jumps to the next instruction.
+    :param cls: The generated class.
+    """
+    for (_, method) in cls.methods:
+        code = method.code
+        operands = code.operands
+        code.remove_instructions(
+            i for (i, opcode) in enumerate(code.opcodes)
+            if opcode == Opcode.GOTO and operands[i] == i + 1
+        )
@@ -0,0 +1,146 @@
+import time
+from enum import Enum
+from typing import Callable, Dict, List, Iterable
+
+from compiler.gen.cls import Class
+from compiler.opt.ast_passes import fold_constants, eliminate_dead_branches
+from compiler.opt.code_passes import thread_jumps, remove_redundant_gotos
+
+
+class PassKind(Enum):
+    AST = 'ast'
+    CODE = 'code'
+
+
+class Pass:
+    def __init__(self, name: str, kind: PassKind, run: Callable):
+        self._name = name
+        self._kind = kind
+        self._run = run
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def kind(self) -> PassKind:
+        return self._kind
+
+    def run(self, target):
+        self._run(target)
+
+
+class PassRecord:
+    def __init__(self, name: str, kind: PassKind, seconds: float, size_before: int, size_after: int):
+        self.name = name
+        self.kind = kind
+        self.seconds = seconds
+        self.size_before = size_before
+        self.size_after = size_after
+
+    def __str__(self):
+        unit = 'nodes' if self.kind == PassKind.AST else 'instructions'
+        diff = self.size_after - self.size_before
+        return f'{self.name:<24} {self.seconds * 1000:>10.3f} ms {self.size_before:>10} -> {self.size_after:<10} ' \
+               f'({diff:+} {unit})'
+
+
+# Key = pass name, Value = pass, in the order of execution
+PASSES: Dict[str, Pass] = {p.name: p for p in [
+    Pass('fold-constants', PassKind.AST, fold_constants),
+    Pass('eliminate-dead-branches', PassKind.AST, eliminate_dead_branches),
+    Pass('thread-jumps', PassKind.CODE, thread_jumps),
+    Pass('remove-redundant-gotos', PassKind.CODE, remove_redundant_gotos),
+]}
+
+# Key = optimization level, Value = names of the enabled passes
+OPT_LEVELS = {
+    0: (),
+    1: ('fold-constants', 'thread-jumps'),
+    2: ('fold-constants', 'eliminate-dead-branches', 'thread-jumps', 'remove-redundant-gotos'),
+}
+
+
+def _ast_size(ast) -> int:
+    """
+    Count the nodes of the AST.
+    """
+    count = 0
+    work = [ast]
+
+    while work:
+        node = work.pop()
+        count += 1
+        for value in node.values():
+            if isinstance(value, dict):
+                work.append(value)
+            elif isinstance(value, list):
+                work.extend(item for item in value if isinstance(item, dict))
+
+    return count
+
+
+def _code_size(cls: Class) -> int:
+    """
+    Count the instructions of all the class methods.
+    """
+    return sum(len(method.code) for (_, method) in cls.methods)
+
+
+class PassManager:
+    def __init__(self, level: int = 0, enabled: Iterable[str] = (), disabled: Iterable[str] = ()):
+        """
+        Create the pipeline of the optimization level passes.
+        :param level: The optimization level.
+        :param enabled: Names of the passes enabled in addition to the level passes.
+        :param disabled: Names of the passes removed from the level passes.
+        """
+        enabled = set(enabled)
+        disabled = set(disabled)
+
+        for name in enabled | disabled:
+            if name not in PASSES:
+                raise KeyError(name)
+
+        names = (set(OPT_LEVELS[level]) | enabled) - disabled
+        self._pipeline: List[Pass] = [p for p in PASSES.values() if p.name in names]
+        self._records: List[PassRecord] = []
+
+    @property
+    def pipeline(self) -> List[Pass]:
+        return self._pipeline
+
+    @property
+    def records(self) -> List[PassRecord]:
+        return self._records
+
+    def _run(self, kind: PassKind, target, size: Callable):
+        for p in self._pipeline:
+            if p.kind != kind:
+                continue
+
+            before = size(target)
+            start = time.perf_counter()
+            p.run(target)
+            seconds = time.perf_counter() - start
+            self._records.append(PassRecord(p.name, kind, seconds, before, size(target)))
+
+    def run_ast_passes(self, ast):
+        """
+        Run the AST passes of the pipeline on the analyzed AST.
+        :param ast: The AST.
+        """
+        self._run(PassKind.AST, ast, _ast_size)
+
+    def run_code_passes(self, cls: Class):
+        """
+        Run the bytecode passes of the pipeline on the generated class.
+        :param cls: The class.
+        """
+        self._run(PassKind.CODE, cls, _code_size)
+
+    def report(self) -> str:
+        """
+        Timing and size changes of the executed passes.
+        """
+        return '\n'.join(str(r) for r in self._records)
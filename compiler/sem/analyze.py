@@ -1,16 +1,29 @@
 # Here goes AST analyze process
-from typing import List, Optional, Tuple, Iterable
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple, Iterable, Generator
 
 from compiler.sem.predefined import FN_MAIN, FN_MAIN_PARAMS, FN_MAIN_RETURN, FN_LEN, FN_INT, FN_REAL, FN_BOOL, FN_STR, \
     FN_SUBSTRING, FN_WRITE, FN_READ_LINE, FN_EOF
 from compiler.syntax.ast import Node
 from compiler.lang_types import Type, TypeInt, TypeReal, TypeStr, TypeBool, TypeArray, TypeAny, BaseType, TypeVoid
-from compiler.util import is_int
+from compiler.util import is_int, LineIndex
 
+# the default limit of the nested scopes, a safety stop for the runaway generated programs
+MAX_DEPTH = 100000
+# the programs from this number of functions have the function bodies checked in parallel
+PARALLEL_THRESHOLD = 256
+# the number of batches of functions per process, the smaller batches balance the load of the processes
+BATCHES_PER_JOB = 4
+
+_max_depth = MAX_DEPTH
 _vars = []  # Key = depth, Value => Key = identifier, Value = (type, is constant)
+# all the variables of _vars visible from the current depth, the variables can not be shadowed
+# Key = identifier, Value = (type, is constant)
+_visible = {}
 
 # Key = (identifier, tuple of params types), Value = return type
-_functions = {
+_PREDEFINED_FUNCTIONS = {
     (FN_LEN, (TypeStr(),)): TypeInt(),
 
     (FN_INT, (TypeInt(),)): TypeInt(),
@@ -39,8 +52,16 @@ _functions = {
     (FN_READ_LINE, ()): TypeStr(),
     (FN_EOF, ()): TypeBool(),
 }
+_functions = dict(_PREDEFINED_FUNCTIONS)
 
-_errors = []
+_errors = []  # (position or None, message)
+# the line starts of the analyzed source code, the errors are located only if it is known
+_lines: Optional[LineIndex] = None
+# the function definitions with the bodies left for the parallel checking or None if they are checked in place
+# (statement, top level scope, number of the constants visible to the function, number of the preceding errors)
+_deferred: Optional[list] = None
+# the top level constants visible to the deferred functions, (identifier, (type, is constant)) by definition order
+_constants = []
 
 # table of allowed operand types for operators and their result types
 # Key = operator_node_type => variants[([operand1, ...], result)]
@@ -109,35 +130,305 @@ ALLOWED_OPERATOR_TYPES = {
     ]
 }
 
+# the same table flattened for the direct lookup
+# Key = (operator_node_type, operand1 type class, ...) => result
+_OPERATOR_TYPES = {
+    (node_type, *operands): result
+    for (node_type, variants) in ALLOWED_OPERATOR_TYPES.items()
+    for (operands, result) in variants
+}
+
+LITERALS = frozenset({Node.VALUE_INT, Node.VALUE_REAL, Node.VALUE_BOOL, Node.VALUE_STR})
+UNARY_OPERATORS = frozenset({Node.UMINUS, Node.UPLUS, Node.NOT})
+BINARY_OPERATORS = frozenset(ALLOWED_OPERATOR_TYPES) - UNARY_OPERATORS
 
-def analyze(ast) -> bool:
+
+def analyze(ast, max_depth: int = MAX_DEPTH, source: Optional[str] = None, jobs: int = 1) -> bool:
     """
     Analyze the AST types, identifiers.
+    The signatures of all the functions are collected first, so a function can be called before its definition.
+    Then the top level definitions are analyzed in order, a function body sees only the constants defined above it.
     :param ast: The AST.
+    :param max_depth: The limit of the nested scopes.
+    :param source: The source code of the AST used to locate the errors.
+    :param jobs: The number of processes checking the function bodies of large programs.
     :return: List of errors None otherwise
     """
+    global _max_depth, _lines
     # print("ANALYZING THE INPUT...")
 
-    if _analyze_layer(ast['statements'], False):
+    _max_depth = max_depth
+    _lines = LineIndex(source) if source is not None else None
+    _reset()
+
+    statements = ast['statements']
+    if _collect_signatures(statements) and _analyze_program(statements, jobs):
         _check_main()
 
-    for e in _errors:
-        print(e)
+    for (pos, message) in _errors:
+        print(_locate(pos, message))
 
     return len(_errors) == 0
 
 
+def _reset():
+    """
+    Forget the symbols and errors of the previous analysis.
+    """
+    _vars.clear()
+    _visible.clear()
+    _errors.clear()
+    _functions.clear()
+    _functions.update(_PREDEFINED_FUNCTIONS)
+
+
 def _check_main():
     fn = _get_func(FN_MAIN, FN_MAIN_PARAMS)
     if fn != FN_MAIN_RETURN:
-        _errors.append("Missing main function.")
+        _errors.append((None, "Missing main function."))
+
+
+def _locate(pos: Optional[int], message: str) -> str:
+    """
+    Prefix the message with the line and column of the position.
+    :param pos: The position the message is about.
+    :param message: The message.
+    :return: The located message or the message itself if the position is not known.
+    """
+    if pos is None or _lines is None:
+        return message
+
+    (line, column) = _lines.location(pos)
+    return f'line= {line}, col= {column}: {message}'
+
+
+def _error(node, message: str):
+    """
+    Record the error at the position of the node, it is located only when printed.
+    """
+    _errors.append((node.get('pos'), message))
+
+
+def _collect_signatures(statements) -> bool:
+    """
+    Add the signatures of all the function definitions into the symbols table.
+    :param statements: The top level statements.
+    :return: True if no function is defined twice, False otherwise.
+    """
+    for statement in statements:
+        if statement['node'] != Node.FUNCTION_DEFINITION:
+            continue
+
+        name = statement['name']
+        ret = statement['return']
+
+        params_types = []
+        for p in statement['parameters']:
+            t = _node_to_type(p['type'])
+            p['type'] = t
+            params_types.append(t)
+
+        fn = _get_func(name, params_types)
+        if fn is not None:
+            _error(statement, f'Function \'{name}({", ".join(str(t) for t in params_types)})\' is already defined.')
+            return False
+
+        ret_type = _node_to_type(ret)
+        ret['type'] = ret_type
+        _add_func(name, params_types, ret_type)
+
+    return True
+
+
+def _analyze_program(statements, jobs: int) -> bool:
+    """
+    Analyze the top level statements, the bodies of the functions of a large program are checked in parallel.
+    The errors are the same as by the checking in place, those of the first failing definition and the preceding ones.
+    :param statements: The top level statements.
+    :param jobs: The number of processes.
+    :return: True if the statements are valid, False otherwise.
+    """
+    global _deferred, _constants
+
+    if jobs <= 1 or 'fork' not in multiprocessing.get_all_start_methods() \
+            or sum(s['node'] == Node.FUNCTION_DEFINITION for s in statements) < PARALLEL_THRESHOLD:
+        return _run_layers(_analyze_layer(statements, False))
+
+    _deferred = []
+    try:
+        ok = _run_layers(_analyze_layer(statements, False))
+        deferred = _deferred
+        results = _check_functions_parallel(jobs)
+    finally:
+        _deferred = None
+        _constants = []
+
+    # the errors of the functions are placed among the errors of the constants in the order of the definitions
+    errors = []
+    errors_count = 0
+
+    for ((statement, _, _, preceding_count), result) in zip(deferred, results):
+        (function_ok, function_errors, types, parameters) = result
+        _annotate(statement, types, parameters)
+
+        errors.extend(_errors[errors_count:preceding_count])
+        errors.extend(function_errors)
+        errors_count = preceding_count
+
+        if not function_ok:
+            # the checking in place would stop at the function
+            _errors[:] = errors
+            return False
+
+    errors.extend(_errors[errors_count:])
+    _errors[:] = errors
+    return ok
+
+
+def _check_functions_parallel(jobs: int) -> List[Tuple[bool, list, list, list]]:
+    """
+    Check the deferred function bodies by the pool of the forked processes, each one gets the batches of the adjacent
+    functions. The processes inherit the AST and the symbols table, so only the ranges of the deferred functions
+    are sent to them and only the errors and the annotations of the nodes are sent back.
+    :param jobs: The number of processes.
+    :return: List of the results of _check_functions in the order of the deferred functions.
+    """
+    global _constants
+
+    if not _deferred:
+        return []
+
+    _constants = list(_deferred[0][1].items())
+    size = -(-len(_deferred) // (jobs * BATCHES_PER_JOB))
+
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context('fork')) as pool:
+        futures = [pool.submit(_check_functions, start, min(start + size, len(_deferred)))
+                   for start in range(0, len(_deferred), size)]
+        return [result for future in futures for result in future.result()]
+
+
+def _check_functions(start: int, end: int) -> List[Tuple[bool, list, list, list]]:
+    """
+    Check the bodies of the range of the deferred functions in the worker process.
+    :param start: Index of the first function.
+    :param end: Index after the last function.
+    :return: List of (whether it is valid, its errors, the types and the parameters of its annotated nodes).
+    """
+    results = []
+    scope = {}
+    _vars.append(scope)
+
+    for (statement, _, count, _) in _deferred[start:end]:
+        for (name, var) in _constants[len(scope):count]:
+            scope[name] = var
+            _visible[name] = var
+
+        _errors.clear()
+        ok = _run_layers(_analyze_function(statement))
+
+        nodes = _annotated_nodes(statement)
+        results.append((ok, list(_errors), [node.get('type') for node in nodes],
+                        [node.get('parameters') for node in nodes]))
+
+    _pop_layer()
+    return results
+
+
+def _annotated_nodes(statement) -> List[dict]:
+    """
+    List the nodes of the function body in the same order in every process.
+    The values of the keys set by the analysis are not walked into, they differ before and after the analysis.
+    :param statement: The function definition.
+    :return: The nodes.
+    """
+    nodes = []
+    work = list(statement['statements'])
+
+    while work:
+        node = work.pop()
+        nodes.append(node)
 
+        for (key, value) in node.items():
+            kind = type(value)
+            if kind is dict:
+                if key != 'type':
+                    work.append(value)
+            elif kind is list:
+                if key != 'parameters':
+                    work.extend(value)
 
-def _analyze_layer(statements, in_loop, return_type=None, params=None) -> bool:
+    return nodes
 
-    # Recursive limit stop
-    if len(_vars) > 32:
-        _errors.append("Depth overreached the limit of 32.")
+
+def _annotate(statement, types: list, parameters: list):
+    """
+    Set the types and the parameters resolved by the worker process on the nodes of the function body.
+    """
+    for (node, t, p) in zip(_annotated_nodes(statement), types, parameters):
+        if p is not None:
+            node['parameters'] = p
+        if t is not None:
+            node['type'] = t
+
+
+def _analyze_function(statement) -> Generator:
+    """
+    Check the body of the function with the already collected signature.
+    :param statement: The function definition.
+    :return: The checking generator to be run by _run_layers.
+    """
+    name = statement['name']
+    params = statement['parameters']
+    ret_type = statement['return']['type']
+    stmts = statement['statements']
+
+    if not (yield stmts, False, ret_type, params):
+        return False
+
+    if not _validate_function_returns(stmts, Node.RETURN_VOID if isinstance(ret_type, TypeVoid) else Node.RETURN):
+        params_types = ", ".join(str(p['type']) for p in params)
+        _error(statement, f'Function \'{name}({params_types})\' may end without a return.')
+        return False
+
+    return True
+
+
+def _pop_layer():
+    for name in _vars.pop():
+        del _visible[name]
+
+
+def _run_layers(layer: Generator) -> bool:
+    """
+    Run the analysis of a layer without the recursion.
+    The layer yields its nested layers and receives whether they are valid,
+    the analyses of the enclosing layers are suspended on an explicit stack.
+    :param layer: The layer generator.
+    :return: True if the layer is valid, False otherwise.
+    """
+    layers = [layer]
+    ok = None
+
+    while True:
+        try:
+            nested = layers[-1].send(ok)
+        except StopIteration as stop:
+            layers.pop()
+            ok = stop.value
+
+            if not layers:
+                return ok
+            continue
+
+        layers.append(_analyze_layer(*nested))
+        ok = None
+
+
+def _analyze_layer(statements, in_loop, return_type=None, params=None) -> Generator:
+
+    # Depth limit stop
+    if len(_vars) >= _max_depth:
+        _errors.append((None, f"Depth overreached the limit of {_max_depth}."))
         return False
 
     _vars.append({})
@@ -149,7 +440,8 @@ def _analyze_layer(statements, in_loop, return_type=None, params=None) -> bool:
             t = p['type']
             var = _get_var(name)
             if var is not None:
-                _errors.append(f'Variable \'{name}\' is already defined.')
+                _error(p, f'Variable \'{name}\' is already defined.')
+                _pop_layer()
                 return False
 
             _add_var(name, t, False)
@@ -161,31 +453,11 @@ def _analyze_layer(statements, in_loop, return_type=None, params=None) -> bool:
 
         node_type = statement['node']
 
-        # Function definition
+        # Function definition, the signature is already collected
         if node_type == Node.FUNCTION_DEFINITION:
-            name = statement['name']
-            params = statement['parameters']
-            ret = statement['return']
-            stmts = statement['statements']
-
-            params_types = []
-            for p in params:
-                t = _node_to_type(p['type'])
-                p['type'] = t
-                params_types.append(t)
-
-            fn = _get_func(name, params_types)
-            if fn is not None:
-                _errors.append(f'Function \'{name}({", ".join(str(t) for t in params_types)})\' is already defined.')
-                break
-
-            ret_type = _node_to_type(ret)
-            ret['type'] = ret_type
-            _add_func(name, params_types, ret_type)
-            if not _analyze_layer(stmts, in_loop, ret_type, params):
-                break
-            if not _validate_function_returns(stmts, Node.RETURN_VOID if isinstance(ret_type, TypeVoid) else Node.RETURN):
-                print(f'Function \'{name}({", ".join(str(t) for t in params_types)})\' may end without a return.')
+            if _deferred is not None:
+                _deferred.append((statement, _vars[-1], len(_vars[-1]), len(_errors)))
+            elif not (yield from _analyze_function(statement)):
                 break
 
         # Variable and constant definition
@@ -196,7 +468,7 @@ def _analyze_layer(statements, in_loop, return_type=None, params=None) -> bool:
 
             var = _get_var(name)
             if var is not None:
-                _errors.append(f'Variable \'{name}\' is already defined.')
+                _error(statement, f'Variable \'{name}\' is already defined.')
                 break
             exp_type = _validate_expression(exp)
 
@@ -206,24 +478,24 @@ def _analyze_layer(statements, in_loop, return_type=None, params=None) -> bool:
             var_type = _node_to_type(t)
 
             if var_type != exp_type:
-                _errors.append(
-                    f'Can not assign a value of type {exp_type} into variable \'{name}\' of type {var_type}.')
+                _error(statement,
+                       f'Can not assign a value of type {exp_type} into variable \'{name}\' of type {var_type}.')
 
             statement['type'] = var_type
             _array_type_inference(exp, var_type)
             _add_var(name, var_type, node_type == Node.CONSTANT_DEFINITION)
 
         elif node_type == Node.VARIABLE_STORE:
-            if _validate_var_store(statement) is None:
+            if _run_validator(_validate_var_store(statement)) is None:
                 break
 
         elif node_type == Node.ARRAY_STORE:
-            if _validate_array_store(statement) is None:
+            if _run_validator(_validate_array_store(statement)) is None:
                 break
 
         # Function call
         elif node_type == Node.FUNCTION_CALL:
-            if _validate_function_call(statement) is None:
+            if _run_validator(_validate_function_call(statement)) is None:
                 break
 
         # Condition (IF)
@@ -236,10 +508,10 @@ def _analyze_layer(statements, in_loop, return_type=None, params=None) -> bool:
                 break
 
             if cond_type != TypeBool():
-                _errors.append(f'Condition expression ({cond_type}) is not of type Bool.')
+                _error(condition, f'Condition expression ({cond_type}) is not of type Bool.')
                 break
 
-            if not _analyze_layer(stmts, in_loop, return_type):
+            if not (yield stmts, in_loop, return_type):
                 break
 
         # Condition (IF-ELSE)
@@ -253,12 +525,12 @@ def _analyze_layer(statements, in_loop, return_type=None, params=None) -> bool:
                 break
 
             if cond_type != TypeBool():
-                _errors.append(f'Condition expression ({cond_type}) is not of type Bool.')
+                _error(condition, f'Condition expression ({cond_type}) is not of type Bool.')
                 break
 
-            if not _analyze_layer(if_stmts, in_loop, return_type):
+            if not (yield if_stmts, in_loop, return_type):
                 break
-            if not _analyze_layer(else_stmts, in_loop, return_type):
+            if not (yield else_stmts, in_loop, return_type):
                 break
 
         # Loop (WHILE)
@@ -271,10 +543,10 @@ def _analyze_layer(statements, in_loop, return_type=None, params=None) -> bool:
                 break
 
             if cond_type != TypeBool():
-                _errors.append(f'Condition expression ({cond_type}) is not of type Bool.')
+                _error(condition, f'Condition expression ({cond_type}) is not of type Bool.')
                 break
 
-            if not _analyze_layer(stmts, True, return_type):
+            if not (yield stmts, True, return_type):
                 break
 
         # Return keyword
@@ -289,8 +561,8 @@ def _analyze_layer(statements, in_loop, return_type=None, params=None) -> bool:
                     break
 
             if exp_type != return_type:
-                _errors.append(
-                    f'Return expression has a different type ({exp_type}) than the function ({return_type}).')
+                _error(statement,
+                       f'Return expression has a different type ({exp_type}) than the function ({return_type}).')
                 break
 
             statement['type'] = exp_type
@@ -298,18 +570,18 @@ def _analyze_layer(statements, in_loop, return_type=None, params=None) -> bool:
         # Break keyword
         elif node_type == Node.BREAK:
             if not in_loop:
-                _errors.append('Break definition outside of a loop.')
+                _error(statement, 'Break definition outside of a loop.')
                 break
 
         # Continue keyword
         elif node_type == Node.CONTINUE:
             if not in_loop:
-                _errors.append('Continue definition outside of a loop.')
+                _error(statement, 'Continue definition outside of a loop.')
                 break
     else:
         ok = True
 
-    _vars.pop()
+    _pop_layer()
     return ok
 
 
@@ -321,55 +593,66 @@ def _validate_expression(expression) -> Optional[Type]:
     """
     node_type = expression['node']
 
-    if node_type == Node.VALUE_INT \
-            or node_type == Node.VALUE_REAL \
-            or node_type == Node.VALUE_BOOL \
-            or node_type == Node.VALUE_STR \
-            or node_type == Node.VALUE_ARRAY:
+    if node_type in LITERALS:
         return _validate_value(expression)
+    elif node_type == Node.VARIABLE_LOAD:
+        return _validate_var_load(expression)
+    else:
+        return _run_validator(_expression_validator(expression))
 
-    elif node_type == Node.UMINUS \
-            or node_type == Node.UPLUS \
-            or node_type == Node.MUL \
-            or node_type == Node.DIV \
-            or node_type == Node.PLUS \
-            or node_type == Node.MINUS \
-            or node_type == Node.EQ \
-            or node_type == Node.NE \
-            or node_type == Node.LT \
-            or node_type == Node.GT \
-            or node_type == Node.LE \
-            or node_type == Node.GE \
-            or node_type == Node.NOT \
-            or node_type == Node.AND \
-            or node_type == Node.OR:
-        return _validate_operator(expression)
 
-    elif node_type == Node.VARIABLE_LOAD:
-        name = expression['name']
-        var = _get_var(name)
-        if var is None:
-            _errors.append(f'Variable \'{name}\' is not defined.')
-            return None
+def _run_validator(validator: Generator) -> Optional[Type]:
+    """
+    Run the validator of a compound expression without the recursion.
+    The validator yields its sub-expressions and receives their types,
+    the validators of the nested compound expressions are suspended on an explicit stack.
+    :param validator: The validator generator.
+    :return: Result type or None on failure
+    """
+    validators = [validator]
+    t = None
+
+    while True:
+        try:
+            sub_exp = validators[-1].send(t)
+        except StopIteration as stop:
+            validators.pop()
+            t = stop.value
+
+            if not validators:
+                return t
+            continue
+
+        node_type = sub_exp['node']
+
+        if node_type in LITERALS:
+            t = _validate_value(sub_exp)
+        elif node_type == Node.VARIABLE_LOAD:
+            t = _validate_var_load(sub_exp)
         else:
-            expression['type'] = var[0]
-            return var[0]
+            validators.append(_expression_validator(sub_exp))
+            t = None
+
+
+def _expression_validator(expression) -> Generator:
+    """
+    Create the validator of the compound expression.
+    :param expression: The expression.
+    :return: The validator generator to be run by _run_validator.
+    """
+    node_type = expression['node']
+
+    if node_type == Node.VALUE_ARRAY:
+        return _validate_array_value(expression)
+
+    elif node_type in BINARY_OPERATORS or node_type in UNARY_OPERATORS:
+        return _validate_operator(expression)
 
     elif node_type == Node.VARIABLE_ASSIGNMENT:
         return _validate_var_store(expression)
 
     elif node_type == Node.ARRAY_LOAD:
-        name = expression['name']
-        indexes = expression['indexes']
-
-        var = _get_var(name)
-        if var is None:
-            _errors.append(f'Variable \'{name}\' is not defined.')
-            return None
-
-        t = _validate_array_access(var[0], indexes)
-        expression['type'] = t
-        return t
+        return _validate_array_load(expression)
 
     elif node_type == Node.ARRAY_ASSIGNMENT:
         return _validate_array_store(expression)
@@ -381,7 +664,59 @@ def _validate_expression(expression) -> Optional[Type]:
         raise NotImplementedError()
 
 
+def _validate_var_load(expression) -> Optional[Type]:
+    name = expression['name']
+    var = _get_var(name)
+    if var is None:
+        _error(expression, f'Variable \'{name}\' is not defined.')
+        return None
+    else:
+        expression['type'] = var[0]
+        return var[0]
+
+
+def _validate_array_load(expression) -> Generator:
+    name = expression['name']
+    indexes = expression['indexes']
+
+    var = _get_var(name)
+    if var is None:
+        _error(expression, f'Variable \'{name}\' is not defined.')
+        return None
+
+    t = yield from _validate_array_access(expression, var[0], indexes)
+    expression['type'] = t
+    return t
+
+
 def _validate_function_returns(statements, return_type) -> bool:
+    """
+    Check that every path through the statements ends with a return.
+    The branches of the nested conditions are checked without the recursion,
+    their checks are suspended on an explicit stack.
+    :param statements: The statements of the function.
+    :param return_type: The node type of the return statement.
+    :return: True if the statements always return, False otherwise.
+    """
+    checks = [_function_returns(statements, return_type)]
+    returns = None
+
+    while True:
+        try:
+            branch = checks[-1].send(returns)
+        except StopIteration as stop:
+            checks.pop()
+            returns = stop.value
+
+            if not checks:
+                return returns
+            continue
+
+        checks.append(_function_returns(branch, return_type))
+        returns = None
+
+
+def _function_returns(statements, return_type) -> Generator:
     fork_statements = []
     for statement in statements:
         node_type = statement['node']
@@ -398,8 +733,8 @@ def _validate_function_returns(statements, return_type) -> bool:
         if node_type == Node.IF_ELSE:
             if_statements = statement['if_statements']
             else_statements = statement['else_statements']
-            ret1 = _validate_function_returns(if_statements)
-            ret2 = _validate_function_returns(else_statements)
+            ret1 = yield if_statements
+            ret2 = yield else_statements
             if ret1 and ret2:
                 return True
             else:
@@ -412,23 +747,25 @@ def _validate_function_returns(statements, return_type) -> bool:
     return False
 
 
-def _validate_function_call(expression) -> Optional[Type]:
+def _validate_function_call(expression) -> Generator:
     name = expression['name']
     args = expression['arguments']
 
-    args_types = [_validate_expression(i) for i in args]
+    args_types = []
+    for i in args:
+        args_types.append((yield i))
 
     if any(t is None for t in args_types):
         return None
 
     for (i, t) in enumerate(args_types):
         if t.is_array_any():
-            _errors.append(f'{i}. argument type of function \'{name}\' call is ambiguous.')
+            _error(args[i], f'{i}. argument type of function \'{name}\' call is ambiguous.')
             return None
 
     fn_ret = _get_func(name, args_types)
     if fn_ret is None:
-        _errors.append(f'Undefined function \'{name}({", ".join(str(t) for t in args_types)})\'.')
+        _error(expression, f'Undefined function \'{name}({", ".join(str(t) for t in args_types)})\'.')
         return None
 
     expression['parameters'] = args_types
@@ -436,25 +773,25 @@ def _validate_function_call(expression) -> Optional[Type]:
     return fn_ret
 
 
-def _validate_var_store(expression) -> Optional[Type]:
+def _validate_var_store(expression) -> Generator:
     name = expression['name']
     exp = expression['expression']
     var = _get_var(name)
     if var is None:
-        _errors.append(f'Variable \'{name}\' is not defined.')
+        _error(expression, f'Variable \'{name}\' is not defined.')
         return None
 
     if var[1]:
-        _errors.append(f'Can not assign to the constant variable \'{name}\'.')
+        _error(expression, f'Can not assign to the constant variable \'{name}\'.')
         return None
 
-    exp_type = _validate_expression(exp)
+    exp_type = yield exp
 
     if exp_type is None:
         return None
 
     if var[0] != exp_type:
-        _errors.append(f'Can not assign a value of type {exp_type} into variable \'{name}\' of type {var[0]}.')
+        _error(expression, f'Can not assign a value of type {exp_type} into variable \'{name}\' of type {var[0]}.')
         return None
 
     _array_type_inference(exp, var[0])
@@ -462,53 +799,55 @@ def _validate_var_store(expression) -> Optional[Type]:
     return exp_type
 
 
-def _validate_array_store(expression) -> Optional[Type]:
+def _validate_array_store(expression) -> Generator:
     name = expression['name']
     indexes = expression['indexes']
     exp = expression['expression']
     var = _get_var(name)
     if var is None:
-        _errors.append(f'Variable \'{name}\' is not defined.')
+        _error(expression, f'Variable \'{name}\' is not defined.')
         return None
 
     if var[1]:
-        _errors.append(f'Can not assign to item of constant array \'{name}\'.')
+        _error(expression, f'Can not assign to item of constant array \'{name}\'.')
         return None
 
-    target_type = _validate_array_access(var[0], indexes)
+    target_type = yield from _validate_array_access(expression, var[0], indexes)
     if target_type is None:
         return None
 
-    exp_type = _validate_expression(exp)
+    exp_type = yield exp
 
     if exp_type is None:
         return None
 
     if target_type != exp_type:
-        _errors.append(f'Can not store value of type {exp_type} into {target_type}.')
+        _error(expression, f'Can not store value of type {exp_type} into {target_type}.')
         return None
 
     expression['type'] = exp_type
     return exp_type
 
 
-def _validate_array_access(exp_type: Type, indexes_exps) -> Optional[Type]:
+def _validate_array_access(expression, exp_type: Type, indexes_exps) -> Generator:
     if not isinstance(exp_type, TypeArray):
-        _errors.append(f'Can not use array access on non-array type ({exp_type}).')
+        _error(expression, f'Can not use array access on non-array type ({exp_type}).')
         return None
 
-    indexes_types = [_validate_expression(i) for i in indexes_exps]
+    indexes_types = []
+    for i in indexes_exps:
+        indexes_types.append((yield i))
 
     if any(t is None for t in indexes_types):
         return None
 
     for (i, t) in enumerate(indexes_types):
         if t != TypeInt():
-            _errors.append(f'{i}. index ({t}) into the array is not of type Int.')
+            _error(indexes_exps[i], f'{i}. index ({t}) into the array is not of type Int.')
             return None
 
     if len(indexes_types) > exp_type.dim:
-        _errors.append(f'Can not access dim {len(indexes_types)} on the array of dim {exp_type.dim}.')
+        _error(expression, f'Can not access dim {len(indexes_types)} on the array of dim {exp_type.dim}.')
         return None
 
     if len(indexes_types) == exp_type.dim:
@@ -517,42 +856,43 @@ def _validate_array_access(exp_type: Type, indexes_exps) -> Optional[Type]:
         return TypeArray(exp_type.dim - 1, exp_type.inner)
 
 
-def _validate_operator(expression) -> Optional[Type]:
+def _validate_operator(expression) -> Generator:
     node_type = expression['node']
-    sub_exps = [expression['expression']] \
-        if node_type in {Node.UMINUS, Node.UPLUS, Node.NOT} \
-        else [expression['left'], expression['right']]
-
-    sub_exp_types = [_validate_expression(e) for e in sub_exps]
 
-    if any(s is None for s in sub_exp_types):
-        return None
+    if node_type in UNARY_OPERATORS:
+        operand_type = yield expression['expression']
+        if operand_type is None:
+            return None
 
-    allowed = ALLOWED_OPERATOR_TYPES[node_type]
+        sub_exp_types = (operand_type,)
+        t = _OPERATOR_TYPES.get((node_type, operand_type.__class__))
+    else:
+        left_type = yield expression['left']
+        right_type = yield expression['right']
+        if left_type is None or right_type is None:
+            return None
 
-    for allowed_types in allowed:
-        if len(allowed_types[0]) != len(sub_exp_types):
-            continue
+        sub_exp_types = (left_type, right_type)
+        t = _OPERATOR_TYPES.get((node_type, left_type.__class__, right_type.__class__))
 
-        if all(isinstance(t, allowed_t) for (t, allowed_t) in zip(sub_exp_types, allowed_types[0])):
-            t = allowed_types[1]
-            expression['type'] = t
-            return t
+    if t is not None:
+        expression['type'] = t
+        return t
 
-    _errors.append(
-        f'Invalid operand types ({", ".join(str(s) for s in sub_exp_types)}) for operator \'{node_type.name}\'')
+    _error(expression,
+           f'Invalid operand types ({", ".join(str(s) for s in sub_exp_types)}) for operator \'{node_type.name}\'')
     return None
 
 
 def _validate_value(expression):
     """
-    Validate the value node and resolve its type.
+    Validate the literal value node and resolve its type.
     :param expression: The value expression node.
     :return: Type of the value or None on failure.
     """
     if expression['node'] == Node.VALUE_INT:
         if not is_int(expression['value']):
-            _errors.append(f'Integer {expression["value"]} is out of bounds (4 bytes).')
+            _error(expression, f'Integer {expression["value"]} is out of bounds (4 bytes).')
             return None
         expression['type'] = TypeInt()
         return TypeInt()
@@ -565,20 +905,20 @@ def _validate_value(expression):
     elif expression['node'] == Node.VALUE_STR:
         expression['type'] = TypeStr()
         return TypeStr()
-    elif expression['node'] == Node.VALUE_ARRAY:
-        return _validate_array_value(expression)
     else:
         raise NotImplementedError()
 
 
-def _validate_array_value(expression) -> Optional[TypeArray]:
+def _validate_array_value(expression) -> Generator:
     """
     Validate the array value node and resolve its dim and inner type.
     :param expression: The array value expression node.
     :return: Type of the array value or None on failure.
     """
     items = expression['items']
-    items_types = [_validate_expression(item) for item in items]
+    items_types = []
+    for item in items:
+        items_types.append((yield item))
 
     if any(t is None for t in items_types):
         return None
@@ -594,8 +934,8 @@ def _validate_array_value(expression) -> Optional[TypeArray]:
             return None
 
         if t != items_type:
-            _errors.append(
-                f'Incompatible array items types ({", ".join(str(t) for t in items_types)})')
+            _error(expression,
+                   f'Incompatible array items types ({", ".join(str(t) for t in items_types)})')
             return None
 
         if not isinstance(t, TypeArray) or not isinstance(t.inner, TypeAny):
@@ -621,12 +961,15 @@ def _array_type_inference(expression, top_type: Type):
     if expression['node'] != Node.VALUE_ARRAY or not isinstance(top_type, TypeArray):
         return
 
-    dim = expression['type'].dim
-    expression['type'] = TypeArray(dim, top_type.inner)
+    work = [expression]
 
-    if dim > 1:
-        for item in expression['items']:
-            _array_type_inference(item, top_type)
+    while work:
+        expression = work.pop()
+        dim = expression['type'].dim
+        expression['type'] = TypeArray(dim, top_type.inner)
+
+        if dim > 1:
+            work.extend(item for item in expression['items'] if item['node'] == Node.VALUE_ARRAY)
 
 
 def _get_var(identifier: str) -> Optional[Tuple[Type, bool]]:
@@ -635,10 +978,7 @@ def _get_var(identifier: str) -> Optional[Tuple[Type, bool]]:
     :param identifier: Identifier of the searched variable.
     :return: The variable type and is_const or None if not found.
     """
-    for depth in _vars:
-        if identifier in depth:
-            return depth[identifier]
-    return None
+    return _visible.get(identifier)
 
 
 def _add_var(identifier: str, t: Type, is_const: bool):
@@ -650,6 +990,7 @@ def _add_var(identifier: str, t: Type, is_const: bool):
     """
     # place the variable into the lowest layer
     _vars[-1][identifier] = (t, is_const)
+    _visible[identifier] = (t, is_const)
 
 
 def _get_func(identifier: str, params_types: Iterable[Type]) -> Optional[Type]:
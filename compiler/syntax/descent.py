@@ -0,0 +1,397 @@
+from typing import Generator, Dict, Tuple, List, Optional
+
+from compiler.syntax.ast import Node
+from compiler.syntax.rules import precedence, p_error
+
+# Key = prefix operator token type, Value = name of its precedence
+_PREFIX_PRECEDENCE = {
+    'MINUS': 'UMINUS',
+    'PLUS': 'UPLUS',
+    'NOT': 'NOT',
+}
+
+
+def _operators() -> Tuple[Dict[str, Tuple[int, Node]], Dict[str, Tuple[int, Node]]]:
+    """
+    Build the operator tables from the precedence table of the rules.
+    The strength of an operator is twice its precedence level, plus one if it is left associative.
+    An operator on the stack is applied before the incoming binary operator if its strength is not lower.
+    :return: The binary and the prefix operators, Key = token type, Value = (strength, node type).
+    """
+    strengths = {}
+    for (level, (assoc, *names)) in enumerate(precedence, 1):
+        for name in names:
+            strengths[name] = 2 * level + (1 if assoc == 'left' else 0)
+
+    binary = {name: (strengths[name], Node[name]) for name in strengths
+              if name in Node.__members__ and name not in _PREFIX_PRECEDENCE.values() and name != 'ASSIGN'}
+    prefix = {token_type: (strengths[name], Node[name]) for (token_type, name) in _PREFIX_PRECEDENCE.items()}
+    return binary, prefix
+
+
+_BINARY_OPERATORS, _PREFIX_OPERATORS = _operators()
+
+# Key = literal token type, Value = node type
+_LITERALS = {
+    'LITERAL_INT': Node.VALUE_INT,
+    'LITERAL_REAL': Node.VALUE_REAL,
+    'LITERAL_BOOL': Node.VALUE_BOOL,
+    'LITERAL_STR': Node.VALUE_STR,
+}
+
+# Key = type token type, Value = node type
+_TYPES = {
+    'TYPE_INT': Node.TYPE_INT,
+    'TYPE_REAL': Node.TYPE_REAL,
+    'TYPE_BOOL': Node.TYPE_BOOL,
+    'TYPE_STR': Node.TYPE_STR,
+}
+
+
+def _run(parser: Generator):
+    """
+    Run the parser of a nonterminal without the recursion.
+    The parser yields the parsers of the nested nonterminals and receives their nodes,
+    the parsers of the enclosing nonterminals are suspended on an explicit stack.
+    :param parser: The parser generator.
+    :return: The node of the nonterminal.
+    """
+    parsers = [parser]
+    node = None
+
+    while True:
+        try:
+            nested = parsers[-1].send(node)
+        except StopIteration as stop:
+            parsers.pop()
+            node = stop.value
+
+            if not parsers:
+                return node
+            continue
+
+        parsers.append(nested)
+        node = None
+
+
+class DescentParser:
+    """
+    Hand-written parser of the grammar in the rules building the same AST as the PLY parser.
+    The statements are parsed by the recursive descent and the operators by the precedence climbing
+    using the precedence table of the rules. The recursion is replaced by an explicit stack,
+    so the nesting depth is not limited by the Python stack.
+    The syntax errors are reported at the same token as by the PLY parser.
+    """
+
+    def __init__(self):
+        self._lexer = None
+        self._token = None
+
+    def parse(self, data: str, lexer, tracking: bool = False, debug: bool = False) -> dict:
+        """
+        Parse the source code into the AST.
+        :param data: The source code.
+        :param lexer: The lexer providing the tokens.
+        :param tracking: Accepted for the compatibility with the PLY parser, only the token offsets are recorded.
+        :param debug: Accepted for the compatibility with the PLY parser.
+        :return: The AST.
+        """
+        self._lexer = lexer
+        lexer.input(data)
+        self._token = lexer.token()
+
+        return _run(self._program())
+
+    # --- Tokens ---
+
+    def _type(self) -> Optional[str]:
+        return self._token.type if self._token is not None else None
+
+    def _pos(self) -> int:
+        return self._token.lexpos if self._token is not None else len(self._lexer.lexdata)
+
+    def _advance(self):
+        self._token = self._lexer.token()
+
+    def _take(self, token_type: str):
+        """
+        Consume the token of the given type.
+        :return: The token value.
+        """
+        token = self._token
+        if token is None or token.type != token_type:
+            self._error()
+
+        self._token = self._lexer.token()
+        return token.value
+
+    def _error(self):
+        token = self._token
+        if token is not None and not hasattr(token, 'lexer'):
+            token.lexer = self._lexer
+        p_error(token)
+
+    # --- Program ---
+
+    def _program(self) -> Generator:
+        statements = []
+
+        while self._token is not None:
+            token_type = self._token.type
+
+            if token_type == 'CONST':
+                statements.append((yield self._definition(Node.CONSTANT_DEFINITION)))
+                self._take('SEMICOLON')
+            elif token_type == 'FN':
+                statements.append((yield self._function_definition()))
+            else:
+                self._error()
+
+        return {'node': Node.PROGRAM, 'statements': statements}
+
+    def _function_definition(self) -> Generator:
+        pos = self._pos()
+        self._advance()
+        name = self._take('IDENTIFIER')
+        self._take('LPAREN')
+
+        parameters = []
+        if self._type() != 'RPAREN':
+            while True:
+                param_pos = self._pos()
+                param_name = self._take('IDENTIFIER')
+                self._take('COLON')
+                parameters.append({'node': Node.PARAM, 'name': param_name, 'type': self._type_node(), 'pos': param_pos})
+
+                if self._type() != 'COMMA':
+                    break
+                self._advance()
+        self._take('RPAREN')
+
+        if self._type() == 'COLON':
+            self._advance()
+            ret = self._type_node()
+        else:
+            ret = {'node': Node.TYPE_VOID}
+
+        statements = yield self._block()
+        return {'node': Node.FUNCTION_DEFINITION, 'name': name, 'parameters': parameters, 'return': ret,
+                'statements': statements, 'pos': pos}
+
+    def _type_node(self) -> dict:
+        dim = 0
+        while self._type() == 'LBRACKET':
+            self._advance()
+            dim += 1
+
+        node_type = _TYPES.get(self._type())
+        if node_type is None:
+            self._error()
+        self._advance()
+
+        for _ in range(dim):
+            self._take('RBRACKET')
+
+        if dim == 0:
+            return {'node': node_type}
+        return {'node': Node.TYPE_ARRAY, 'dim': dim, 'inner': {'node': node_type}}
+
+    # --- Statements ---
+
+    def _block(self) -> Generator:
+        self._take('LBRACE')
+        statements = []
+
+        while True:
+            token_type = self._type()
+
+            if token_type == 'RBRACE':
+                self._advance()
+                return statements
+            elif token_type == 'VAR':
+                statements.append((yield self._definition(Node.VARIABLE_DEFINITION)))
+                self._take('SEMICOLON')
+            elif token_type == 'CONST':
+                statements.append((yield self._definition(Node.CONSTANT_DEFINITION)))
+                self._take('SEMICOLON')
+            elif token_type == 'IDENTIFIER':
+                statements.append((yield self._store_or_call()))
+                self._take('SEMICOLON')
+            elif token_type == 'RETURN':
+                pos = self._pos()
+                self._advance()
+                if self._type() == 'SEMICOLON':
+                    statements.append({'node': Node.RETURN_VOID, 'pos': pos})
+                else:
+                    statements.append({'node': Node.RETURN, 'expression': (yield self._expression()), 'pos': pos})
+                self._take('SEMICOLON')
+            elif token_type == 'IF':
+                pos = self._pos()
+                self._advance()
+                condition = yield self._expression()
+                if_statements = yield self._block()
+
+                if self._type() == 'ELSE':
+                    self._advance()
+                    else_statements = yield self._block()
+                    statements.append({'node': Node.IF_ELSE, 'condition': condition, 'if_statements': if_statements,
+                                       'else_statements': else_statements, 'pos': pos})
+                else:
+                    statements.append({'node': Node.IF, 'condition': condition, 'statements': if_statements,
+                                       'pos': pos})
+            elif token_type == 'WHILE':
+                pos = self._pos()
+                self._advance()
+                condition = yield self._expression()
+                statements.append({'node': Node.WHILE, 'condition': condition, 'statements': (yield self._block()),
+                                   'pos': pos})
+            elif token_type == 'BREAK':
+                statements.append({'node': Node.BREAK, 'pos': self._pos()})
+                self._advance()
+                self._take('SEMICOLON')
+            elif token_type == 'CONTINUE':
+                statements.append({'node': Node.CONTINUE, 'pos': self._pos()})
+                self._advance()
+                self._take('SEMICOLON')
+            else:
+                self._error()
+
+    def _definition(self, node_type: Node) -> Generator:
+        pos = self._pos()
+        self._advance()
+        name = self._take('IDENTIFIER')
+        self._take('COLON')
+        t = self._type_node()
+        self._take('ASSIGN')
+        return {'node': node_type, 'name': name, 'type': t, 'expression': (yield self._expression()), 'pos': pos}
+
+    def _store_or_call(self) -> Generator:
+        pos = self._pos()
+        name = self._take('IDENTIFIER')
+
+        if self._type() == 'LPAREN':
+            return {'node': Node.FUNCTION_CALL, 'name': name, 'arguments': (yield self._list('LPAREN', 'RPAREN')),
+                    'pos': pos}
+
+        if self._type() == 'LBRACKET':
+            indexes = yield self._indexes()
+            self._take('ASSIGN')
+            return {'node': Node.ARRAY_STORE, 'name': name, 'indexes': indexes,
+                    'expression': (yield self._expression()), 'pos': pos}
+
+        self._take('ASSIGN')
+        return {'node': Node.VARIABLE_STORE, 'name': name, 'expression': (yield self._expression()), 'pos': pos}
+
+    # --- Expressions ---
+
+    def _list(self, start: str, end: str) -> Generator:
+        """
+        Parse the comma separated expressions enclosed in the start and end tokens.
+        """
+        self._take(start)
+        items = []
+
+        if self._type() != end:
+            while True:
+                items.append((yield self._expression()))
+
+                if self._type() != 'COMMA':
+                    break
+                self._advance()
+
+        self._take(end)
+        return items
+
+    def _indexes(self) -> Generator:
+        indexes = []
+
+        while self._type() == 'LBRACKET':
+            self._advance()
+            indexes.append((yield self._expression()))
+            self._take('RBRACKET')
+
+        return indexes
+
+    def _expression(self) -> Generator:
+        """
+        Parse the expression by the precedence climbing.
+        The operands and the pending operators are kept on the explicit stacks,
+        the value of an assignment is a whole expression as the ASSIGN has the lowest precedence.
+        The binary operator node is at the position of its left operand, as in the PLY parser.
+        """
+        operands: List[dict] = []
+        # (strength, node type, position of the prefix operator or None for the binary one)
+        operators: List[Tuple[int, Node, Optional[int]]] = []
+
+        while True:
+            token = self._token
+            token_type = token.type if token is not None else None
+
+            # prefix operators
+            while token_type in _PREFIX_OPERATORS:
+                (prefix_strength, node_type) = _PREFIX_OPERATORS[token_type]
+                operators.append((prefix_strength, node_type, token.lexpos))
+                self._advance()
+                token = self._token
+                token_type = token.type if token is not None else None
+
+            # operand
+            if token_type in _LITERALS:
+                self._advance()
+                operands.append({'node': _LITERALS[token_type], 'value': token.value, 'pos': token.lexpos})
+            elif token_type == 'IDENTIFIER':
+                operands.append((yield self._identifier_operand()))
+            elif token_type == 'LPAREN':
+                self._advance()
+                operands.append((yield self._expression()))
+                self._take('RPAREN')
+            elif token_type == 'LBRACKET':
+                operands.append({'node': Node.VALUE_ARRAY, 'items': (yield self._list('LBRACKET', 'RBRACKET')),
+                                 'pos': token.lexpos})
+            else:
+                self._error()
+
+            # binary operator
+            binary = _BINARY_OPERATORS.get(self._type())
+            binary_strength = binary[0] if binary is not None else 0
+
+            while operators and operators[-1][0] >= binary_strength:
+                (_, node_type, pos) = operators.pop()
+                if pos is not None:
+                    operands.append({'node': node_type, 'expression': operands.pop(), 'pos': pos})
+                else:
+                    right = operands.pop()
+                    left = operands.pop()
+                    operands.append({'node': node_type, 'left': left, 'right': right, 'pos': left['pos']})
+
+            if binary is None:
+                return operands.pop()
+
+            operators.append((binary[0], binary[1], None))
+            self._advance()
+
+    def _identifier_operand(self) -> Generator:
+        pos = self._pos()
+        name = self._take('IDENTIFIER')
+        token_type = self._type()
+
+        if token_type == 'LPAREN':
+            return {'node': Node.FUNCTION_CALL_VALUE, 'name': name, 'arguments': (yield self._list('LPAREN', 'RPAREN')),
+                    'pos': pos}
+
+        if token_type == 'LBRACKET':
+            indexes = yield self._indexes()
+
+            if self._type() == 'ASSIGN':
+                self._advance()
+                return {'node': Node.ARRAY_ASSIGNMENT, 'name': name, 'indexes': indexes,
+                        'expression': (yield self._expression()), 'pos': pos}
+
+            return {'node': Node.ARRAY_LOAD, 'name': name, 'indexes': indexes, 'pos': pos}
+
+        if token_type == 'ASSIGN':
+            self._advance()
+            return {'node': Node.VARIABLE_ASSIGNMENT, 'name': name,
+                    'expression': (yield self._expression()), 'pos': pos}
+
+        return {'node': Node.VARIABLE_LOAD, 'name': name, 'pos': pos}
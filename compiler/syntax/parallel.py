@@ -0,0 +1,167 @@
+import gc
+import io
+import re
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from typing import List, Tuple, Callable, Optional
+
+from compiler.lex import LexerError
+from compiler.lex.rules import t_LITERAL_STR
+from compiler.syntax.ast import Node
+from compiler.syntax.rules import SyntaxerError
+
+# the sources from this size are split, the smaller ones are not worth starting the processes
+PARALLEL_THRESHOLD = 1 << 20
+# the number of chunks per process, the smaller chunks balance the load of the processes
+CHUNKS_PER_JOB = 4
+
+# the string literals, braces and semicolons, a quotation mark not starting a string literal is a lexer error
+_PRESCAN_REGEX = re.compile(r'(' + t_LITERAL_STR.__doc__ + r')|([{};])|(")', re.VERBOSE)
+_LINE_END_REGEX = re.compile(r'[ \t]*\n')
+
+# the lexer and parser of the worker process
+_lexer = None
+_parser = None
+
+
+def split_definitions(data: str, count: int) -> List[Tuple[int, int]]:
+    """
+    Split the source code into the chunks of the whole top level definitions of a similar size.
+    The braces are balanced by a prescan skipping the string literals, a chunk is cut only at the end of a line
+    ending with a brace or semicolon at the top level, so it starts at a line start in the state of no definition.
+    The rest of the source code after an unbalanced brace or an invalid string literal is left in the last chunk.
+    :param data: The source code.
+    :param count: The wanted number of the chunks.
+    :return: List of (start offset, first line) of the chunks.
+    """
+    size = len(data) // count
+    chunks = [(0, 1)]
+    (start, line) = chunks[0]
+    depth = 0
+
+    for match in _PRESCAN_REGEX.finditer(data):
+        group = match.lastindex
+
+        if group == 1:
+            continue
+        if group == 3:
+            break
+
+        char = match.group(2)
+        if char == '{':
+            depth += 1
+            continue
+        if char == '}':
+            depth -= 1
+            if depth < 0:
+                break
+
+        if depth > 0 or match.end() - start < size:
+            continue
+
+        line_end = _LINE_END_REGEX.match(data, match.end())
+        if line_end is None:
+            continue
+
+        end = line_end.end()
+        if end >= len(data):
+            break
+
+        line += data.count('\n', start, end)
+        chunks.append((end, line))
+        start = end
+
+    return chunks
+
+
+def _init_worker(lexer_factory: Callable, parser_factory: Callable):
+    global _lexer, _parser
+    _lexer = lexer_factory()
+    _parser = parser_factory()
+
+
+def _parse_chunk(chunk: str, offset: int, line: int) -> Tuple[list, str, Optional[type]]:
+    """
+    Parse the chunk in the worker process.
+    The output is captured, so only the error of the first failing chunk is printed.
+    :param chunk: The source code of the chunk.
+    :param offset: The offset of the chunk in the source code.
+    :param line: The first line of the chunk.
+    :return: The statements, the captured output and the class of the error or None.
+    """
+    output = io.StringIO()
+    _lexer.lineno = line
+
+    try:
+        with redirect_stdout(output):
+            ast = _parser.parse(chunk, lexer=_lexer, debug=False)
+    except (LexerError, SyntaxerError) as e:
+        return [], output.getvalue(), type(e)
+
+    if offset:
+        _shift_positions(ast, offset)
+
+    return ast['statements'], output.getvalue(), None
+
+
+def _shift_positions(ast, offset: int):
+    """
+    Shift the positions of the nodes from the chunk into the whole source code.
+    """
+    work = [ast]
+
+    while work:
+        node = work.pop()
+        if 'pos' in node:
+            node['pos'] += offset
+
+        for value in node.values():
+            if isinstance(value, dict):
+                work.append(value)
+            elif isinstance(value, list):
+                work.extend(item for item in value if isinstance(item, dict))
+
+
+def parse_parallel(data: str, lexer_factory: Callable, parser_factory: Callable, jobs: int) -> dict:
+    """
+    Parse the source code by the pool of processes, each chunk of the top level definitions is lexed and parsed
+    by a process. The statements of the chunks are merged in order into the same AST as by the sequential parsing.
+    The output of the first failing chunk is printed and its error raised, as the sequential parsing stops there.
+    :param data: The source code.
+    :param lexer_factory: The picklable factory of the lexer.
+    :param parser_factory: The picklable factory of the parser.
+    :param jobs: The number of processes.
+    :return: The AST.
+    """
+    if jobs > 1 and len(data) >= PARALLEL_THRESHOLD:
+        chunks = split_definitions(data, jobs * CHUNKS_PER_JOB)
+    else:
+        chunks = [(0, 1)]
+
+    if len(chunks) == 1:
+        return parser_factory().parse(data, lexer=lexer_factory(), debug=False)
+
+    ends = [start for (start, _) in chunks[1:]] + [len(data)]
+    texts = [data[start:end] for ((start, _), end) in zip(chunks, ends)]
+    pool = ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(lexer_factory, parser_factory))
+
+    # the received statements have no reference cycles, the collections triggered by their many nodes
+    # would take most of the time of their unpickling
+    gc_enabled = gc.isenabled()
+    gc.disable()
+
+    try:
+        statements = []
+        results = pool.map(_parse_chunk, texts, [start for (start, _) in chunks], [line for (_, line) in chunks])
+
+        for (chunk_statements, output, error) in results:
+            print(output, end='')
+            if error is not None:
+                raise error()
+            statements.extend(chunk_statements)
+    finally:
+        pool.shutdown(cancel_futures=True)
+        if gc_enabled:
+            gc.enable()
+
+    return {'node': Node.PROGRAM, 'statements': statements}
@@ -58,7 +58,8 @@ def p_function_definition(p):
     statements = p[7] if len(p) == 9 else p[9]
 
     # (node, name, [parameters], return, [statements])
-    p[0] = {'node': Node.FUNCTION_DEFINITION, 'name': p[2], 'parameters': p[4], 'return': ret, 'statements': statements}
+    p[0] = {'node': Node.FUNCTION_DEFINITION, 'name': p[2], 'parameters': p[4], 'return': ret, 'statements': statements,
+            'pos': p.lexpos(1)}
 
 
 def p_parameters(p):
@@ -87,21 +88,22 @@ def p_parameter(p):
     """
     parameter   : IDENTIFIER COLON type
     """
-    p[0] = {'node': Node.PARAM, 'name': p[1], 'type': p[3]}
+    p[0] = {'node': Node.PARAM, 'name': p[1], 'type': p[3], 'pos': p.lexpos(1)}
 
 
 def p_function_call(p):
     """
     function_call   : IDENTIFIER LPAREN arguments RPAREN
     """
-    p[0] = {'node': Node.FUNCTION_CALL, 'name': p[1], 'arguments': p[3]}
+    p[0] = {'node': Node.FUNCTION_CALL, 'name': p[1], 'arguments': p[3], 'pos': p.lexpos(1)}
 
 
 def p_function_call_value(p):
     """
     function_call_value : function_call
     """
-    p[0] = {'node': Node.FUNCTION_CALL_VALUE, 'name': p[1]['name'], 'arguments': p[1]['arguments']}
+    p[0] = {'node': Node.FUNCTION_CALL_VALUE, 'name': p[1]['name'], 'arguments': p[1]['arguments'],
+            'pos': p[1]['pos']}
 
 
 def p_arguments(p):
@@ -132,9 +134,9 @@ def p_return(p):
             | RETURN
     """
     if len(p) == 3:
-        p[0] = {'node': Node.RETURN, 'expression': p[2]}
+        p[0] = {'node': Node.RETURN, 'expression': p[2], 'pos': p.lexpos(1)}
     else:
-        p[0] = {'node': Node.RETURN_VOID}
+        p[0] = {'node': Node.RETURN_VOID, 'pos': p.lexpos(1)}
 
 
 # --- Types ---
@@ -194,14 +196,15 @@ def p_if(p):
     """
     if  : IF expression LBRACE statements RBRACE
     """
-    p[0] = {'node': Node.IF, 'condition': p[2], 'statements': p[4]}
+    p[0] = {'node': Node.IF, 'condition': p[2], 'statements': p[4], 'pos': p.lexpos(1)}
 
 
 def p_if_else(p):
     """
     if_else : IF expression LBRACE statements RBRACE ELSE LBRACE statements RBRACE
     """
-    p[0] = {'node': Node.IF_ELSE, 'condition': p[2], 'if_statements': p[4], 'else_statements': p[8]}
+    p[0] = {'node': Node.IF_ELSE, 'condition': p[2], 'if_statements': p[4], 'else_statements': p[8],
+            'pos': p.lexpos(1)}
 
 
 # --- Cycles ---
@@ -210,21 +213,21 @@ def p_while(p):
     """
     while   : WHILE expression LBRACE statements RBRACE
     """
-    p[0] = {'node': Node.WHILE, 'condition': p[2], 'statements': p[4]}
+    p[0] = {'node': Node.WHILE, 'condition': p[2], 'statements': p[4], 'pos': p.lexpos(1)}
 
 
 def p_break(p):
     """
     break   : BREAK
     """
-    p[0] = {'node': Node.BREAK}
+    p[0] = {'node': Node.BREAK, 'pos': p.lexpos(1)}
 
 
 def p_continue(p):
     """
     continue    : CONTINUE
     """
-    p[0] = {'node': Node.CONTINUE}
+    p[0] = {'node': Node.CONTINUE, 'pos': p.lexpos(1)}
 
 
 # --- Expressions ---
@@ -276,114 +279,116 @@ def p_assignment(p):
     assignment : store
     """
     if p[1]['node'] == Node.VARIABLE_STORE:
-        p[0] = {'node': Node.VARIABLE_ASSIGNMENT, 'name': p[1]['name'], 'expression': p[1]['expression']}
+        p[0] = {'node': Node.VARIABLE_ASSIGNMENT, 'name': p[1]['name'], 'expression': p[1]['expression'],
+                'pos': p[1]['pos']}
     else:
-        p[0] = {'node': Node.ARRAY_ASSIGNMENT, 'name': p[1]['name'], 'indexes': p[1]['indexes'], 'expression': p[1]['expression']}
+        p[0] = {'node': Node.ARRAY_ASSIGNMENT, 'name': p[1]['name'], 'indexes': p[1]['indexes'], 'expression': p[1]['expression'],
+                'pos': p[1]['pos']}
 
 
 def p_uplus(p):
     """
     uplus   : PLUS expression %prec UPLUS
     """
-    p[0] = {'node': Node.UPLUS, 'expression': p[2]}
+    p[0] = {'node': Node.UPLUS, 'expression': p[2], 'pos': p.lexpos(1)}
 
 
 def p_uminus(p):
     """
     uminus  : MINUS expression %prec UMINUS
     """
-    p[0] = {'node': Node.UMINUS, 'expression': p[2]}
+    p[0] = {'node': Node.UMINUS, 'expression': p[2], 'pos': p.lexpos(1)}
 
 
 def p_mul(p):
     """
     mul : expression MUL expression
     """
-    p[0] = {'node': Node.MUL, 'left': p[1], 'right': p[3]}
+    p[0] = {'node': Node.MUL, 'left': p[1], 'right': p[3], 'pos': p[1]['pos']}
 
 
 def p_div(p):
     """
     div : expression DIV expression
     """
-    p[0] = {'node': Node.DIV, 'left': p[1], 'right': p[3]}
+    p[0] = {'node': Node.DIV, 'left': p[1], 'right': p[3], 'pos': p[1]['pos']}
 
 
 def p_plus(p):
     """
     plus    : expression PLUS expression
     """
-    p[0] = {'node': Node.PLUS, 'left': p[1], 'right': p[3]}
+    p[0] = {'node': Node.PLUS, 'left': p[1], 'right': p[3], 'pos': p[1]['pos']}
 
 
 def p_minus(p):
     """
     minus   : expression MINUS expression
     """
-    p[0] = {'node': Node.MINUS, 'left': p[1], 'right': p[3]}
+    p[0] = {'node': Node.MINUS, 'left': p[1], 'right': p[3], 'pos': p[1]['pos']}
 
 
 def p_eq(p):
     """
     eq  : expression EQ expression
     """
-    p[0] = {'node': Node.EQ, 'left': p[1], 'right': p[3]}
+    p[0] = {'node': Node.EQ, 'left': p[1], 'right': p[3], 'pos': p[1]['pos']}
 
 
 def p_ne(p):
     """
     ne  : expression NE expression
     """
-    p[0] = {'node': Node.NE, 'left': p[1], 'right': p[3]}
+    p[0] = {'node': Node.NE, 'left': p[1], 'right': p[3], 'pos': p[1]['pos']}
 
 
 def p_lt(p):
     """
     lt  : expression LT expression
     """
-    p[0] = {'node': Node.LT, 'left': p[1], 'right': p[3]}
+    p[0] = {'node': Node.LT, 'left': p[1], 'right': p[3], 'pos': p[1]['pos']}
 
 
 def p_gt(p):
     """
     gt  : expression GT expression
     """
-    p[0] = {'node': Node.GT, 'left': p[1], 'right': p[3]}
+    p[0] = {'node': Node.GT, 'left': p[1], 'right': p[3], 'pos': p[1]['pos']}
 
 
 def p_le(p):
     """
     le  : expression LE expression
     """
-    p[0] = {'node': Node.LE, 'left': p[1], 'right': p[3]}
+    p[0] = {'node': Node.LE, 'left': p[1], 'right': p[3], 'pos': p[1]['pos']}
 
 
 def p_ge(p):
     """
     ge  : expression GE expression
     """
-    p[0] = {'node': Node.GE, 'left': p[1], 'right': p[3]}
+    p[0] = {'node': Node.GE, 'left': p[1], 'right': p[3], 'pos': p[1]['pos']}
 
 
 def p_not(p):
     """
     not : NOT expression
     """
-    p[0] = {'node': Node.NOT, 'expression': p[2]}
+    p[0] = {'node': Node.NOT, 'expression': p[2], 'pos': p.lexpos(1)}
 
 
 def p_and(p):
     """
     and : expression AND expression
     """
-    p[0] = {'node': Node.AND, 'left': p[1], 'right': p[3]}
+    p[0] = {'node': Node.AND, 'left': p[1], 'right': p[3], 'pos': p[1]['pos']}
 
 
 def p_or(p):
     """
     or  : expression OR expression
     """
-    p[0] = {'node': Node.OR, 'left': p[1], 'right': p[3]}
+    p[0] = {'node': Node.OR, 'left': p[1], 'right': p[3], 'pos': p[1]['pos']}
 
 
 # --- Variables ---
@@ -392,7 +397,8 @@ def p_variable_definition(p):
     """
     variable_definition : VAR IDENTIFIER COLON type ASSIGN expression
     """
-    p[0] = {'node': Node.VARIABLE_DEFINITION, 'name': p[2], 'type': p[4], 'expression': p[6]}
+    p[0] = {'node': Node.VARIABLE_DEFINITION, 'name': p[2], 'type': p[4], 'expression': p[6],
+            'pos': p.lexpos(1)}
 
 
 def p_constant_definition(p):
@@ -400,7 +406,8 @@ def p_constant_definition(p):
     constant_definition : CONST IDENTIFIER COLON type ASSIGN expression
     """
     # (node, name, type, expression)
-    p[0] = {'node': Node.CONSTANT_DEFINITION, 'name': p[2], 'type': p[4], 'expression': p[6]}
+    p[0] = {'node': Node.CONSTANT_DEFINITION, 'name': p[2], 'type': p[4], 'expression': p[6],
+            'pos': p.lexpos(1)}
 
 
 def p_load(p):
@@ -409,9 +416,9 @@ def p_load(p):
             | IDENTIFIER array_access
     """
     if len(p) == 2:
-        p[0] = {'node': Node.VARIABLE_LOAD, 'name': p[1]}
+        p[0] = {'node': Node.VARIABLE_LOAD, 'name': p[1], 'pos': p.lexpos(1)}
     else:
-        p[0] = {'node': Node.ARRAY_LOAD, 'name': p[1], 'indexes': p[2]}
+        p[0] = {'node': Node.ARRAY_LOAD, 'name': p[1], 'indexes': p[2], 'pos': p.lexpos(1)}
 
 
 def p_store(p):
@@ -420,9 +427,9 @@ def p_store(p):
             | IDENTIFIER array_access ASSIGN expression
     """
     if len(p) == 4:
-        p[0] = {'node': Node.VARIABLE_STORE, 'name': p[1], 'expression': p[3]}
+        p[0] = {'node': Node.VARIABLE_STORE, 'name': p[1], 'expression': p[3], 'pos': p.lexpos(1)}
     else:
-        p[0] = {'node': Node.ARRAY_STORE, 'name': p[1], 'indexes': p[2], 'expression': p[4]}
+        p[0] = {'node': Node.ARRAY_STORE, 'name': p[1], 'indexes': p[2], 'expression': p[4], 'pos': p.lexpos(1)}
 
 
 def p_array_access(p):
@@ -453,35 +460,35 @@ def p_value_int(p):
     """
     value_int : LITERAL_INT
     """
-    p[0] = {'node': Node.VALUE_INT, 'value': p[1]}
+    p[0] = {'node': Node.VALUE_INT, 'value': p[1], 'pos': p.lexpos(1)}
 
 
 def p_value_real(p):
     """
     value_real    : LITERAL_REAL
     """
-    p[0] = {'node': Node.VALUE_REAL, 'value': p[1]}
+    p[0] = {'node': Node.VALUE_REAL, 'value': p[1], 'pos': p.lexpos(1)}
 
 
 def p_value_bool(p):
     """
     value_bool    : LITERAL_BOOL
     """
-    p[0] = {'node': Node.VALUE_BOOL, 'value': p[1]}
+    p[0] = {'node': Node.VALUE_BOOL, 'value': p[1], 'pos': p.lexpos(1)}
 
 
 def p_value_str(p):
     """
     value_str : LITERAL_STR
     """
-    p[0] = {'node': Node.VALUE_STR, 'value': p[1]}
+    p[0] = {'node': Node.VALUE_STR, 'value': p[1], 'pos': p.lexpos(1)}
 
 
 def p_value_array(p):
     """
     value_array   : LBRACKET items RBRACKET
     """
-    p[0] = {'node': Node.VALUE_ARRAY, 'items': p[2]}
+    p[0] = {'node': Node.VALUE_ARRAY, 'items': p[2], 'pos': p.lexpos(1)}
 
 
 def p_items(p):
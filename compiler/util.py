@@ -1,3 +1,12 @@
+import codecs
+import mmap
+import os
+import re
+from array import array
+from bisect import bisect_right
+from typing import Optional, Tuple
+
+
 def is_byte(value: int) -> bool:
     return -128 <= value <= 127
 
@@ -22,26 +31,163 @@ def is_long(value: int) -> bool:
     return -9223372036854775808 <= value <= 9223372036854775807
 
 
-def replace_escapes(s: str):
-    esc = False
-    result = ''
-
-    for c in s:
-        if esc:
-            esc = False
-            if c == 'n':
-                result += '\n'
-            elif c == 't':
-                result += '\t'
-            elif c == 'a':
-                result += '\a'
-            else:
-                result += c
-        else:
-            if c == '\\':
-                esc = True
-            else:
-                result += c
-
-    return result
+# Key = escaped character, Value = its replacement, the other escaped characters stand for themselves
+_ESCAPES = {
+    'n': '\n',
+    't': '\t',
+    'a': '\a',
+}
+_ESCAPE_REGEX = re.compile(r'\\(u[0-9A-Fa-f]{4}|.|$)', re.DOTALL)
+_UNICODE_ESCAPE_REGEX = re.compile(r'\\u([0-9A-Fa-f]{4})')
+
+
+def _replace_escape(match) -> str:
+    escape = match.group(1)
+
+    if len(escape) == 5:
+        # \uXXXX
+        return chr(int(escape[1:], 16))
+
+    return _ESCAPES.get(escape, escape)
+
+
+def replace_escapes(s: str) -> str:
+    """
+    Replace the escape sequences of the string literal.
+    :param s: The literal without the quotation marks.
+    :return: The decoded string.
+    """
+    if '\\' not in s:
+        return s
+
+    if '\0' in s:
+        return _ESCAPE_REGEX.sub(_replace_escape, s)
+
+    # the escaped backslashes are hidden behind the NULL character,
+    # so every remaining backslash starts an escape sequence
+    s = s.replace('\\\\', '\0')
+    for (escape, replacement) in _ESCAPES.items():
+        s = s.replace('\\' + escape, replacement)
+
+    # the text pieces alternate with the code points of the \uXXXX escapes
+    pieces = _UNICODE_ESCAPE_REGEX.split(s)
+    for i in range(0, len(pieces), 2):
+        pieces[i] = pieces[i].replace('\\', '').replace('\0', '\\')
+    for i in range(1, len(pieces), 2):
+        pieces[i] = chr(int(pieces[i], 16))
+
+    return ''.join(pieces)
+
+
+class Interned(type):
+    """
+    Metaclass of the immutable classes whose instances are hash-consed,
+    i.e. creating an instance with the same arguments returns the already existing one.
+    The arguments are normalized into a hashable tuple by the class method _intern_args.
+    Unlike ABCMeta it keeps isinstance checks of the instances fast.
+    """
+
+    def __init__(cls, name, bases, namespace):
+        super().__init__(name, bases, namespace)
+        cls._instances = {}
+
+    def __call__(cls, *args):
+        try:
+            return cls._instances[args]
+        except (KeyError, TypeError):
+            # not created yet or the arguments are not normalized
+            pass
+
+        args = cls._intern_args(*args)
+        instance = cls._instances.get(args)
+
+        if instance is None:
+            instance = super().__call__(*args)
+            cls._instances[args] = instance
+
+        return instance
+
+    def _intern_args(cls, *args) -> tuple:
+        return args
+
+
+# the files from this size are memory mapped instead of read
+MMAP_THRESHOLD = 1 << 20
+
+# (byte order mark, encoding), the UTF-32 marks start with the UTF-16 ones, so they are tried first
+_BOMS = [
+    (codecs.BOM_UTF32_LE, 'utf-32-le'),
+    (codecs.BOM_UTF32_BE, 'utf-32-be'),
+    (codecs.BOM_UTF8, 'utf-8'),
+    (codecs.BOM_UTF16_LE, 'utf-16-le'),
+    (codecs.BOM_UTF16_BE, 'utf-16-be'),
+]
+
+_NEWLINE_REGEX = re.compile('\n')
+
+
+def _decode(buffer) -> str:
+    """
+    Decode the source code by the encoding of its byte order mark or as UTF-8 without it.
+    The buffer is decoded through a memory view, so it is not copied before the decoding.
+    :param buffer: The bytes or the memory mapped file.
+    :return: The source code with the newlines translated to \\n.
+    """
+    with memoryview(buffer) as view:
+        encoding = 'utf-8'
+        start = 0
+        for (bom, bom_encoding) in _BOMS:
+            if view[:len(bom)] == bom:
+                (encoding, start) = (bom_encoding, len(bom))
+                break
+
+        with view[start:] as text:
+            data = str(text, encoding)
+
+    # the same translation as by the files opened in the text mode
+    if '\r' in data:
+        data = data.replace('\r\n', '\n').replace('\r', '\n')
+
+    return data
+
+
+def load_source(path: str) -> str:
+    """
+    Load the source code file.
+    The large files are memory mapped, so the only copy of the source code held in memory is the decoded string,
+    which is shared by the lexer, the parser and the line index of the diagnostics.
+    :param path: Path of the file.
+    :return: The source code.
+    :raises UnicodeDecodeError: If the file is not encoded in UTF-8 or the encoding of its byte order mark.
+    """
+    with open(path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size < MMAP_THRESHOLD:
+            return _decode(file.read())
+
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            return _decode(buffer)
+
+
+class LineIndex:
+    """
+    Offsets of the line starts of the source code, the line and column of a position are found by the bisection.
+    The offsets are computed on the first lookup, so the index costs nothing until a diagnostic is produced.
+    """
+
+    def __init__(self, data: str):
+        self._data: str = data
+        self._starts: Optional[array] = None
+
+    def location(self, pos: int) -> Tuple[int, int]:
+        """
+        Find the line and column of the position.
+        :param pos: The offset in the source code.
+        :return: The line starting from 1 and the column starting from 0.
+        """
+        if self._starts is None:
+            # the offsets are packed and the source code is not split, so no copy of it is made
+            self._starts = array('q', [0])
+            self._starts.extend(match.end() for match in _NEWLINE_REGEX.finditer(self._data))
 
+        line = bisect_right(self._starts, pos)
+        return line, pos - self._starts[line - 1]